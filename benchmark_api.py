@@ -0,0 +1,167 @@
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Throughput benchmark for the incident API (src/incident_api.py).
+#
+# Each of --clients threads keeps one HTTP connection open and posts the same
+# /validate request (--batch events) back to back for --duration seconds. The
+# report has requests/s, events/s and latency percentiles.
+#
+# To measure how throughput scales with prefork workers, pass --workers: for
+# each count the script starts `incident_api.py --workers N` itself, waits for
+# /health to report the model ready, runs the load, records the servers'
+# resident (RSS) and proportional (PSS, shared pages split between processes)
+# memory, and stops it:
+#
+#     python benchmark_api.py --workers 1,2,4,8 --clients 16 --report api.json
+#
+# Run the client on another machine (or pin it with taskset) when the server
+# should have every core to itself.
+
+DEFAULT_URL = 'http://localhost:8000'
+EVENTS_PATH = 'retail_events.json'
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'incident_api.py')
+
+def load_body(path: str, batch: int) -> bytes:
+    with open(path) as f:
+        text = f.read()
+    events = json.loads(text) if text.lstrip().startswith('[') else [json.loads(line) for line in text.splitlines() if line]
+    return json.dumps({'events': events[:batch]}).encode()
+
+def run_client(url: str, body: bytes, deadline: float, latencies: list, errors: list) -> None:
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    headers = {'Content-Type': 'application/json'}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request('POST', '/validate', body, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(f"HTTP {response.status}")
+                continue
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(f"{type(exc).__name__}: {exc}")
+            conn.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+def run_load(url: str, body: bytes, clients: int, duration: float, batch: int):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=run_client, args=(url, body, deadline, latencies, errors)) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    ms = np.array(latencies) * 1000
+    result = {'requests': len(latencies), 'errors': len(errors), 'error_samples': sorted(set(errors))[:5],
+              'duration_s': round(elapsed, 3),
+              'requests_per_s': round(len(latencies) / elapsed, 1),
+              'events_per_s': round(len(latencies) * batch / elapsed, 1),
+              'latency_ms': None}
+    if len(ms):
+        result['latency_ms'] = {'p50': float(np.percentile(ms, 50)), 'p95': float(np.percentile(ms, 95)),
+                                'p99': float(np.percentile(ms, 99)), 'max': float(ms.max())}
+    return result
+
+def process_memory(pid: int):
+    """(RSS, PSS) in MiB of pid and its children, from /proc (Linux only)."""
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        return None
+    memory = []
+    for p in pids:
+        values = {}
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    key, _, rest = line.partition(':')
+                    if key in ('Rss', 'Pss'):
+                        values[key] = int(rest.split()[0]) / 1024
+        except OSError:
+            continue
+        memory.append({'pid': p, 'rss_mib': round(values.get('Rss', 0), 1), 'pss_mib': round(values.get('Pss', 0), 1)})
+    return memory
+
+def wait_ready(url: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=1) as response:
+                if json.load(response).get('ready'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout} s")
+
+def run_sweep(args, body: bytes):
+    port = urlsplit(args.url).port or 8000
+    results = []
+    for workers in args.workers:
+        server = subprocess.Popen([sys.executable, SERVER, '--workers', str(workers), '--port', str(port)],
+                                  cwd=args.server_cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(args.url, args.startup_timeout)
+            # Every worker warms up (and loads its own pages) before measuring
+            time.sleep(1)
+            run_load(args.url, body, args.clients, min(args.duration, 2), args.batch)
+            result = run_load(args.url, body, args.clients, args.duration, args.batch)
+            result['workers'] = workers
+            result['memory'] = process_memory(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        results.append(result)
+        print(f"{workers} worker(s): {result['requests_per_s']} req/s, p99 "
+              f"{result['latency_ms']['p99'] if result['latency_ms'] else float('nan'):.1f} ms", flush=True)
+    return results
+
+def main(args):
+    body = load_body(args.events, args.batch)
+    config = {'url': args.url, 'clients': args.clients, 'batch': args.batch, 'duration_s': args.duration,
+              'cpus': os.cpu_count()}
+    if args.workers:
+        config['workers'] = args.workers
+        results = run_sweep(args, body)
+    else:
+        results = [run_load(args.url, body, args.clients, args.duration, args.batch)]
+    report = {'timestamp': datetime.now(timezone.utc).isoformat(), 'config': config, 'results': results}
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure /validate requests/s, optionally across prefork worker counts.')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--events', default=EVENTS_PATH, help='JSON array or NDJSON file of events to post')
+    parser.add_argument('--batch', type=int, default=100, help='events per request')
+    parser.add_argument('-c', '--clients', type=int, default=8, help='concurrent connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per measurement')
+    parser.add_argument('--workers', type=lambda s: [int(w) for w in s.split(',')], default=None,
+                        help='comma-separated worker counts: start incident_api.py with each and measure it')
+    parser.add_argument('--server-cwd', default='.', help='directory the server runs in (MODEL_PATH is relative to it)')
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    parser.add_argument('--report', default=None, help='also write the JSON report to this file')
+    main(parser.parse_args())
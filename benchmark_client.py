@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import getpass
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import websockets
+
+import stream_protocol
+
+# Load generator for stream_server.py.
+#
+# Opens N concurrent authenticated connections, answers every event (or batch)
+# with a synthetic or model prediction, and writes a JSON report with
+# throughput, timeouts and two timings per frame:
+#
+#   handling_ms   - from receiving a frame to sending its reply: the client's
+#                   own share of each event's round trip
+#   turnaround_ms - from sending a reply to receiving the next frame on the
+#                   same connection: how long the server takes to release the
+#                   next event. Only meaningful with the server at --window 1
+#                   and --rate 0; with a larger window the next frame may
+#                   already be on its way, and with a rate the replay pacing
+#                   is measured too.
+#
+# The client never sees when the server sent a frame, so the per-event round
+# trip (server send to prediction received) is measured by stream_server.py
+# itself: it logs latency_ms with every reply and reports percentiles per
+# client and on shutdown.
+
+DEFAULT_URI = os.environ.get('STREAM_URI', 'ws://localhost:8765')
+# Upper edges of the turnaround histogram buckets, in milliseconds
+HISTOGRAM_EDGES_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+class ConnectionResult:
+    __slots__ = ('events', 'handling', 'turnarounds', 'timeouts', 'error')
+
+    def __init__(self):
+        self.events = 0
+        self.handling = []
+        self.turnarounds = []
+        self.timeouts = 0
+        self.error = None
+
+def make_predictor(model_path):
+    """Factory for a per-connection prediction function: synthetic, or scored with the trained model."""
+    if not model_path:
+        return lambda: (lambda event: 0)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    from model_export import load_model
+    from stream_scoring import StreamScorer
+    model, pipeline = load_model(model_path)
+
+    def predictor():
+        # Each connection is its own stream, with its own session state
+        scorer = StreamScorer(model, pipeline)
+        return lambda event: scorer.score(event)['prediction'] or 0
+    return predictor
+
+async def run_connection(args, new_predictor) -> ConnectionResult:
+    result = ConnectionResult()
+    predict = new_predictor()
+    try:
+        async with websockets.connect(args.uri, compression=None, open_timeout=args.timeout, max_size=None) as websocket:
+            decoder = None
+            if args.protocol == 'legacy':
+                await websocket.send(args.password)
+            else:
+                await websocket.send(stream_protocol.client_hello(args.password, args.protocol, args.batch_size))
+                ack = json.loads(await asyncio.wait_for(websocket.recv(), args.timeout))
+                if 'error' in ack:
+                    result.error = ack['error']
+                    return result
+                if ack['protocol'] == stream_protocol.BATCH_PROTOCOL:
+                    decoder = stream_protocol.BatchDecoder(ack)
+            replied_at = None
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.recv(), args.timeout)
+                except asyncio.TimeoutError:
+                    result.timeouts += 1
+                    break
+                received_at = time.perf_counter()
+                if replied_at is not None:
+                    result.turnarounds.append(received_at - replied_at)
+                if isinstance(message, bytes):
+                    seq, events = decoder.decode(message)
+                    reply = stream_protocol.encode_predictions(seq, [predict(event) for event in events])
+                    result.events += len(events)
+                else:
+                    event = json.loads(message)
+                    if 'error' in event:
+                        result.error = event['error']
+                        break
+                    reply = str(predict(event)) if args.model else 'decode'
+                    result.events += 1
+                await websocket.send(reply)
+                replied_at = time.perf_counter()
+                result.handling.append(replied_at - received_at)
+    except websockets.ConnectionClosed:
+        pass
+    except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as exc:
+        result.error = f"{type(exc).__name__}: {exc}"
+    return result
+
+def percentiles(ms: np.ndarray):
+    if not len(ms):
+        return None
+    return {'count': int(len(ms)), 'mean': float(ms.mean()), 'p50': float(np.percentile(ms, 50)),
+            'p95': float(np.percentile(ms, 95)), 'p99': float(np.percentile(ms, 99)), 'max': float(ms.max())}
+
+def build_report(args, results, duration: float):
+    handling = np.array([t for r in results for t in r.handling]) * 1000
+    turnarounds = np.array([t for r in results for t in r.turnarounds]) * 1000
+    events = sum(r.events for r in results)
+    failed = [r.error for r in results if r.error]
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': {'uri': args.uri, 'connections': args.connections, 'protocol': args.protocol,
+                   'batch_size': args.batch_size, 'model': args.model, 'timeout_s': args.timeout},
+        'connections': {'completed': len(results) - len(failed), 'failed': len(failed), 'errors': sorted(set(failed))[:10]},
+        'events': events,
+        'duration_s': round(duration, 3),
+        'throughput_events_per_s': round(events / duration, 1) if duration else None,
+        'timeouts': sum(r.timeouts for r in results),
+        'handling_ms': percentiles(handling),
+        'turnaround_ms': percentiles(turnarounds),
+        'turnaround_histogram_ms': None,
+    }
+    if len(turnarounds):
+        counts = np.bincount(np.searchsorted(HISTOGRAM_EDGES_MS, turnarounds), minlength=len(HISTOGRAM_EDGES_MS) + 1)
+        labels = [f"<={edge}" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]}"]
+        report['turnaround_histogram_ms'] = dict(zip(labels, counts.tolist()))
+    return report
+
+async def main(args):
+    new_predictor = make_predictor(args.model)
+    start = time.perf_counter()
+    results = await asyncio.gather(*[run_connection(args, new_predictor) for _ in range(args.connections)])
+    report = build_report(args, results, time.perf_counter() - start)
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark stream_server with many concurrent clients.')
+    parser.add_argument('--uri', default=DEFAULT_URI)
+    parser.add_argument('--password', default=os.environ.get('STREAM_PASSWORD'), help='stream password (prompted if omitted)')
+    parser.add_argument('-n', '--connections', type=int, default=100)
+    parser.add_argument('--protocol', choices=['legacy', stream_protocol.JSON_PROTOCOL, stream_protocol.BATCH_PROTOCOL], default='legacy')
+    parser.add_argument('--batch-size', type=int, default=stream_protocol.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--model', default=None, help='answer with predictions from this model instead of synthetic ones')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds to wait for a connection or the next frame')
+    parser.add_argument('--report', default=None, help='also write the JSON report to this file')
+    args = parser.parse_args()
+    if args.password is None:
+        args.password = getpass.getpass('Enter password: ')
+    asyncio.run(main(args))
@@ -1,8 +1,17 @@
+import argparse
 import json
-import random
-from datetime import datetime, timedelta
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
-SCANNERS = ["SCO1", "SCO2", "SCO3"]
+import numpy as np
+
+# event_store (columnar output) lives in src/; also needed in spawned worker processes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+SCANNER_PREFIX = "SCO"
 PRODUCTS = [
     {"name": "apple", "barcode": "CODE123", "rfid": "RFID123"},
     {"name": "banana", "barcode": "CODE124", "rfid": "RFID124"},
@@ -28,102 +37,296 @@ PRODUCTS = [
 
 START_TIME = datetime(2025, 8, 4, 9, 0, 0)
 SECONDS = 3600  # 1 hour
+LANES = 3
 
-# Incident types and their probabilities per hour
+# Incidents per lane per hour (the original mix over 3 lanes for one hour)
 INCIDENTS = [
-    ("scanner_avoidance", 3),
-    ("product_swap", 3),
-    ("unscanned_item", 3),
-    ("queue_buildup", 2),
-    ("scanner_failure", 1),
-    ("long_wait", 1)
+    ("scanner_avoidance", 1.0),
+    ("product_swap", 1.0),
+    ("unscanned_item", 1.0),
+    ("queue_buildup", 2 / 3),
+    ("scanner_failure", 1 / 3),
+    ("long_wait", 1 / 3)
 ]
 
-random.seed(42)
+# Chance per lane-second of a normal transaction (barcode + RFID + camera);
+# rates above 1 are the mean number of transactions per second
+TRANSACTION_RATE = 0.7
+# Chance per second that a failed scanner recovers
+RECOVERY_PROB = 0.01
+QUEUE_INTERVAL = 30
+EQUIPMENT_INTERVAL = 60
+LANES_PER_SHARD = 16
+SEED = 42
+
+# Events are generated as integer columns and only turned into JSON (or store
+# codes) when written. Product code CUSTOMER marks the customer_present camera label.
+EVENT_TYPES = ["barcode_scan", "rfid_read", "camera_image", "queue_status", "equipment_status"]
+BARCODE, RFID, CAMERA, QUEUE, EQUIPMENT = range(len(EVENT_TYPES))
+EQUIPMENT_STATES = ["failure", "operational"]
+FAILURE, OPERATIONAL = range(len(EQUIPMENT_STATES))
+CUSTOMER = len(PRODUCTS)
+INCIDENT_TYPES = [name for name, _ in INCIDENTS]
+# Order of events within one second: incidents (in INCIDENTS order), then
+# transactions, queue status, periodic equipment status and recoveries
+PHASE_TRANSACTION, PHASE_QUEUE, PHASE_EQUIPMENT, PHASE_RECOVERY = range(len(INCIDENTS), len(INCIDENTS) + 4)
+
+EVENT_COLUMNS = ["sec", "phase", "lane", "event_type", "product", "queue_length", "equipment_status"]
+INCIDENT_COLUMNS = ["sec", "lane", "incident", "product", "actual", "queue_length"]
+
+def _columns(names, **values):
+    n = len(values["sec"])
+    return {name: np.broadcast_to(np.asarray(values.get(name, -1)), (n,)).astype(np.int64) for name in names}
+
+def _group(sec, phase, lane, event_types, products):
+    """Events of k-event groups (e.g. barcode + RFID + camera) interleaved group by group."""
+    k = len(event_types)
+    products = np.column_stack([np.broadcast_to(p, sec.shape) for p in products]).ravel()
+    return _columns(EVENT_COLUMNS, sec=np.repeat(sec, k), phase=phase, lane=lane,
+                    event_type=np.tile(event_types, len(sec)), product=products)
+
+def _concat(parts, names):
+    return {name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, np.int64) for name in names}
+
+def generate_lane(rng, lane: int, seconds: int, rate: float, incident_rates):
+    """Event and incident columns for one lane over `seconds` seconds."""
+    events, incidents = [], []
+    n_products = len(PRODUCTS)
+    times = {}
+    for phase, (name, per_hour) in enumerate(incident_rates):
+        times[name] = np.sort(rng.integers(0, seconds, rng.poisson(per_hour * seconds / 3600)))
+        t = times[name]
+        if name in ("scanner_avoidance", "unscanned_item"):
+            # RFID and camera, no barcode
+            prod = rng.integers(0, n_products, len(t))
+            events.append(_group(t, phase, lane, [RFID, CAMERA], [prod, prod]))
+            incidents.append(_columns(INCIDENT_COLUMNS, sec=t, lane=lane, incident=phase, product=prod))
+        elif name == "product_swap":
+            # Barcode for cheap, RFID/camera for expensive
+            cheap = rng.integers(0, n_products, len(t))
+            expensive = (cheap + rng.integers(1, n_products, len(t))) % n_products
+            events.append(_group(t, phase, lane, [BARCODE, RFID, CAMERA], [cheap, expensive, expensive]))
+            incidents.append(_columns(INCIDENT_COLUMNS, sec=t, lane=lane, incident=phase, product=cheap, actual=expensive))
+        elif name == "queue_buildup":
+            queue_len = rng.integers(6, 11, len(t))
+            events.append(_columns(EVENT_COLUMNS, sec=t, phase=phase, lane=lane, event_type=QUEUE, queue_length=queue_len))
+            incidents.append(_columns(INCIDENT_COLUMNS, sec=t, lane=lane, incident=phase, queue_length=queue_len))
+        elif name == "scanner_failure":
+            events.append(_columns(EVENT_COLUMNS, sec=t, phase=phase, lane=lane, event_type=EQUIPMENT, equipment_status=FAILURE))
+            incidents.append(_columns(INCIDENT_COLUMNS, sec=t, lane=lane, incident=phase))
+        elif name == "long_wait":
+            # Customer present for long time
+            events.append(_columns(EVENT_COLUMNS, sec=t, phase=phase, lane=lane, event_type=CAMERA, product=CUSTOMER))
+            incidents.append(_columns(INCIDENT_COLUMNS, sec=t, lane=lane, incident=phase))
+    # Failed from each failure until a geometric recovery delay later; overlapping failures merge
+    cover = np.zeros(seconds + 1, dtype=np.int64)
+    failures = times.get("scanner_failure", np.empty(0, np.int64))
+    np.add.at(cover, failures, 1)
+    np.add.at(cover, np.minimum(failures + rng.geometric(RECOVERY_PROB, len(failures)), seconds), -1)
+    failed = np.cumsum(cover[:-1]) > 0
+    sec = np.arange(seconds)
+    # Normal transactions for operational seconds
+    operational = sec[~failed]
+    if rate > 1:
+        counts = rng.poisson(rate, len(operational))
+    else:
+        counts = (rng.random(len(operational)) < rate).astype(np.int64)
+    t = np.repeat(operational, counts)
+    prod = rng.integers(0, n_products, len(t))
+    events.append(_group(t, PHASE_TRANSACTION, lane, [BARCODE, RFID, CAMERA], [prod, prod, prod]))
+    # Queue status every QUEUE_INTERVAL seconds, longer while failed
+    t = sec[::QUEUE_INTERVAL]
+    queue_len = np.where(failed[t], rng.integers(3, 11, len(t)), rng.integers(0, 6, len(t)))
+    events.append(_columns(EVENT_COLUMNS, sec=t, phase=PHASE_QUEUE, lane=lane, event_type=QUEUE, queue_length=queue_len))
+    # While failed, equipment status every EQUIPMENT_INTERVAL seconds; a recovery on the last failed second
+    t = sec[::EQUIPMENT_INTERVAL]
+    t = t[failed[t]]
+    events.append(_columns(EVENT_COLUMNS, sec=t, phase=PHASE_EQUIPMENT, lane=lane, event_type=EQUIPMENT, equipment_status=FAILURE))
+    t = np.flatnonzero(failed[:-1] & ~failed[1:])
+    events.append(_columns(EVENT_COLUMNS, sec=t, phase=PHASE_RECOVERY, lane=lane, event_type=EQUIPMENT, equipment_status=OPERATIONAL))
+    return _concat(events, EVENT_COLUMNS), _concat(incidents, INCIDENT_COLUMNS)
+
+def generate_shard(lanes, seconds: int, rate: float, incident_rates, seed) -> tuple:
+    """Time-ordered event and incident columns for a range of lanes, deterministic for a given seed."""
+    rng = np.random.default_rng(seed)
+    parts = [generate_lane(rng, lane, seconds, rate, incident_rates) for lane in lanes]
+    events = _concat([p[0] for p in parts], EVENT_COLUMNS)
+    incidents = _concat([p[1] for p in parts], INCIDENT_COLUMNS)
+    order = np.lexsort((events["lane"], events["phase"], events["sec"]))
+    events = {name: values[order] for name, values in events.items()}
+    order = np.lexsort((incidents["lane"], incidents["incident"], incidents["sec"]))
+    incidents = {name: values[order] for name, values in incidents.items()}
+    return events, incidents
+
+class Formatter:
+    """Turns integer columns into JSON lines using lookup tables of pre-quoted strings."""
 
-def pick_product(exclude=None):
-    choices = [p for p in PRODUCTS if not exclude or p["name"] != exclude]
-    return random.choice(choices)
+    def __init__(self, start: datetime, seconds: int, lanes: int):
+        stamps = np.datetime64(start, "s") + np.arange(seconds).astype("timedelta64[s]")
+        self.ts = np.array(['"%sZ"' % s for s in np.datetime_as_string(stamps, unit="s")], dtype=object)
+        self.scanner = np.array([json.dumps(scanner_name(i)) for i in range(lanes)], dtype=object)
+        self.name = np.array([json.dumps(p["name"]) for p in PRODUCTS] + ['"customer_present"'], dtype=object)
+        self.barcode = np.array([json.dumps(p["barcode"]) for p in PRODUCTS] + ["null"], dtype=object)
+        self.rfid = np.array([json.dumps(p["rfid"]) for p in PRODUCTS] + ["null"], dtype=object)
+
+    def events(self, ev):
+        lines = np.empty(len(ev["sec"]), dtype=object)
+        ts, scanner = self.ts[ev["sec"]], self.scanner[ev["lane"]]
+        etype, product = ev["event_type"], ev["product"]
+        kinds = [
+            (etype == BARCODE, '{"timestamp": %s, "event_type": "barcode_scan", "scanner_id": %s, "product_id": %s, "barcode_data": %s}', self.barcode),
+            (etype == RFID, '{"timestamp": %s, "event_type": "rfid_read", "scanner_id": %s, "product_id": %s, "rfid_tag": %s}', self.rfid),
+            ((etype == CAMERA) & (product != CUSTOMER), '{"timestamp": %s, "event_type": "camera_image", "scanner_id": %s, "product_id": %s, "camera_label": %s}', self.name),
+        ]
+        for mask, template, extra in kinds:
+            p = product[mask]
+            lines[mask] = [template % row for row in zip(ts[mask], scanner[mask], self.name[p], extra[p])]
+        mask = (etype == CAMERA) & (product == CUSTOMER)
+        lines[mask] = ['{"timestamp": %s, "event_type": "camera_image", "scanner_id": %s, "product_id": "customer_present"}' % row
+                       for row in zip(ts[mask], scanner[mask])]
+        mask = etype == QUEUE
+        lines[mask] = ['{"timestamp": %s, "event_type": "queue_status", "scanner_id": %s, "queue_length": %d}' % row
+                       for row in zip(ts[mask], scanner[mask], ev["queue_length"][mask].tolist())]
+        mask = etype == EQUIPMENT
+        states = np.array(['"failure"', '"operational"'], dtype=object)
+        lines[mask] = ['{"timestamp": %s, "event_type": "equipment_status", "scanner_id": %s, "equipment_status": %s}' % row
+                       for row in zip(ts[mask], scanner[mask], states[ev["equipment_status"][mask]])]
+        return lines
+
+    def incidents(self, inc):
+        lines = []
+        for sec, lane, kind, product, actual, queue_len in zip(*(inc[c].tolist() for c in INCIDENT_COLUMNS)):
+            line = '{"timestamp": %s, "scanner_id": %s, "incident": "%s"' % (self.ts[sec], self.scanner[lane], INCIDENT_TYPES[kind])
+            if INCIDENT_TYPES[kind] == "product_swap":
+                line += ', "barcode": %s, "actual": %s' % (self.name[product], self.name[actual])
+            elif product >= 0:
+                line += ', "product": %s' % self.name[product]
+            elif queue_len >= 0:
+                line += ', "queue_length": %d' % queue_len
+            lines.append(line + "}")
+        return lines
+
+def scanner_name(lane: int) -> str:
+    return f"{SCANNER_PREFIX}{lane + 1}"
+
+def store_columns(ev, start: datetime, lanes: int):
+    """Event columns encoded for event_store.write_columns."""
+    from event_store import NULL_CODE, NULL_INT
+    names = [p["name"] for p in PRODUCTS]
+    etype, product = ev["event_type"], ev["product"]
+    epoch_ns = (np.datetime64(start, "s") - np.datetime64(0, "s")).astype(np.int64) * 1_000_000_000
+    columns = {
+        "timestamp": epoch_ns + ev["sec"] * 1_000_000_000,
+        "event_type": etype,
+        "scanner_id": ev["lane"],
+        "product_id": np.where(product >= 0, product, NULL_CODE),
+        "barcode_data": np.where(etype == BARCODE, product, NULL_CODE),
+        "rfid_tag": np.where(etype == RFID, product, NULL_CODE),
+        "camera_label": np.where((etype == CAMERA) & (product != CUSTOMER), product, NULL_CODE),
+        "queue_length": np.where(ev["queue_length"] >= 0, ev["queue_length"], NULL_INT),
+        "equipment_status": np.where(ev["equipment_status"] >= 0, ev["equipment_status"], NULL_CODE),
+    }
+    dictionaries = {
+        "event_type": EVENT_TYPES,
+        "scanner_id": [scanner_name(i) for i in range(lanes)],
+        "product_id": names + ["customer_present"],
+        "barcode_data": [p["barcode"] for p in PRODUCTS],
+        "rfid_tag": [p["rfid"] for p in PRODUCTS],
+        "camera_label": names,
+        "equipment_status": EQUIPMENT_STATES,
+    }
+    return columns, dictionaries
+
+def write_lines(path: str, lines, chunk: int = 1 << 16):
+    with open(path, "w") as f:
+        for i in range(0, len(lines), chunk):
+            f.write("\n".join(lines[i:i + chunk]))
+            f.write("\n")
+
+def run_shard(task):
+    """Generate one shard and write it in the requested format; returns (events, incidents) counts or columns for json."""
+    index, lanes, args, incident_rates, seed = task
+    events, incidents = generate_shard(lanes, args.seconds, args.rate, incident_rates, seed)
+    if args.format == "json":
+        return events, incidents
+    formatter = Formatter(args.start, args.seconds, args.lanes)
+    write_lines(os.path.join(args.out, f"incidents-{index:05d}.ndjson"), formatter.incidents(incidents))
+    if args.format == "ndjson":
+        write_lines(os.path.join(args.out, f"events-{index:05d}.ndjson"), formatter.events(events).tolist())
+    else:
+        from event_store import write_columns
+        columns, dictionaries = store_columns(events, args.start, args.lanes)
+        write_columns(columns, dictionaries, os.path.join(args.out, f"events-{index:05d}"))
+    return len(events["sec"]), len(incidents["sec"])
+
+def parse_duration(text: str) -> int:
+    """Seconds from e.g. '3600', '90m', '24h', '7d' or '1w'."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def parse_mix(text: str, scale: float):
+    """INCIDENTS with overrides like 'product_swap=2,long_wait=0', all scaled by scale."""
+    rates = dict(INCIDENTS)
+    for item in filter(None, (text or "").split(",")):
+        name, value = item.split("=")
+        if name not in rates:
+            raise ValueError(f"Unknown incident type: {name}")
+        rates[name] = float(value)
+    return [(name, rates[name] * scale) for name in INCIDENT_TYPES]
 
 def main():
-    events = []
-    incident_log = []
-    # Preselect incident times
-    incident_times = {}
-    for incident, count in INCIDENTS:
-        times = sorted(random.sample(range(SECONDS), count))
-        incident_times[incident] = times
-    # Track scanner status
-    scanner_status = {s: "operational" for s in SCANNERS}
-    for sec in range(SECONDS):
-        timestamp = (START_TIME + timedelta(seconds=sec)).isoformat() + "Z"
-        # Check for incidents
-        for incident, times in incident_times.items():
-            if sec in times:
-                scanner = random.choice(SCANNERS)
-                if incident == "scanner_avoidance":
-                    # RFID and camera, no barcode
-                    prod = pick_product()
-                    events.append({"timestamp": timestamp, "event_type": "rfid_read", "scanner_id": scanner, "product_id": prod["name"], "rfid_tag": prod["rfid"]})
-                    events.append({"timestamp": timestamp, "event_type": "camera_image", "scanner_id": scanner, "product_id": prod["name"], "camera_label": prod["name"]})
-                    incident_log.append({"timestamp": timestamp, "scanner_id": scanner, "incident": "scanner_avoidance", "product": prod["name"]})
-                elif incident == "product_swap":
-                    # Barcode for cheap, RFID/camera for expensive
-                    cheap = pick_product()
-                    expensive = pick_product(exclude=cheap["name"])
-                    events.append({"timestamp": timestamp, "event_type": "barcode_scan", "scanner_id": scanner, "product_id": cheap["name"], "barcode_data": cheap["barcode"]})
-                    events.append({"timestamp": timestamp, "event_type": "rfid_read", "scanner_id": scanner, "product_id": expensive["name"], "rfid_tag": expensive["rfid"]})
-                    events.append({"timestamp": timestamp, "event_type": "camera_image", "scanner_id": scanner, "product_id": expensive["name"], "camera_label": expensive["name"]})
-                    incident_log.append({"timestamp": timestamp, "scanner_id": scanner, "incident": "product_swap", "barcode": cheap["name"], "actual": expensive["name"]})
-                elif incident == "unscanned_item":
-                    # RFID/camera only
-                    prod = pick_product()
-                    events.append({"timestamp": timestamp, "event_type": "rfid_read", "scanner_id": scanner, "product_id": prod["name"], "rfid_tag": prod["rfid"]})
-                    events.append({"timestamp": timestamp, "event_type": "camera_image", "scanner_id": scanner, "product_id": prod["name"], "camera_label": prod["name"]})
-                    incident_log.append({"timestamp": timestamp, "scanner_id": scanner, "incident": "unscanned_item", "product": prod["name"]})
-                elif incident == "queue_buildup":
-                    # Queue length high
-                    queue_len = random.randint(6, 10)
-                    events.append({"timestamp": timestamp, "event_type": "queue_status", "scanner_id": scanner, "queue_length": queue_len})
-                    incident_log.append({"timestamp": timestamp, "scanner_id": scanner, "incident": "queue_buildup", "queue_length": queue_len})
-                elif incident == "scanner_failure":
-                    # Equipment failure
-                    events.append({"timestamp": timestamp, "event_type": "equipment_status", "scanner_id": scanner, "equipment_status": "failure"})
-                    scanner_status[scanner] = "failure"
-                    incident_log.append({"timestamp": timestamp, "scanner_id": scanner, "incident": "scanner_failure"})
-                elif incident == "long_wait":
-                    # Customer present for long time
-                    events.append({"timestamp": timestamp, "event_type": "camera_image", "scanner_id": scanner, "product_id": "customer_present"})
-                    incident_log.append({"timestamp": timestamp, "scanner_id": scanner, "incident": "long_wait"})
-        # Normal events for operational scanners
-        for scanner in SCANNERS:
-            if scanner_status[scanner] == "operational":
-                if random.random() < 0.7:  # 70% chance of normal transaction
-                    prod = pick_product()
-                    events.append({"timestamp": timestamp, "event_type": "barcode_scan", "scanner_id": scanner, "product_id": prod["name"], "barcode_data": prod["barcode"]})
-                    events.append({"timestamp": timestamp, "event_type": "rfid_read", "scanner_id": scanner, "product_id": prod["name"], "rfid_tag": prod["rfid"]})
-                    events.append({"timestamp": timestamp, "event_type": "camera_image", "scanner_id": scanner, "product_id": prod["name"], "camera_label": prod["name"]})
-                # Queue status every 30 seconds
-                if sec % 30 == 0:
-                    queue_len = random.randint(0, 5)
-                    events.append({"timestamp": timestamp, "event_type": "queue_status", "scanner_id": scanner, "queue_length": queue_len})
-            else:
-                # If failed, only queue and equipment status
-                if sec % 30 == 0:
-                    queue_len = random.randint(3, 10)
-                    events.append({"timestamp": timestamp, "event_type": "queue_status", "scanner_id": scanner, "queue_length": queue_len})
-                if sec % 60 == 0:
-                    events.append({"timestamp": timestamp, "event_type": "equipment_status", "scanner_id": scanner, "equipment_status": "failure"})
-        # Randomly recover failed scanners after 5-10 minutes
-        for scanner in SCANNERS:
-            if scanner_status[scanner] == "failure" and random.random() < 0.01:
-                events.append({"timestamp": timestamp, "event_type": "equipment_status", "scanner_id": scanner, "equipment_status": "operational"})
-                scanner_status[scanner] = "operational"
-    # Write dataset
-    with open("retail_events.json", "w") as f:
-        json.dump(events, f, indent=2)
-    with open("incident_log.json", "w") as f:
-        json.dump(incident_log, f, indent=2)
+    parser = argparse.ArgumentParser(description="Generate a synthetic retail events dataset.")
+    parser.add_argument("--lanes", type=int, default=LANES, help="number of checkout lanes (scanners)")
+    parser.add_argument("--duration", default=str(SECONDS), help="length of the dataset, e.g. 3600, 8h, 7d")
+    parser.add_argument("--start", default=START_TIME.isoformat(), help="timestamp of the first second")
+    parser.add_argument("--rate", type=float, default=TRANSACTION_RATE, help="transactions per lane per second")
+    parser.add_argument("--incident-scale", type=float, default=1.0, help="multiplier for every incident rate")
+    parser.add_argument("--incident-mix", default="", help="per-lane-hour overrides, e.g. product_swap=2,long_wait=0")
+    parser.add_argument("--format", choices=["json", "ndjson", "store"], default="json",
+                        help="json: one retail_events.json/incident_log.json pair; ndjson/store: one shard per lane group")
+    parser.add_argument("--out", default=".", help="output directory")
+    parser.add_argument("--lanes-per-shard", type=int, default=LANES_PER_SHARD)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    args.seconds = parse_duration(args.duration)
+    args.start = datetime.fromisoformat(args.start.replace("Z", ""))
+    incident_rates = parse_mix(args.incident_mix, args.incident_scale)
+    os.makedirs(args.out, exist_ok=True)
+
+    # One seed per shard, so a shard's contents don't depend on the number of workers
+    shards = [list(range(i, min(i + args.lanes_per_shard, args.lanes))) for i in range(0, args.lanes, args.lanes_per_shard)]
+    seeds = np.random.SeedSequence(args.seed).spawn(len(shards))
+    tasks = [(i, lanes, args, incident_rates, seed) for i, (lanes, seed) in enumerate(zip(shards, seeds))]
+    started = time.perf_counter()
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(tasks))) as pool:
+            results = list(pool.map(run_shard, tasks))
+    else:
+        results = [run_shard(task) for task in tasks]
+
+    if args.format == "json":
+        # Merge the shards back into one time-ordered file
+        events = _concat([r[0] for r in results], EVENT_COLUMNS)
+        incidents = _concat([r[1] for r in results], INCIDENT_COLUMNS)
+        order = np.lexsort((events["lane"], events["phase"], events["sec"]))
+        events = {name: values[order] for name, values in events.items()}
+        order = np.lexsort((incidents["lane"], incidents["incident"], incidents["sec"]))
+        incidents = {name: values[order] for name, values in incidents.items()}
+        formatter = Formatter(args.start, args.seconds, args.lanes)
+        for name, lines in [("retail_events.json", formatter.events(events).tolist()),
+                            ("incident_log.json", formatter.incidents(incidents))]:
+            with open(os.path.join(args.out, name), "w") as f:
+                f.write("[\n  " + ",\n  ".join(lines) + "\n]\n" if lines else "[]\n")
+        counts = [(len(events["sec"]), len(incidents["sec"]))]
+    else:
+        counts = results
+    elapsed = time.perf_counter() - started
+    n_events = sum(c[0] for c in counts)
+    print(f"Generated {n_events} events and {sum(c[1] for c in counts)} incidents for {args.lanes} lanes over "
+          f"{args.seconds} s in {len(tasks)} shard(s), {elapsed:.2f} s ({n_events / max(elapsed, 1e-9):.0f} events/s)")
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,36 @@
+import json
 import streamlit as st
 import pandas as pd
-import joblib
 import requests
 from datetime import datetime
-from feature_extraction import extract_features
+from feature_extraction import extract_feature_frame
+from session_state import SessionStore
+from model_export import load_model, default_model_path
+from model_registry import ModelRegistry
+from result_cache import ResultCache
 
 st.set_page_config(page_title="Retail Incident Intelligence Dashboard", layout="wide")
 st.title("Retail Incident Intelligence Dashboard")
 
-MODEL_PATH = 'output/xgboost_best_model.joblib'
 API_URL = 'http://localhost:8000/validate'
 
+# The registry's production model (see model_registry.py) when there is a
+# registry, else the native export or the joblib model. Read on every rerun,
+# so a promotion shows up without restarting the dashboard.
+registry = ModelRegistry()
+production = registry.manifest()['production'] if registry.exists() else None
+MODEL_PATH = registry.path(production) if production else default_model_path()
+
 @st.cache_resource
-def load_model():
-    return joblib.load(MODEL_PATH)
+def load_model_and_pipeline(model_path: str):
+    # Loaded on first upload, not on page load: importing xgboost dominates startup.
+    # Cached per path; registry versions never change once registered.
+    return load_model(model_path)
 
-model = load_model()
+@st.cache_resource
+def load_result_cache():
+    # Shared by every session: re-uploaded or overlapping events skip encoding and the model
+    return ResultCache()
 
 st.sidebar.header("Validation Data Upload")
 uploaded_file = st.sidebar.file_uploader("Upload validation dataset (JSON)", type=["json"])
@@ -25,35 +40,33 @@ if uploaded_file:
     st.write("### Uploaded Events", raw_events.head())
     # Feature engineering automation
     # 1. Extract features
-    features = extract_features(raw_events.to_dict(orient="records"))
-    df = pd.DataFrame(features)
-    # 2. Session-level aggregation (as in feature_engineering.py)
-    session_features = df.groupby('scanner_id').agg({
-        'event_type': 'count',
-        'product_id': 'nunique',
-        'queue_length': 'mean',
-        'equipment_status': lambda x: (x == 'failure').sum(),
-    }).reset_index()
-    session_features.columns = ['scanner_id', 'event_count', 'unique_products', 'avg_queue_length', 'failures']
-    # 3. Merge session features
-    df = df.merge(session_features, on='scanner_id', how='left')
-    # 4. Encode categorical columns to numeric
-    X = df.drop(['timestamp'], axis=1, errors='ignore')
-    for col in X.select_dtypes(include=['object']).columns:
-        X[col] = X[col].astype('category').cat.codes
-    # 5. Check for required features
-    required_features = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'queue_length', 'equipment_status', 'event_count', 'unique_products', 'avg_queue_length', 'failures']
-    missing_features = [f for f in required_features if f not in X.columns]
+    events = extract_feature_frame(raw_events)
+    # 2. Session-level features: running per-scanner aggregates over this upload (as in feature_engineering.py)
+    df = SessionStore().annotate_frame(events)
+    model, pipeline = load_model_and_pipeline(MODEL_PATH)
+    # 3. Check for required features
+    missing_features = [f for f in pipeline.features if f not in df.columns]
     if missing_features:
         st.error(f"Missing required features for model: {missing_features}. Please ensure your data includes all necessary columns.")
     else:
-        # Predict incidents (ML)
-        preds = model.predict(X)
+        # 4. Predict incidents (ML), encoding with the vocabularies the model was trained with;
+        # events already scored by this model come from the result cache
+        predict = lambda frame: model.predict(pipeline.transform(frame))
+        if pipeline.fitted:
+            cache = load_result_cache()
+            # Keyed on the event's own fields, not this upload's running session
+            # features, so events shared by overlapping uploads are hits; a hit
+            # keeps the prediction from the upload that first scored the event
+            preds = cache.score(MODEL_PATH, events, lambda rows: predict(df.loc[rows.index]))
+            stats = cache.stats()
+            st.sidebar.caption(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        else:
+            preds = predict(df)
         ml_incidents = df.iloc[preds == 1].copy()
         def infer_incident(row):
             if row.get('equipment_status') == 'failure':
                 return 'scanner_failure'
-            if row.get('queue_length', 0) >= 8:
+            if pd.notna(row.get('queue_length')) and row['queue_length'] >= 8:
                 return 'queue_buildup'
             if row.get('event_type') == 'rfid_read' and row.get('product_id'):
                 return 'unscanned_item'
@@ -122,32 +135,14 @@ if st.sidebar.button("Validate Live Data") and live_json:
     try:
         # Parse and feature engineer live events
         live_events = pd.read_json(live_json)
-        features = extract_features(live_events.to_dict(orient="records"))
-        df = pd.DataFrame(features)
-        session_features = df.groupby('scanner_id').agg({
-            'event_type': 'count',
-            'product_id': 'nunique',
-            'queue_length': 'mean',
-            'equipment_status': lambda x: (x == 'failure').sum(),
-        }).reset_index()
-        session_features.columns = ['scanner_id', 'event_count', 'unique_products', 'avg_queue_length', 'failures']
-        df = df.merge(session_features, on='scanner_id', how='left')
-        # Encode categorical columns to numeric
-        X = df.drop(['timestamp'], axis=1, errors='ignore')
-        for col in X.select_dtypes(include=['object']).columns:
-            X[col] = X[col].astype('category').cat.codes
-        # Check for required features
-        required_features = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'queue_length', 'equipment_status', 'event_count', 'unique_products', 'avg_queue_length', 'failures']
-        missing_features = [f for f in required_features if f not in X.columns]
-        if missing_features:
-            st.error(f"Missing required features for model: {missing_features}. Please ensure your live data includes all necessary columns.")
-        else:
-            # Send engineered features to API
-            response = requests.post(API_URL, json={"events": df.to_dict(orient="records")})
-            result = response.json()
-            st.write("### Live Detected Incidents", pd.DataFrame(result['incidents']))
-            st.metric("Live Total Incidents", result['count'])
+        df = extract_feature_frame(live_events)
+        # Send extracted features to the API, which adds session features from its own session store
+        payload = json.loads(df.to_json(orient='records', date_format='iso'))
+        response = requests.post(API_URL, json={"events": payload})
+        result = response.json()
+        st.write("### Live Detected Incidents", pd.DataFrame(result['incidents']))
+        st.metric("Live Total Incidents", result['count'])
     except Exception as e:
         st.error(f"API error: {e}")
 
-st.sidebar.info("Model used: output/xgboost_best_model.joblib")
+st.sidebar.info(f"Model used: {production or MODEL_PATH}")
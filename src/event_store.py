@@ -0,0 +1,188 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterable, Iterator, List
+
+import numpy as np
+
+# Columnar on-disk event store.
+#
+# A store is a directory holding one raw little-endian binary file per column
+# plus meta.json with the row count, column dtypes and the dictionaries used to
+# encode string columns. Columns are opened with np.memmap, so loading is
+# zero-copy and several processes reading the same store share page cache.
+
+META_FILE = 'meta.json'
+STORE_VERSION = 1
+
+# String columns are dictionary-encoded as int32 codes; NULL_CODE marks a missing value
+STRING_COLUMNS = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'equipment_status']
+NULL_CODE = -1
+# queue_length is stored as int32; NULL_INT marks a missing value
+NULL_INT = np.iinfo(np.int32).min
+# Timestamps are int64 nanoseconds since the Unix epoch (UTC); NaT marks a missing value
+NULL_TIMESTAMP = np.iinfo(np.int64).min
+
+COLUMN_DTYPES = {
+    'timestamp': '<i8',
+    'queue_length': '<i4',
+    **{col: '<i4' for col in STRING_COLUMNS},
+}
+
+EPOCH = datetime(1970, 1, 1)
+# Rows buffered in memory per column before being appended to disk
+WRITE_CHUNK_ROWS = 1 << 16
+
+def is_store(path: str) -> bool:
+    """Return True if path is an event store directory."""
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+def _to_epoch_ns(ts) -> int:
+    """Epoch nanoseconds of an ISO string or datetime; naive values are UTC, aware ones are converted to UTC."""
+    if ts is None:
+        return NULL_TIMESTAMP
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = ts - EPOCH
+    ns = (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+    # Outside the datetime64[ns] range the timestamp is stored as missing, as in feature frames
+    return ns if NULL_TIMESTAMP < ns <= np.iinfo(np.int64).max else NULL_TIMESTAMP
+
+def write_store(events: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Write events into a columnar store at path, streaming in fixed-size chunks.
+    Returns the number of rows written.
+    """
+    os.makedirs(path, exist_ok=True)
+    files = {col: open(os.path.join(path, col + '.bin'), 'wb') for col in COLUMN_DTYPES}
+    dictionaries = {col: {} for col in STRING_COLUMNS}
+    buffers = {col: [] for col in COLUMN_DTYPES}
+    rows = 0
+
+    def flush():
+        for col, values in buffers.items():
+            np.asarray(values, dtype=COLUMN_DTYPES[col]).tofile(files[col])
+            values.clear()
+
+    try:
+        for event in events:
+            buffers['timestamp'].append(_to_epoch_ns(event.get('timestamp')))
+            queue_length = event.get('queue_length')
+            buffers['queue_length'].append(NULL_INT if queue_length is None else int(queue_length))
+            for col in STRING_COLUMNS:
+                value = event.get(col)
+                if value is None:
+                    buffers[col].append(NULL_CODE)
+                else:
+                    codes = dictionaries[col]
+                    code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(codes)
+                    buffers[col].append(code)
+            rows += 1
+            if rows % WRITE_CHUNK_ROWS == 0:
+                flush()
+        flush()
+    finally:
+        for f in files.values():
+            f.close()
+    _write_meta(path, rows, {col: list(codes) for col, codes in dictionaries.items()})
+    return rows
+
+def _write_meta(path: str, rows: int, dictionaries: Dict[str, List[str]]) -> None:
+    meta = {
+        'version': STORE_VERSION,
+        'rows': rows,
+        'columns': COLUMN_DTYPES,
+        'dictionaries': dictionaries,
+    }
+    # Write metadata last so a partially written store is never picked up
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+def write_columns(columns: Dict[str, np.ndarray], dictionaries: Dict[str, List[str]], path: str) -> int:
+    """
+    Write already-encoded columns as a store: epoch-ns timestamps, string
+    columns as codes into dictionaries, NULL_* values for missing entries.
+    Returns the number of rows written.
+    """
+    os.makedirs(path, exist_ok=True)
+    rows = len(columns['timestamp'])
+    for col, dtype in COLUMN_DTYPES.items():
+        np.asarray(columns[col], dtype=dtype).tofile(os.path.join(path, col + '.bin'))
+    _write_meta(path, rows, {col: list(dictionaries.get(col, [])) for col in STRING_COLUMNS})
+    return rows
+
+class EventStore:
+    """Read-only, memory-mapped view of an event store."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILE), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported event store version: {meta.get('version')}")
+        self.path = path
+        self.rows = meta['rows']
+        self.dictionaries = {col: np.array(values, dtype=object) for col, values in meta['dictionaries'].items()}
+        self.columns = {}
+        for col, dtype in meta['columns'].items():
+            if self.rows:
+                self.columns[col] = np.memmap(os.path.join(path, col + '.bin'), dtype=dtype, mode='r', shape=(self.rows,))
+            else:
+                self.columns[col] = np.empty(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def timestamps(self) -> np.ndarray:
+        """Timestamps as a zero-copy datetime64[ns] view."""
+        return self.columns['timestamp'].view('datetime64[ns]')
+
+    def codes(self, col: str) -> np.ndarray:
+        """Dictionary codes of a string column (NULL_CODE for missing)."""
+        return self.columns[col]
+
+    def decode(self, col: str) -> np.ndarray:
+        """Decoded values of a string column as an object array (None for missing)."""
+        values = np.append(self.dictionaries[col], None)
+        return values[self.columns[col]]
+
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Yield rows as event dicts shaped like preprocess.iter_events output."""
+        timestamps = self.columns['timestamp']
+        queue_lengths = self.columns['queue_length']
+        codes = [(col, self.columns[col], self.dictionaries[col]) for col in STRING_COLUMNS]
+        for start in range(0, self.rows, WRITE_CHUNK_ROWS):
+            stop = min(start + WRITE_CHUNK_ROWS, self.rows)
+            ts_chunk = timestamps[start:stop].tolist()
+            ql_chunk = queue_lengths[start:stop].tolist()
+            code_chunks = [(col, column[start:stop].tolist(), values) for col, column, values in codes]
+            for i in range(stop - start):
+                event = {}
+                if ts_chunk[i] != NULL_TIMESTAMP:
+                    event['timestamp'] = EPOCH + timedelta(microseconds=ts_chunk[i] // 1000)
+                for col, chunk, values in code_chunks:
+                    if chunk[i] != NULL_CODE:
+                        event[col] = values[chunk[i]]
+                if ql_chunk[i] != NULL_INT:
+                    event['queue_length'] = ql_chunk[i]
+                yield event
+
+def open_store(path: str) -> EventStore:
+    """Memory-map an event store written by write_store."""
+    return EventStore(path)
+
+def convert(json_path: str, store_path: str) -> int:
+    """Convert a JSON array or NDJSON events file into an event store."""
+    from preprocess import iter_events
+    return write_store(iter_events(json_path), store_path)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python src/event_store.py <events.json|events.ndjson> <store_dir>")
+        sys.exit(1)
+    n = convert(sys.argv[1], sys.argv[2])
+    print(f"Wrote {n} events to {sys.argv[2]}")
@@ -1,16 +1,22 @@
 import json
 from datetime import datetime
-from typing import List, Dict, Any
-from preprocess import load_events
+from typing import List, Dict, Any, Iterable, Iterator, Union
+import numpy as np
+import pandas as pd
+from preprocess import iter_events, iter_raw_events
 
 # Feature extraction for retail events
 
-def extract_features(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+FEATURE_COLUMNS = ['timestamp', 'event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'queue_length', 'equipment_status']
+CATEGORICAL_COLUMNS = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'equipment_status']
+# Nullable integer dtype used for queue_length
+QUEUE_LENGTH_DTYPE = 'Int32'
+
+def iter_features(events: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
     """
-    Extracts features from raw event data for downstream analysis.
-    Returns a list of feature dicts, one per event.
+    Lazily extracts features from raw event data, one feature dict per event.
+    Accepts any iterable, e.g. the generator returned by preprocess.iter_events.
     """
-    features = []
     for event in events:
         feat = {}
         # Basic features
@@ -24,11 +30,86 @@ def extract_features(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         feat['queue_length'] = event.get('queue_length')
         feat['equipment_status'] = event.get('equipment_status')
         # Add more features as needed
-        features.append(feat)
-    return features
+        yield feat
+
+def extract_features(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Extracts features from raw event data for downstream analysis.
+    Returns a list of feature dicts, one per event.
+    """
+    return list(iter_features(events))
+
+def _typed_frame(columns: Dict[str, Any]) -> pd.DataFrame:
+    """Build the typed feature frame from raw column values, dropping rows with invalid timestamps."""
+    raw_ts = pd.Series(columns['timestamp'], dtype=object)
+    parsed = pd.to_datetime(raw_ts, format='ISO8601', errors='coerce', utc=True).dt.tz_localize(None)
+    # Valid ISO timestamps outside the datetime64[ns] range (e.g. year 1500) keep their
+    # row, like load_events does, but carry NaT since the frame and store are ns-based.
+    in_range = parsed.between(pd.Timestamp.min, pd.Timestamp.max)
+    ts = parsed.where(in_range).astype('datetime64[ns]')
+    df = pd.DataFrame({'timestamp': ts})
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = pd.Categorical(columns[col])
+    df['queue_length'] = pd.to_numeric(pd.Series(columns['queue_length'], dtype=object), errors='coerce').astype(QUEUE_LENGTH_DTYPE)
+    # Same rule as preprocess.clean_event: skip events whose timestamp is present but unparseable
+    invalid = parsed.isna() & raw_ts.notna()
+    if invalid.any():
+        df = df[~invalid].reset_index(drop=True)
+    return df[FEATURE_COLUMNS]
+
+def _frame_from_store(store) -> pd.DataFrame:
+    """Build the feature frame straight from memory-mapped store columns."""
+    from event_store import NULL_INT
+    df = pd.DataFrame({'timestamp': store.timestamps()})
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = pd.Categorical.from_codes(store.codes(col), categories=store.dictionaries[col])
+    queue_length = store.columns['queue_length']
+    df['queue_length'] = pd.arrays.IntegerArray(queue_length.astype('int32'), queue_length == NULL_INT)
+    return df[FEATURE_COLUMNS]
+
+def extract_feature_frame(source: Union[str, pd.DataFrame, Iterable[Dict[str, Any]]]) -> pd.DataFrame:
+    """
+    Batch feature extraction into a typed DataFrame, without a per-event feature dict.
+    source may be an events file path (JSON array, NDJSON or event store), a
+    DataFrame of raw events, or an iterable of event dicts. String fields become
+    categoricals, queue_length a nullable integer and timestamp datetime64.
+    """
+    if isinstance(source, str):
+        from event_store import is_store, open_store
+        if is_store(source):
+            return _frame_from_store(open_store(source))
+        source = iter_raw_events(source)
+    if isinstance(source, pd.DataFrame):
+        columns = {col: source[col].to_numpy(dtype=object) if col in source.columns else [None] * len(source) for col in FEATURE_COLUMNS}
+        return _typed_frame(columns)
+    columns = {col: [] for col in FEATURE_COLUMNS}
+    appenders = [(col, columns[col].append) for col in FEATURE_COLUMNS]
+    for event in source:
+        get = event.get
+        for col, append in appenders:
+            append(get(col))
+    return _typed_frame(columns)
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """Column values as a Python list with None for missing entries."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        lookup = np.append(series.cat.categories.to_numpy(dtype=object), None)
+        return lookup[series.cat.codes.to_numpy()].tolist()
+    # A copy: pandas may hand back a read-only view of the column
+    values = series.to_numpy(dtype=object, copy=True)
+    values[series.isna().to_numpy()] = None
+    return values.tolist()
+
+def iter_frame_features(df: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+    """Yield feature dicts from a feature frame, shaped like iter_features output (None for missing values)."""
+    columns = [col for col in FEATURE_COLUMNS if col != 'timestamp']
+    values = [df['timestamp'].dt.to_pydatetime().tolist()] + [_column_values(df[col]) for col in columns]
+    keys = ['timestamp'] + columns
+    for row in zip(*values):
+        yield dict(zip(keys, row))
 
 if __name__ == '__main__':
-    events = load_events('c:\\Users\\tt8445\\Documents\\GitHub\\linkedin\\retail_events.json')
+    events = iter_events('c:\\Users\\tt8445\\Documents\\GitHub\\linkedin\\retail_events.json')
     features = extract_features(events)
     print(f"Extracted features for {len(features)} events.")
     for f in features[:3]:
@@ -0,0 +1,166 @@
+import os
+import warnings
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from session_state import SESSION_FEATURES, SESSION_FEATURES_VERSION
+
+# Feature encoding shared by training and serving.
+#
+# A fitted FeaturePipeline holds one sorted vocabulary array per categorical
+# column. Encoding maps each distinct value of a batch to its position in the
+# vocabulary with a binary search, then takes codes for every row by array
+# lookup, so the same product gets the same integer in every batch. Values not
+# seen during fit get UNKNOWN_CODE; missing values are encoded as MISSING_TOKEN.
+# The pipeline is saved with joblib next to the model it was trained with,
+# along with the SESSION_FEATURES_VERSION its session features were computed
+# under; loading one from an older definition warns (see check_session_features).
+
+CATEGORICAL_FEATURES = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'equipment_status']
+MODEL_FEATURES = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'queue_length', 'equipment_status'] + SESSION_FEATURES
+UNKNOWN_CODE = -1
+MISSING_TOKEN = 'missing'
+
+def pipeline_path(model_path: str) -> str:
+    """Path of the pipeline artifact saved next to a model file."""
+    root, _ = os.path.splitext(model_path)
+    return root + '.pipeline.joblib'
+
+def _as_categorical(series: pd.Series) -> pd.Series:
+    """Series as a categorical of strings, with missing values replaced by MISSING_TOKEN."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object).where(series.notna(), None).astype('category')
+    categories = series.cat.categories.astype(str)
+    if not categories.equals(series.cat.categories):
+        series = series.cat.rename_categories(categories)
+    if series.isna().any():
+        if MISSING_TOKEN not in series.cat.categories:
+            series = series.cat.add_categories([MISSING_TOKEN])
+        series = series.fillna(MISSING_TOKEN)
+    return series
+
+class FeaturePipeline:
+    """Fitted categorical vocabularies plus the ordered model feature list."""
+
+    def __init__(self, features: Optional[List[str]] = None):
+        self.features = list(features or MODEL_FEATURES)
+        self.categorical = [col for col in self.features if col in CATEGORICAL_FEATURES]
+        self.vocabularies: Dict[str, np.ndarray] = {}
+        self.session_features_version = SESSION_FEATURES_VERSION
+        # value -> code dicts for encode_record, built on first use
+        self._lookups = None
+
+    @property
+    def fitted(self) -> bool:
+        return bool(self.vocabularies) or not self.categorical
+
+    def partial_fit(self, df: pd.DataFrame) -> 'FeaturePipeline':
+        """Add the values of a batch to the vocabularies (e.g. one shard at a time)."""
+        for col in self.categorical:
+            values = _as_categorical(df[col]).cat.categories.to_numpy(dtype=str)
+            current = self.vocabularies.get(col, np.array([MISSING_TOKEN]))
+            self.vocabularies[col] = np.union1d(current, values)
+        self._lookups = None
+        return self
+
+    def fit(self, df: pd.DataFrame) -> 'FeaturePipeline':
+        self.vocabularies = {}
+        return self.partial_fit(df)
+
+    def encode(self, col: str, series: pd.Series) -> np.ndarray:
+        """Vocabulary codes for one categorical column; UNKNOWN_CODE for unseen values."""
+        series = _as_categorical(series)
+        vocab = self.vocabularies[col]
+        categories = series.cat.categories.to_numpy(dtype=str)
+        pos = np.searchsorted(vocab, categories)
+        clipped = np.minimum(pos, len(vocab) - 1)
+        table = np.where(vocab[clipped] == categories, pos, UNKNOWN_CODE).astype(np.int32)
+        return table[series.cat.codes.to_numpy()]
+
+    def encode_record(self, feat: Dict[str, Any]) -> np.ndarray:
+        """Model input row for one feature dict, equal to a one-row transform() without building a frame."""
+        if not self.fitted:
+            # Per-batch codes mean nothing for a single record
+            raise ValueError("encode_record needs fitted vocabularies; fit the pipeline or load a model saved with one")
+        if self._lookups is None:
+            self._lookups = {col: {value: code for code, value in enumerate(vocab.tolist())}
+                             for col, vocab in self.vocabularies.items()}
+        row = np.empty(len(self.features), dtype=float)
+        for i, col in enumerate(self.features):
+            value = feat.get(col)
+            if value is not None and value != value:
+                value = None  # NaN
+            if col in self.categorical:
+                row[i] = self._lookups[col].get(MISSING_TOKEN if value is None else str(value), UNKNOWN_CODE)
+            else:
+                try:
+                    row[i] = np.nan if value is None else float(value)
+                except (TypeError, ValueError):
+                    row[i] = np.nan
+        return row
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Numeric model input with columns in self.features order."""
+        X = pd.DataFrame(index=df.index)
+        legacy = not self.fitted
+        for col in self.features:
+            if col in self.categorical:
+                if legacy:
+                    # No fitted vocabulary: per-batch codes, as before the pipeline existed
+                    X[col] = df[col].astype('category').cat.codes
+                else:
+                    X[col] = self.encode(col, df[col])
+            else:
+                X[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+        return X
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+    def to_schema(self) -> Dict[str, Any]:
+        """Plain-JSON description of the encoding: feature order, categorical columns and vocabularies."""
+        return {'features': self.features, 'categorical': self.categorical,
+                'vocabularies': {col: vocab.tolist() for col, vocab in self.vocabularies.items()},
+                'session_features_version': self.session_features_version}
+
+    @classmethod
+    def from_schema(cls, schema: Dict[str, Any]) -> 'FeaturePipeline':
+        pipeline = cls(schema['features'])
+        pipeline.vocabularies = {col: np.array(vocab, dtype=str) for col, vocab in schema['vocabularies'].items()}
+        # Schemas written before the version was recorded used the old definition
+        pipeline.session_features_version = schema.get('session_features_version', 1)
+        return pipeline
+
+    def save(self, path: str) -> None:
+        import joblib  # only needed when writing or reading the joblib artifact
+        joblib.dump({'features': self.features, 'vocabularies': self.vocabularies,
+                     'session_features_version': self.session_features_version}, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'FeaturePipeline':
+        import joblib
+        state = joblib.load(path)
+        pipeline = cls(state['features'])
+        pipeline.vocabularies = state['vocabularies']
+        pipeline.session_features_version = state.get('session_features_version', 1)
+        return pipeline
+
+def check_session_features(pipeline: FeaturePipeline, model_path: str) -> None:
+    """Warn when a model was trained on session features computed differently from how serving computes them."""
+    if pipeline.session_features_version != SESSION_FEATURES_VERSION and set(SESSION_FEATURES) & set(pipeline.features):
+        warnings.warn(f"{model_path} was trained on session features version {pipeline.session_features_version}, "
+                      f"but serving computes version {SESSION_FEATURES_VERSION} (per-scanner running aggregates); "
+                      f"its predictions will be off until it is retrained")
+
+def load_pipeline(model_path: str) -> FeaturePipeline:
+    """Load the pipeline saved next to model_path, or an unfitted one for models trained before it existed."""
+    path = pipeline_path(model_path)
+    if os.path.exists(path):
+        pipeline = FeaturePipeline.load(path)
+        check_session_features(pipeline, model_path)
+        return pipeline
+    warnings.warn(f"No feature pipeline found at {path}; falling back to per-batch category codes, and the "
+                  f"model's session features predate the per-scanner running aggregates. Retrain to produce one.")
+    return FeaturePipeline()
@@ -1,55 +1,583 @@
-from fastapi import FastAPI, Request
+import time
+_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
-import joblib
+from typing import List, Dict, Any, Optional, Callable
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import numpy as np
 import pandas as pd
 import uvicorn
 from datetime import datetime
+from feature_extraction import extract_feature_frame
+from session_state import SessionStore
+from model_export import load_model, default_model_path
+from model_registry import ModelRegistry, REGISTRY_DIR
+from result_cache import ResultCache
+
+# Native export (see model_export.py) when there is one, else the joblib model
+MODEL_PATH = os.environ.get('MODEL_PATH') or default_model_path()
+# When the registry exists (see model_registry.py), its production model is
+# served instead of MODEL_PATH, and the manifest is polled every
+# REGISTRY_POLL_S seconds for promotions and shadow candidates (also when it
+# only appears after startup)
+registry = ModelRegistry(os.environ.get('MODEL_REGISTRY', REGISTRY_DIR))
+REGISTRY_POLL_S = float(os.environ.get('REGISTRY_POLL_S', 2))
+# Whether this process loads promoted models itself; prefork workers leave
+# that to the parent, which loads the model once and replaces them
+follow_production = True
+
+class ServingModel:
+    """A loaded model with the feature encoding it was trained with, and its version (or path)."""
+    __slots__ = ('version', 'model', 'pipeline')
+
+    def __init__(self, version: str, model, pipeline):
+        self.version = version
+        self.model = model
+        self.pipeline = pipeline
+
+# The serving model is loaded in the background at startup (start_serving)
+# and /validate waits for model_loading. A native export loads through
+# libxgboost in milliseconds, without importing xgboost or sklearn (see
+# model_export.py), and is warmed up after it is marked ready. What remains
+# of startup is importing fastapi, pandas and numpy, which every request
+# needs: on a single slow core that is about 0.8 s, so a worker is ready at
+# about 0.9 s (startup['imports_s'] and startup['model_ready_s']), not well
+# under a second. A joblib model still imports xgboost and sklearn. Swapping
+# in a new model is one assignment to `active`; a batch already being scored
+# keeps the model it started with.
+active: Optional[ServingModel] = None
+model_loading = None
+# XGBoost threads per predict call (set per worker by serve_prefork)
+model_threads = None
+# Seconds since this module started importing
+startup = {'imports_s': time.perf_counter() - _started, 'app_ready_s': None, 'model_ready_s': None}
+
+# Running session aggregates for every scanner this process has scored
+sessions = SessionStore()
+
+# Requests are scored together: a batch goes to the model once it holds
+# BATCH_MAX_EVENTS events or BATCH_MAX_DELAY_MS after its first request arrived
+BATCH_MAX_EVENTS = int(os.environ.get('BATCH_MAX_EVENTS', 4096))
+BATCH_MAX_DELAY_MS = float(os.environ.get('BATCH_MAX_DELAY_MS', 5))
+# Requests waiting to be batched at most; beyond that /validate answers 503
+BATCH_QUEUE_REQUESTS = int(os.environ.get('BATCH_QUEUE_REQUESTS', 1024))
+
+# Predictions cached by content hash of each event's features (see
+# result_cache.py), so resubmitted events skip encoding and the model.
+# RESULT_CACHE_MB is an approximate cap (an entry count derived from the
+# measured per-entry cost; /cache reports the actual size); 0 turns it off
+RESULT_CACHE_MB = float(os.environ.get('RESULT_CACHE_MB', 64))
+result_cache = ResultCache(int(RESULT_CACHE_MB * 2 ** 20)) if RESULT_CACHE_MB > 0 else None
+
+# Incidents per chunk of a streamed (NDJSON) /validate response
+STREAM_CHUNK_LINES = 10000
+
+def safe_parse_timestamp(x):
+    if isinstance(x, str):
+        try:
+            return datetime.fromisoformat(x.replace('Z', ''))
+        except Exception:
+            return None
+    elif isinstance(x, datetime):
+        return x
+    else:
+        return None
+
+class ShadowScorer:
+    """
+    Scores a sample of production batches with a candidate model and compares
+    predictions and latency. Candidate scoring runs on its own thread, off the
+    request path; a sampled batch that arrives while it is still busy is
+    skipped rather than queued.
+    """
+
+    def __init__(self, candidate: ServingModel, sample: float):
+        self.candidate = candidate
+        self.sample = sample
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.busy = False
+        self.stats = {'batches': 0, 'events': 0, 'agreements': 0, 'production_incidents': 0,
+                      'candidate_incidents': 0, 'production_ms': 0.0, 'candidate_ms': 0.0,
+                      'skipped': 0, 'errors': 0}
+
+    def offer(self, features: pd.DataFrame, preds: np.ndarray, production_ms: float) -> None:
+        if random.random() >= self.sample:
+            return
+        if self.busy:
+            self.stats['skipped'] += 1
+            return
+        self.busy = True
+        self.executor.submit(self._score, features, preds, production_ms)
 
-# Load model
-model = joblib.load('output/xgboost_best_model.joblib')
+    def _score(self, features: pd.DataFrame, preds: np.ndarray, production_ms: float) -> None:
+        try:
+            started = time.perf_counter()
+            candidate_preds = self.candidate.model.predict(self.candidate.pipeline.transform(features))
+            candidate_ms = (time.perf_counter() - started) * 1000
+            stats = self.stats
+            stats['batches'] += 1
+            stats['events'] += len(preds)
+            stats['agreements'] += int((np.asarray(candidate_preds) == np.asarray(preds)).sum())
+            stats['production_incidents'] += int((np.asarray(preds) == 1).sum())
+            stats['candidate_incidents'] += int((np.asarray(candidate_preds) == 1).sum())
+            stats['production_ms'] += production_ms
+            stats['candidate_ms'] += candidate_ms
+        except Exception:
+            self.stats['errors'] += 1
+        finally:
+            self.busy = False
 
-app = FastAPI()
+    def summary(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        batches = stats['batches']
+        stats['agreement_rate'] = stats['agreements'] / stats['events'] if stats['events'] else None
+        stats['production_ms'] = stats['production_ms'] / batches if batches else None
+        stats['candidate_ms'] = stats['candidate_ms'] / batches if batches else None
+        return {'version': self.candidate.version, 'sample': self.sample, 'mean_batch_ms': {
+            'production': stats.pop('production_ms'), 'candidate': stats.pop('candidate_ms')}, **stats}
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+shadow: Optional[ShadowScorer] = None
+
+def score_frame(df: pd.DataFrame) -> np.ndarray:
+    """Model predictions for a frame of raw events, in row order."""
+    # One model for the whole batch, even if a new one is swapped in meanwhile
+    current = active
+    events = extract_feature_frame(df)
+    checkpoint = sessions.checkpoint(events['scanner_id'])
+
+    def predict(frame: pd.DataFrame) -> np.ndarray:
+        # Session features come from the running per-scanner state, not from this batch alone
+        features = sessions.annotate_frame(frame)
+        started = time.perf_counter()
+        # Encode with the training vocabularies so codes mean the same thing in every batch
+        preds = current.model.predict(current.pipeline.transform(features))
+        if shadow is not None:
+            shadow.offer(features, preds, (time.perf_counter() - started) * 1000)
+        return preds
+    try:
+        # Without fitted vocabularies codes are per batch, so a prediction can't be reused
+        if result_cache is None or not current.pipeline.fitted:
+            return predict(events)
+        # Keyed on the event itself: an event resubmitted in a later request gets the
+        # prediction it got the first time and isn't counted in its scanner's
+        # session state again; repeats within this batch are all scored and counted
+        return result_cache.score(current.version, events, predict)
+    except Exception:
+        # A failed batch leaves the session state as it was, so its requests can be scored again
+        sessions.restore(checkpoint)
+        raise
+
+class MicroBatcher:
+    """
+    Async scoring queue. Each request submits its event frame and awaits its
+    slice of the predictions; a background task concatenates queued frames
+    into one batch and scores it off the event loop. Batches are scored one at
+    a time, in arrival order, so session state advances exactly as if the
+    requests had been scored one after another. If a batch fails, its requests
+    are scored again one by one (score must leave no state behind when it
+    raises), so only the request at fault gets the error. At most max_queued
+    requests wait; submit() raises asyncio.QueueFull beyond that.
+    """
+
+    def __init__(self, score: Callable[[pd.DataFrame], np.ndarray], max_events: int = BATCH_MAX_EVENTS,
+                 max_delay_ms: float = BATCH_MAX_DELAY_MS, max_queued: int = BATCH_QUEUE_REQUESTS):
+        self.score = score
+        self.max_events = max_events
+        self.max_delay = max_delay_ms / 1000
+        self.max_queued = max_queued
+        self.queue = None
+        self.task = None
+        # One worker: batches mutate the shared session store
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(self.max_queued)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    async def submit(self, df: pd.DataFrame) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((df, future))
+        return await future
+
+    async def _collect(self) -> List:
+        """Wait for a first request, then take more until the batch is full or the delay runs out."""
+        loop = asyncio.get_running_loop()
+        pending = [await self.queue.get()]
+        size = len(pending[0][0])
+        deadline = loop.time() + self.max_delay
+        while size < self.max_events:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    @staticmethod
+    def _settle(future: asyncio.Future, result=None, exc: Exception = None) -> None:
+        # The request may have been cancelled (client gone) while it waited
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            batch = pd.concat([df for df, _ in pending], ignore_index=True)
+            try:
+                preds = await loop.run_in_executor(self.executor, self.score, batch)
+            except Exception as exc:
+                if len(pending) == 1:
+                    self._settle(pending[0][1], exc=exc)
+                    continue
+                # Score the requests on their own so one bad request doesn't fail the others
+                for df, future in pending:
+                    try:
+                        self._settle(future, await loop.run_in_executor(self.executor, self.score, df))
+                    except Exception as exc:
+                        self._settle(future, exc=exc)
+                continue
+            # Fan the predictions back out to the waiting requests
+            offset = 0
+            for df, future in pending:
+                if not future.done():
+                    future.set_result(preds[offset:offset + len(df)])
+                offset += len(df)
+
+def warm_up(loaded_model, loaded_pipeline) -> None:
+    """Score one row so the first request doesn't pay for warm-up."""
+    loaded_model.predict(pd.DataFrame(np.zeros((1, len(loaded_pipeline.features))), columns=loaded_pipeline.features))
+
+def load_serving_model(version: str = None, warm: bool = True) -> ServingModel:
+    """Load a registry version (default: production), or MODEL_PATH when there is no registry."""
+    if registry.exists():
+        version = version or registry.manifest()['production']
+        if version is None:
+            raise LookupError(f"The model registry at {registry.root} has no production model")
+        loaded, loaded_pipeline = registry.load(version)
+    else:
+        version = MODEL_PATH
+        loaded, loaded_pipeline = load_model(MODEL_PATH)
+    if model_threads:
+        loaded.set_params(n_jobs=model_threads)
+    if warm:
+        warm_up(loaded, loaded_pipeline)
+    return ServingModel(version, loaded, loaded_pipeline)
+
+def start_serving() -> None:
+    global active
+    active = load_serving_model(warm=False)
+    startup['model_ready_s'] = time.perf_counter() - _started
+    print(f"Startup: imports {startup['imports_s']:.2f} s, accepting requests at {startup['app_ready_s']:.2f} s, "
+          f"model ready at {startup['model_ready_s']:.2f} s ({active.version})")
+    # After the model is marked ready: requests arriving meanwhile just share the first predict's cost
+    warm_up(active.model, active.pipeline)
+
+async def watch_registry() -> None:
+    """Load newly promoted models and shadow candidates in the background and swap them in."""
+    global active, shadow
+    loop = asyncio.get_running_loop()
+    try:
+        await model_loading
+    except Exception as exc:
+        # e.g. nothing promoted yet: keep watching, and serve once something is
+        print(f"No model loaded at startup: {exc}")
+    stamp = None
+    while True:
+        await asyncio.sleep(REGISTRY_POLL_S)
+        current = registry.stamp()
+        if current is None or current == stamp:
+            continue
+        # A version that fails to load is reported once and not retried until the manifest changes again
+        stamp = current
+        try:
+            manifest = registry.manifest()
+        except (OSError, ValueError) as exc:
+            print(f"Could not read the model registry manifest: {exc}")
+            continue
+        production = manifest.get('production')
+        serving = active.version if active else None
+        if follow_production and production and production != serving:
+            try:
+                active = await loop.run_in_executor(None, load_serving_model, production)
+                print(f"Serving model {production}")
+            except Exception as exc:
+                print(f"Could not load model {production}, still serving {serving}: {exc}")
+        candidate, sample = manifest.get('candidate'), manifest.get('shadow_sample', 0.0)
+        if shadow is not None and (shadow.candidate.version != candidate or not sample):
+            shadow.close()
+            shadow = None
+            print("Shadow scoring stopped")
+        if candidate and sample:
+            if shadow is None:
+                try:
+                    loaded = await loop.run_in_executor(None, load_serving_model, candidate)
+                    shadow = ShadowScorer(loaded, sample)
+                    print(f"Shadow scoring {candidate} on {sample:.0%} of batches")
+                except Exception as exc:
+                    print(f"Could not load candidate model {candidate}: {exc}")
+            else:
+                shadow.sample = sample
+
+batcher = MicroBatcher(score_frame)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global model_loading
+    await batcher.start()
+    startup['app_ready_s'] = time.perf_counter() - _started
+    loop = asyncio.get_running_loop()
+    if active is None:
+        model_loading = loop.run_in_executor(None, start_serving)
+    else:
+        # Preloaded by the prefork parent (serve_prefork)
+        model_loading = loop.create_future()
+        model_loading.set_result(None)
+    watcher = asyncio.create_task(watch_registry())
+    yield
+    watcher.cancel()
+    await batcher.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 class Event(BaseModel):
-    event_name: str
+    event_name: Optional[str] = None
     timestamp: str
-    # Add other fields as needed (product_id, etc.)
-    # ...
+    event_type: Optional[str] = None
+    scanner_id: Optional[str] = None
+    product_id: Optional[str] = None
+    barcode_data: Optional[str] = None
+    rfid_tag: Optional[str] = None
+    camera_label: Optional[str] = None
+    queue_length: Optional[int] = None
+    equipment_status: Optional[str] = None
 
 class EventsRequest(BaseModel):
     events: List[Event]
 
+def incident_rows(preds: np.ndarray) -> np.ndarray:
+    """Row positions of the events predicted as incidents."""
+    return np.flatnonzero(np.asarray(preds) == 1)
+
+def incident_columns(df: pd.DataFrame, rows: np.ndarray):
+    """Event names and ISO timestamps of the events at rows."""
+    if not len(rows):
+        return [], []
+    return df['event_name'].to_numpy()[rows].tolist(), isoformat_column(df['timestamp'].iloc[rows])
+
+def isoformat_column(ts: pd.Series) -> List[Optional[str]]:
+    """datetime.isoformat() of every value (None for missing), formatted column-wise."""
+    if isinstance(ts.dtype, np.dtype) and ts.dtype.kind == 'M':
+        out = ts.dt.strftime('%Y-%m-%dT%H:%M:%S').astype(object).where(ts.notna(), None).to_numpy(copy=True)
+        # Only values with sub-second parts need the per-value fallback
+        fractional = (ts.notna() & (ts != ts.dt.floor('s'))).to_numpy()
+        if fractional.any():
+            out[fractional] = [t.isoformat() for t in ts[fractional]]
+        return out.tolist()
+    return [pd.Timestamp(t).isoformat() if pd.notna(t) else None for t in ts]
+
+def iter_ndjson(df: pd.DataFrame, rows: np.ndarray):
+    """
+    One JSON line per incident, then a summary line with the count. Lines are
+    built STREAM_CHUNK_LINES incidents at a time, so only one chunk of them is
+    ever held in memory.
+    """
+    for start in range(0, len(rows), STREAM_CHUNK_LINES):
+        names, timestamps = incident_columns(df, rows[start:start + STREAM_CHUNK_LINES])
+        yield ''.join(json.dumps({'event_name': name, 'timestamp': ts}) + '\n' for name, ts in zip(names, timestamps))
+    yield json.dumps({'count': len(rows)}) + '\n'
+
 @app.post('/validate')
-def validate_events(request: EventsRequest):
-    # Convert to DataFrame
-    df = pd.DataFrame([e.dict() for e in request.events])
-    # Preprocess timestamps robustly
-    def safe_parse_timestamp(x):
-        if isinstance(x, str):
+async def validate_events(request: EventsRequest, stream: bool = False):
+    """Score events; with ?stream=true the incidents come back as NDJSON."""
+    if request.events:
+        if active is None:
+            await model_loading
+        # Convert to DataFrame
+        df = pd.DataFrame([e.model_dump() for e in request.events])
+        # Preprocess timestamps robustly
+        df['timestamp'] = df['timestamp'].apply(safe_parse_timestamp)
+        # Predict incidents, batched with concurrent requests
+        try:
+            preds = await batcher.submit(df)
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail='Scoring queue is full, retry later', headers={'Retry-After': '1'})
+        rows = incident_rows(preds)
+    else:
+        df, rows = None, np.empty(0, dtype=np.int64)
+    if stream:
+        return StreamingResponse(iter_ndjson(df, rows), media_type='application/x-ndjson')
+    names, timestamps = incident_columns(df, rows)
+    # Serialize the columns directly instead of going through jsonable_encoder per incident
+    incidents = [{'event_name': name, 'timestamp': ts} for name, ts in zip(names, timestamps)]
+    return Response(json.dumps({'incidents': incidents, 'count': len(incidents)}), media_type='application/json')
+
+@app.get('/health')
+async def health():
+    """Readiness: whether the model is loaded, and how long startup took."""
+    return {'model': active.version if active else None, 'ready': active is not None, 'startup': startup}
+
+@app.get('/models')
+async def models():
+    """The model being served and, while one is shadow-scored, the candidate's comparison so far."""
+    return {'registry': registry.root if registry.exists() else None,
+            'production': active.version if active else None,
+            'candidate': shadow.summary() if shadow else None}
+
+@app.get('/cache')
+async def cache_stats():
+    """Result cache counters: hits, misses, entries and memory against the cap."""
+    return result_cache.stats() if result_cache is not None else {'enabled': False}
+
+# How often the prefork parent checks for exited workers
+PREFORK_TICK_S = 0.1
+
+def serve_prefork(host: str, port: int, workers: int) -> None:
+    """
+    Serve with several worker processes sharing one copy of the model.
+
+    The parent loads the model and encoders and opens the listening socket,
+    then forks the workers, which inherit both: the booster and vocabularies
+    stay in pages shared copy-on-write, and the kernel spreads connections
+    over the workers accepting on the socket. Each worker gets
+    cores // workers XGBoost threads and its own micro-batcher and session
+    store, so session features only cover the requests that worker scored.
+    Workers that die are replaced; SIGINT/SIGTERM stop them all.
+
+    The parent also polls the registry: when a new production model is
+    promoted it loads it once and replaces every worker with one forked from
+    it (new workers first, then the old ones finish their requests and exit),
+    so the new model is shared as well. Shadow candidates are still loaded by
+    each worker on its own.
+    """
+    global active, model_threads, follow_production
+    # No warm-up before fork: XGBoost's OpenMP thread pool must start in the workers
+    active = load_serving_model(warm=False)
+    startup['model_ready_s'] = time.perf_counter() - _started
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    # Keep the collector from touching (and so copying) the objects the parent created
+    gc.freeze()
+    threads = model_threads = max(1, (os.cpu_count() or 1) // workers)
+    follow_production = False
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            forked = time.perf_counter()
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            active.model.set_params(n_jobs=threads)
+            warm_up(active.model, active.pipeline)
+            print(f"Worker {os.getpid()} ready {time.perf_counter() - forked:.2f} s after fork")
+            uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+            os._exit(0)
+        return pid
+
+    def terminate(pids) -> None:
+        for pid in pids:
             try:
-                return datetime.fromisoformat(x.replace('Z', ''))
-            except Exception:
-                return None
-        elif isinstance(x, datetime):
-            return x
-        else:
-            return None
-    df['timestamp'] = df['timestamp'].apply(safe_parse_timestamp)
-    # Encode categorical columns to numeric
-    X = df.drop(['event_name', 'timestamp'], axis=1, errors='ignore')
-    for col in X.select_dtypes(include=['object']).columns:
-        X[col] = X[col].astype('category').cat.codes
-    # Predict incidents
-    preds = model.predict(X)
-    incidents = []
-    for i, pred in enumerate(preds):
-        if pred == 1:
-            incidents.append({
-                'event_name': df.iloc[i]['event_name'],
-                'timestamp': df.iloc[i]['timestamp'].isoformat() if df.iloc[i]['timestamp'] else None
-            })
-    return {'incidents': incidents, 'count': len(incidents)}
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def promoted_version(stamp):
+        """(stamp, production version) when the manifest changed since stamp and names a model not being served."""
+        current = registry.stamp()
+        if current is None or current == stamp:
+            return stamp, None
+        try:
+            production = registry.manifest().get('production')
+        except (OSError, ValueError) as exc:
+            print(f"Could not read the model registry manifest: {exc}")
+            return current, None
+        return current, production if production and production != active.version else None
+
+    children = {spawn() for _ in range(workers)}
+    # Old workers finishing their requests after a model swap
+    retiring = set()
+    print(f"Serving {active.version} on http://{host}:{port} with {workers} workers x {threads} thread(s), "
+          f"model loaded in {startup['model_ready_s']:.2f} s")
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        terminate(children | retiring)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    stamp = registry.stamp()
+    next_poll = time.monotonic() + REGISTRY_POLL_S
+    while children or retiring:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            if pid in retiring:
+                retiring.discard(pid)
+            elif pid in children:
+                children.discard(pid)
+                if not stopping:
+                    print(f"Worker {pid} exited with status {status}; starting a replacement")
+                    children.add(spawn())
+            continue
+        if not stopping and time.monotonic() >= next_poll:
+            next_poll = time.monotonic() + REGISTRY_POLL_S
+            stamp, version = promoted_version(stamp)
+            if version:
+                try:
+                    active = load_serving_model(version, warm=False)
+                except Exception as exc:
+                    print(f"Could not load model {version}, still serving {active.version}: {exc}")
+                else:
+                    gc.freeze()
+                    retiring |= children
+                    children = {spawn() for _ in range(workers)}
+                    terminate(retiring)
+                    print(f"Serving model {version}; replacing {len(retiring)} worker(s)")
+        time.sleep(PREFORK_TICK_S)
+    sock.close()
 
 if __name__ == '__main__':
-    uvicorn.run(app, host='0.0.0.0', port=8000)
+    parser = argparse.ArgumentParser(description='Incident validation API.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='prefork this many worker processes sharing the model (POSIX only)')
+    args = parser.parse_args()
+    if args.workers > 1 and hasattr(os, 'fork'):
+        serve_prefork(args.host, args.port, args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,80 @@
+import json
+from typing import List, Dict, Any, Union
+
+import numpy as np
+import pandas as pd
+
+# Incident labels for training data.
+#
+# An event is labeled 1 when an incident in the log has the same timestamp,
+# scanner_id and product (events: product_id; incidents: 'product', missing
+# for incidents that carry none, which then match events without a product).
+# Timestamps are normalized once to int64 nanoseconds since the epoch, so ISO
+# strings with or without 'Z', datetimes and datetime64 columns all key alike.
+# Labeling is a semi-join: a vectorized isin() on timestamps selects the few
+# candidate events, and only those are matched on the full key.
+
+LABEL_COLUMN = 'incident_label'
+# Codes for key values: MISSING for None/NaN, UNSEEN for incident values no event has
+MISSING = -1
+UNSEEN = -2
+NAT = np.iinfo(np.int64).min
+
+def epoch_ns(values) -> np.ndarray:
+    """int64 nanoseconds since the epoch (UTC; naive values are taken as UTC), NaT for unparseable or out-of-range values."""
+    ts = pd.to_datetime(pd.Series(values), format='ISO8601', errors='coerce', utc=True).dt.tz_localize(None)
+    ts = ts.where(ts.between(pd.Timestamp.min, pd.Timestamp.max))
+    return np.asarray(ts.astype('datetime64[ns]')).view(np.int64)
+
+def load_incidents(source: Union[str, List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
+    """Incident log as a frame with timestamp, scanner_id and product columns."""
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            source = json.load(f)
+    incidents = pd.DataFrame(source)
+    for col in ['timestamp', 'scanner_id', 'product']:
+        if col not in incidents:
+            incidents[col] = None
+    return incidents[['timestamp', 'scanner_id', 'product']]
+
+def _codes(values: pd.Series, categories: pd.Index) -> np.ndarray:
+    """Codes of values in categories; MISSING for missing values, UNSEEN for values not in categories."""
+    values = values.astype(object)
+    missing = values.isna().to_numpy()
+    codes = categories.get_indexer(values.where(~missing, None))
+    codes[(codes < 0) & ~missing] = UNSEEN
+    codes[missing] = MISSING
+    return codes
+
+def label_frame(df: pd.DataFrame, incidents, timestamp_col: str = 'timestamp',
+                scanner_col: str = 'scanner_id', product_col: str = 'product_id') -> np.ndarray:
+    """0/1 label per row of df: whether an incident shares its (timestamp, scanner, product) key."""
+    incidents = load_incidents(incidents)
+    labels = np.zeros(len(df), dtype=np.int64)
+    if not len(df) or not len(incidents):
+        return labels
+    event_ts = epoch_ns(df[timestamp_col])
+    incident_ts = epoch_ns(incidents['timestamp'])
+    # Incidents without a usable timestamp can't match anything
+    valid = incident_ts != NAT
+    incidents, incident_ts = incidents[valid], incident_ts[valid]
+    # Candidate events share a timestamp with some incident
+    candidates = np.flatnonzero(np.isin(event_ts, incident_ts))
+    if not len(candidates):
+        return labels
+    # Encode scanner and product on the events' categories, so both sides compare as integers
+    keys = []
+    for event_col, incident_col in [(scanner_col, 'scanner_id'), (product_col, 'product')]:
+        events = df[event_col].iloc[candidates]
+        if isinstance(events.dtype, pd.CategoricalDtype):
+            categories = events.cat.categories
+            event_codes = events.cat.codes.to_numpy().astype(np.int64)
+        else:
+            event_codes, categories = pd.factorize(events.astype(object), use_na_sentinel=True)
+            event_codes = event_codes.astype(np.int64)
+        keys.append((event_codes, _codes(incidents[incident_col], pd.Index(categories).astype(str)
+                                         if len(categories) else pd.Index([], dtype=object))))
+    known = pd.MultiIndex.from_arrays([incident_ts] + [incident for _, incident in keys])
+    candidate_keys = pd.MultiIndex.from_arrays([event_ts[candidates]] + [event for event, _ in keys])
+    labels[candidates[candidate_keys.isin(known)]] = 1
+    return labels
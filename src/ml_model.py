@@ -1,11 +1,13 @@
 import json
+import joblib
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
-from sklearn.preprocessing import LabelEncoder
+from feature_pipeline import FeaturePipeline, pipeline_path
 
 DATA_PATH = 'output/ml_training_data.json'
+MODEL_PATH = 'output/random_forest_model.joblib'
 
 # Load labeled data
 with open(DATA_PATH, 'r') as f:
@@ -17,22 +19,12 @@ features = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag'
 df = pd.DataFrame(data)
 
 
-# Fill missing values: 'missing' for categorical, -1 for numeric
-for col in features:
-    if col == 'queue_length':
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(-1)
-    else:
-        df[col] = df[col].fillna('missing')
-
-# Encode categorical features
-encoders = {}
-for col in ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'equipment_status']:
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col])
-    encoders[col] = le
+# Encode categorical features with fitted vocabularies; missing queue lengths
+# stay NaN (the forest splits on missing values), exactly as serving passes them
+pipeline = FeaturePipeline(features)
+X = pipeline.fit_transform(df)
 
 # Prepare X and y
-X = df[features]
 y = df['incident_label']
 
 # Train/test split
@@ -47,6 +39,10 @@ clf.fit(X_train, y_train)
 y_pred = clf.predict(X_test)
 print(classification_report(y_test, y_pred))
 
+# Save the model with the pipeline that encodes its input
+joblib.dump(clf, MODEL_PATH)
+pipeline.save(pipeline_path(MODEL_PATH))
+print(f"Model saved to {MODEL_PATH}")
 
 # Feature importance
 importances = clf.feature_importances_
@@ -1,6 +1,7 @@
 import json
-from preprocess import load_events
-from feature_extraction import extract_features
+import pandas as pd
+from feature_extraction import extract_feature_frame
+from labeling import label_frame, LABEL_COLUMN
 from datetime import datetime
 from typing import List, Dict, Any
 
@@ -24,27 +25,16 @@ def load_incident_labels(path: str) -> List[Dict[str, Any]]:
 
 def label_events(features: List[Dict[str, Any]], incidents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     # Match by timestamp, scanner_id, and product_id if present
-    incident_set = set()
-    for inc in incidents:
-        key = (inc['timestamp'], inc.get('scanner_id'), inc.get('product'))
-        incident_set.add(key)
-    labeled = []
-    for feat in features:
-        key = (feat.get('timestamp'), feat.get('scanner_id'), feat.get('product_id'))
-        label = 1 if key in incident_set else 0
+    labels = label_frame(pd.DataFrame(features, columns=['timestamp', 'scanner_id', 'product_id']), incidents)
+    for feat, label in zip(features, labels.tolist()):
         feat['incident_label'] = label
-        labeled.append(feat)
-    return labeled
+    return features
 
 if __name__ == '__main__':
-    events = load_events(EVENTS_PATH)
-    features = extract_features(events)
-    incidents = load_incident_labels(INCIDENT_LOG_PATH)
-    labeled_data = label_events(features, incidents)
-    print(f"Prepared {len(labeled_data)} labeled samples.")
+    df = extract_feature_frame(EVENTS_PATH)
+    df[LABEL_COLUMN] = label_frame(df, INCIDENT_LOG_PATH)
+    print(f"Prepared {len(df)} labeled samples.")
     print("Sample labeled data:")
-    for row in labeled_data[:3]:
-        print(row)
+    print(df.head(3))
     # Save to output file
-    with open(OUTPUT_PATH, 'w') as f:
-        json.dump(labeled_data, f, default=str, indent=2)
+    df.to_json(OUTPUT_PATH, orient='records', date_format='iso', indent=2)
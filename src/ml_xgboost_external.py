@@ -0,0 +1,164 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+from typing import List, Tuple
+
+import joblib
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBClassifier
+from sklearn.metrics import classification_report, confusion_matrix
+
+from preprocess import iter_raw_events
+from feature_extraction import extract_feature_frame
+from session_state import SessionStore
+from feature_pipeline import FeaturePipeline, pipeline_path
+from labeling import label_frame
+
+# Out-of-core XGBoost training over sharded event data.
+#
+# Input is a directory of event shards (events-*.ndjson files or events-*
+# event-store directories, as written by generate_retail_dataset.py) plus
+# incident logs (incidents-*.ndjson). Training runs in two stages:
+#   1. Each shard is turned into a float32 feature matrix and label vector
+#      (session features, labels, fitted FeaturePipeline encoding) and saved
+#      as .npy files, one shard in memory at a time.
+#   2. A DataIter streams those matrices into an ExtMemQuantileDMatrix, which
+#      keeps its quantized pages in an on-disk cache, and xgb.train runs on it.
+# Class imbalance is handled with scale_pos_weight (negatives / positives)
+# instead of oversampling, so nothing is duplicated in memory.
+
+DATA_DIR = 'output/shards'
+CACHE_DIR = 'output/feature_cache'
+MODEL_PATH = 'output/xgboost_external_model.joblib'
+PARAMS = {
+    'objective': 'binary:logistic',
+    'eval_metric': ['logloss', 'aucpr'],
+    'tree_method': 'hist',
+    'max_depth': 6,
+    'eta': 0.3,
+    'max_bin': 256,
+}
+NUM_BOOST_ROUND = 100
+
+def find_shards(data_dir: str) -> Tuple[List[str], List[str]]:
+    """Event shards and incident logs in data_dir, in name order."""
+    events = sorted(p for p in glob.glob(os.path.join(data_dir, 'events-*'))
+                    if p.endswith(('.ndjson', '.json')) or os.path.isdir(p))
+    incidents = sorted(glob.glob(os.path.join(data_dir, 'incidents-*')))
+    if not events:
+        raise FileNotFoundError(f"No events-* shards in {data_dir}")
+    return events, incidents
+
+def fit_pipeline(event_paths: List[str]) -> FeaturePipeline:
+    """Vocabularies over every shard, fitted one shard at a time."""
+    pipeline = FeaturePipeline()
+    for path in event_paths:
+        pipeline.partial_fit(extract_feature_frame(path))
+    return pipeline
+
+def prepare_feature_shards(event_paths: List[str], incidents: List[dict], pipeline: FeaturePipeline,
+                           cache_dir: str) -> Tuple[List[Tuple[str, str]], int, int]:
+    """Write (features, labels) .npy files per shard; returns their paths and the negative/positive counts."""
+    os.makedirs(cache_dir, exist_ok=True)
+    # One store across shards: shards hold disjoint lanes (or consecutive time ranges of the same lanes)
+    sessions = SessionStore()
+    shards, negatives, positives = [], 0, 0
+    for i, path in enumerate(event_paths):
+        df = sessions.annotate_frame(extract_feature_frame(path))
+        labels = label_frame(df, incidents).astype(np.float32)
+        X = pipeline.transform(df).to_numpy(dtype=np.float32)
+        x_path = os.path.join(cache_dir, f'features-{i:05d}.npy')
+        y_path = os.path.join(cache_dir, f'labels-{i:05d}.npy')
+        np.save(x_path, X)
+        np.save(y_path, labels)
+        shards.append((x_path, y_path))
+        positives += int(labels.sum())
+        negatives += len(labels) - int(labels.sum())
+        print(f"Shard {i + 1}/{len(event_paths)}: {len(labels)} rows, {int(labels.sum())} incidents")
+    return shards, negatives, positives
+
+class ShardIter(xgb.DataIter):
+    """Feeds one memory-mapped feature shard at a time to XGBoost."""
+
+    def __init__(self, shards: List[Tuple[str, str]], feature_names: List[str], cache_prefix: str):
+        self.shards = shards
+        self.feature_names = feature_names
+        self.position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self.position == len(self.shards):
+            return False
+        x_path, y_path = self.shards[self.position]
+        input_data(data=np.load(x_path, mmap_mode='r'), label=np.load(y_path, mmap_mode='r'),
+                   feature_names=self.feature_names)
+        self.position += 1
+        return True
+
+    def reset(self) -> None:
+        self.position = 0
+
+def evaluate(booster: xgb.Booster, shards: List[Tuple[str, str]], feature_names: List[str]) -> None:
+    """Classification report over evaluation shards, predicted one shard at a time."""
+    y_true, y_pred = [], []
+    for x_path, y_path in shards:
+        dmat = xgb.DMatrix(np.load(x_path, mmap_mode='r'), feature_names=feature_names)
+        y_pred.append((booster.predict(dmat) >= 0.5).astype(int))
+        y_true.append(np.load(y_path).astype(int))
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+    print(classification_report(y_true, y_pred, zero_division=0))
+    print("Confusion Matrix:")
+    print(confusion_matrix(y_true, y_pred))
+
+def to_classifier(booster: xgb.Booster) -> XGBClassifier:
+    """Wrap a trained Booster as an XGBClassifier, the type the API and dashboard load."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        booster.save_model(path)
+        clf = XGBClassifier()
+        clf.load_model(path)
+    return clf
+
+def main(args):
+    started = time.perf_counter()
+    event_paths, incident_paths = find_shards(args.data)
+    incidents = [inc for path in incident_paths for inc in iter_raw_events(path)]
+    pipeline = fit_pipeline(event_paths)
+    shards, negatives, positives = prepare_feature_shards(event_paths, incidents, pipeline, args.cache)
+    print(f"Prepared {len(shards)} feature shards ({negatives + positives} rows) in {time.perf_counter() - started:.1f} s")
+
+    # The last --eval-shards shards are held out for evaluation
+    n_eval = min(args.eval_shards, len(shards) - 1)
+    train_shards, eval_shards = shards[:len(shards) - n_eval], shards[len(shards) - n_eval:]
+    train_pos = sum(int(np.load(y, mmap_mode='r').sum()) for _, y in train_shards)
+    train_neg = sum(len(np.load(y, mmap_mode='r')) for _, y in train_shards) - train_pos
+    params = dict(PARAMS, scale_pos_weight=train_neg / max(train_pos, 1))
+    print(f"Training on {train_neg + train_pos} rows, scale_pos_weight={params['scale_pos_weight']:.1f}")
+
+    cache_prefix = os.path.join(args.cache, 'xgb')
+    dtrain = xgb.ExtMemQuantileDMatrix(ShardIter(train_shards, pipeline.features, cache_prefix + '-train'),
+                                       max_bin=params['max_bin'])
+    evals = [(dtrain, 'train')]
+    if eval_shards:
+        deval = xgb.ExtMemQuantileDMatrix(ShardIter(eval_shards, pipeline.features, cache_prefix + '-eval'),
+                                          max_bin=params['max_bin'], ref=dtrain)
+        evals.append((deval, 'eval'))
+    booster = xgb.train(params, dtrain, num_boost_round=args.rounds, evals=evals, verbose_eval=10)
+    if eval_shards:
+        evaluate(booster, eval_shards, pipeline.features)
+
+    joblib.dump(to_classifier(booster), args.model)
+    pipeline.save(pipeline_path(args.model))
+    print(f"Model saved to {args.model} ({time.perf_counter() - started:.1f} s total)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train XGBoost out of core on sharded event data.')
+    parser.add_argument('--data', default=DATA_DIR, help='directory with events-* shards and incidents-* logs')
+    parser.add_argument('--cache', default=CACHE_DIR, help='directory for feature shards and the XGBoost page cache')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--rounds', type=int, default=NUM_BOOST_ROUND)
+    parser.add_argument('--eval-shards', type=int, default=1, help='trailing shards held out for evaluation')
+    main(parser.parse_args())
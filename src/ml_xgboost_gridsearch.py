@@ -1,32 +1,25 @@
-import json
+import argparse
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any
+
+import joblib
+import numpy as np
 import pandas as pd
+import xgboost as xgb
+from feature_pipeline import FeaturePipeline, pipeline_path
 from xgboost import XGBClassifier
-from sklearn.model_selection import StratifiedKFold, GridSearchCV
+from sklearn.model_selection import StratifiedKFold, GridSearchCV, ParameterGrid
 from sklearn.metrics import classification_report
 from sklearn.utils import resample
-import numpy as np
 
 DATA_PATH = 'output/ml_training_data_advanced.json'
+MODEL_PATH = 'output/xgboost_best_model.joblib'
 
-# Load advanced training data
-df = pd.read_json(DATA_PATH)
-
-# Oversample incident class
-majority = df[df['incident_label'] == 0]
-minority = df[df['incident_label'] == 1]
-minority_upsampled = resample(minority, replace=True, n_samples=len(majority), random_state=42)
-df_balanced = pd.concat([majority, minority_upsampled])
-
-# Prepare features and labels
-features = ['event_type', 'scanner_id', 'product_id', 'barcode_data', 'rfid_tag', 'camera_label', 'queue_length', 'equipment_status', 'event_count', 'unique_products', 'avg_queue_length', 'failures']
-for col in features:
-    if df_balanced[col].dtype == 'O':
-        df_balanced[col] = df_balanced[col].astype(str)
-        df_balanced[col] = pd.factorize(df_balanced[col])[0]
-X = df_balanced[features]
-y = df_balanced['incident_label']
-
-# Grid search parameters
+# Grid search parameters; in halving mode n_estimators is replaced by the round budget
 param_grid = {
     'n_estimators': [50, 100],
     'max_depth': [3, 5, 7],
@@ -34,20 +27,166 @@ param_grid = {
     'subsample': [0.8, 1.0],
     'colsample_bytree': [0.8, 1.0]
 }
+N_SPLITS = 5
 
-clf = XGBClassifier(use_label_encoder=False, eval_metric='logloss', scale_pos_weight=1)
-kf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-gs = GridSearchCV(clf, param_grid, cv=kf, scoring='f1_weighted', verbose=2, n_jobs=-1)
-gs.fit(X, y)
+# Successive halving: every configuration starts with MIN_ROUNDS boosting
+# rounds per fold, and after each rung only the best 1/HALVING_FACTOR carry on
+# with HALVING_FACTOR times as many rounds (continuing their boosters, not
+# refitting), up to max(n_estimators). Configurations whose validation score
+# stops improving for EARLY_STOPPING_ROUNDS rounds are not trained further.
+MIN_ROUNDS = 10
+HALVING_FACTOR = 3
+EARLY_STOPPING_ROUNDS = 10
+# Scored on the untouched class balance, so precision-recall AUC rather than weighted F1
+SCORING = 'aucpr'
+MAX_BIN = 256
 
-print(f"Best parameters: {gs.best_params_}")
-print(f"Best cross-validation F1 score: {gs.best_score_:.3f}")
+# Per-worker cache of fold matrices: [(dtrain, dvalid, scale_pos_weight)], built once by init_worker
+_folds = []
+_nthread = 1
 
-# Log classification report for best estimator
-y_pred = gs.predict(X)
-print(classification_report(y, y_pred))
+def init_worker(data_dir: str, n_splits: int, nthread: int) -> None:
+    """Build every fold's quantized train/validation matrices once per worker process."""
+    global _folds, _nthread
+    _nthread = nthread
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    fold_ids = np.load(os.path.join(data_dir, 'folds.npy'))
+    _folds = []
+    for k in range(n_splits):
+        train, valid = fold_ids != k, fold_ids == k
+        dtrain = xgb.QuantileDMatrix(X[train], y[train], max_bin=MAX_BIN, nthread=nthread)
+        dvalid = xgb.QuantileDMatrix(X[valid], y[valid], ref=dtrain, nthread=nthread)
+        positives = float(y[train].sum())
+        _folds.append((dtrain, dvalid, (train.sum() - positives) / max(positives, 1)))
 
-# Save the best model
-import joblib
-joblib.dump(gs.best_estimator_, 'output/xgboost_best_model.joblib')
-print("Best model saved to output/xgboost_best_model.joblib")
+def run_trial(config: Dict[str, Any], rounds: int, models: List[bytes] = None) -> Dict[str, Any]:
+    """Train config on every fold up to `rounds` rounds, continuing from models; mean validation score and boosters."""
+    scores, best_rounds, updated, converged = [], [], [], True
+    for k, (dtrain, dvalid, weight) in enumerate(_folds):
+        params = dict(config, objective='binary:logistic', eval_metric=SCORING, tree_method='hist',
+                      scale_pos_weight=weight, nthread=_nthread)
+        previous = xgb.Booster(model_file=bytearray(models[k])) if models else None
+        done = previous.num_boosted_rounds() if previous is not None else 0
+        booster = xgb.train(params, dtrain, num_boost_round=rounds - done, evals=[(dvalid, 'valid')],
+                            early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False, xgb_model=previous)
+        scores.append(booster.best_score)
+        best_rounds.append(booster.best_iteration + 1)
+        converged &= booster.num_boosted_rounds() < rounds
+        updated.append(bytes(booster.save_raw('ubj')))
+    return {'score': float(np.mean(scores)), 'rounds': int(round(np.mean(best_rounds))),
+            'models': updated, 'converged': converged}
+
+def describe(config: Dict[str, Any]) -> str:
+    return ' '.join(f"{k}={v}" for k, v in sorted(config.items()))
+
+def successive_halving(X: np.ndarray, y: np.ndarray, args) -> Dict[str, Any]:
+    """Best configuration and its boosting rounds, found within the round (and optional time) budget."""
+    grid = {k: v for k, v in param_grid.items() if k != 'n_estimators'}
+    trials = [{'config': config, 'models': None, 'converged': False} for config in ParameterGrid(grid)]
+    cores = os.cpu_count() or 1
+    # Trials run in parallel processes; XGBoost threads are split between them so cores aren't oversubscribed
+    jobs = max(1, min(args.jobs or cores, len(trials), cores))
+    nthread = max(1, cores // jobs)
+    fold_ids = np.empty(len(y), dtype=np.int8)
+    for k, (_, valid) in enumerate(StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=42).split(X, y)):
+        fold_ids[valid] = k
+    print(f"Successive halving over {len(trials)} configurations, {args.folds} folds, "
+          f"{jobs} worker(s) x {nthread} thread(s)")
+
+    started = time.perf_counter()
+    best = None
+    rounds, rung = min(args.min_rounds, args.max_rounds), 0
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Workers memory-map the same arrays instead of receiving pickled copies
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'y.npy'), y)
+        np.save(os.path.join(data_dir, 'folds.npy'), fold_ids)
+        with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(data_dir, args.folds, nthread)) as pool:
+            while True:
+                futures = {pool.submit(run_trial, trial['config'], rounds, trial['models']): trial
+                           for trial in trials if not trial['converged']}
+                for done, future in enumerate(as_completed(futures), 1):
+                    trial = futures[future]
+                    trial.update(future.result())
+                    if best is None or trial['score'] > best['score']:
+                        best = trial
+                    print(f"[rung {rung}, {rounds} rounds] {done}/{len(futures)} {describe(trial['config'])} "
+                          f"{SCORING}={trial['score']:.4f} | best {best['score']:.4f} | "
+                          f"{time.perf_counter() - started:.1f} s")
+                trials.sort(key=lambda t: t['score'], reverse=True)
+                if rounds >= args.max_rounds or len(trials) == 1:
+                    break
+                # The time budget is checked between rungs
+                if args.time_budget and time.perf_counter() - started > args.time_budget:
+                    print(f"Time budget of {args.time_budget:.0f} s spent; stopping after rung {rung}")
+                    break
+                trials = trials[:math.ceil(len(trials) / args.eta)]
+                rounds, rung = min(rounds * args.eta, args.max_rounds), rung + 1
+    winner = trials[0]
+    print(f"Search finished in {time.perf_counter() - started:.1f} s")
+    return {'config': winner['config'], 'rounds': winner['rounds'], 'score': winner['score']}
+
+def grid_search(df: pd.DataFrame, pipeline: FeaturePipeline):
+    """Exhaustive GridSearchCV over oversampled data (the original search)."""
+    # Oversample incident class
+    majority = df[df['incident_label'] == 0]
+    minority = df[df['incident_label'] == 1]
+    minority_upsampled = resample(minority, replace=True, n_samples=len(majority), random_state=42)
+    df_balanced = pd.concat([majority, minority_upsampled])
+    X = pipeline.transform(df_balanced)
+    y = df_balanced['incident_label']
+
+    # One thread per fit: GridSearchCV already runs one fit per core
+    clf = XGBClassifier(use_label_encoder=False, eval_metric='logloss', scale_pos_weight=1, n_jobs=1)
+    kf = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=42)
+    gs = GridSearchCV(clf, param_grid, cv=kf, scoring='f1_weighted', verbose=2, n_jobs=-1)
+    gs.fit(X, y)
+
+    print(f"Best parameters: {gs.best_params_}")
+    print(f"Best cross-validation F1 score: {gs.best_score_:.3f}")
+
+    # Log classification report for best estimator
+    y_pred = gs.predict(X)
+    print(classification_report(y, y_pred))
+    return gs.best_estimator_
+
+def main(args):
+    # Load advanced training data
+    df = pd.read_json(args.data)
+    # Prepare features; vocabularies are fitted once and saved with the model
+    pipeline = FeaturePipeline().fit(df)
+
+    if args.search == 'grid':
+        best_model = grid_search(df, pipeline)
+    else:
+        X = pipeline.transform(df)
+        y = df['incident_label'].to_numpy()
+        best = successive_halving(X.to_numpy(dtype=np.float32), y.astype(np.float32), args)
+        print(f"Best parameters: {best['config']}, n_estimators={best['rounds']}")
+        print(f"Best cross-validation {SCORING}: {best['score']:.3f}")
+        # Refit on all data, with class weights instead of oversampling
+        positives = int(y.sum())
+        best_model = XGBClassifier(n_estimators=best['rounds'], eval_metric='logloss', tree_method='hist',
+                                   scale_pos_weight=(len(y) - positives) / max(positives, 1), **best['config'])
+        best_model.fit(X, y)
+        print(classification_report(y, best_model.predict(X)))
+
+    # Save the best model
+    joblib.dump(best_model, args.model)
+    pipeline.save(pipeline_path(args.model))
+    print(f"Best model saved to {args.model}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Hyperparameter search for the XGBoost incident model.')
+    parser.add_argument('--search', choices=['halving', 'grid'], default='halving',
+                        help='halving: budgeted successive halving; grid: exhaustive GridSearchCV')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--folds', type=int, default=N_SPLITS)
+    parser.add_argument('--jobs', type=int, default=None, help='parallel trials (default: one per core)')
+    parser.add_argument('--min-rounds', type=int, default=MIN_ROUNDS, help='boosting rounds in the first rung')
+    parser.add_argument('--max-rounds', type=int, default=max(param_grid['n_estimators']))
+    parser.add_argument('--eta', type=int, default=HALVING_FACTOR, help='keep 1/eta of the configurations per rung')
+    parser.add_argument('--time-budget', type=float, default=None, help='stop after the rung that exceeds this many seconds')
+    main(parser.parse_args())
@@ -0,0 +1,192 @@
+import argparse
+import ctypes
+import importlib.util
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_pipeline import FeaturePipeline, check_session_features, load_pipeline, pipeline_path
+
+# Native model format for serving.
+#
+# export_model() writes the booster of a trained XGBClassifier in XGBoost's own
+# binary format (UBJSON, .ubj) and its feature schema (feature order,
+# categorical columns, vocabularies) as JSON next to it. Serving loads those
+# with a plain Booster instead of unpickling an XGBClassifier and its joblib
+# pipeline, so nothing depends on the pickle or sklearn versions that trained
+# the model. Serving doesn't import the xgboost package at all: `import
+# xgboost` also imports sklearn, over a second of cold start, so the native
+# model is loaded and scored through a few functions of the C library the
+# package ships (_LibBooster). Only when that library can't be found is the
+# package imported instead.
+
+SCHEMA_VERSION = 1
+NATIVE_MODEL_PATH = 'output/xgboost_best_model.ubj'
+JOBLIB_MODEL_PATH = 'output/xgboost_best_model.joblib'
+NATIVE_SUFFIXES = ('.ubj', '.json')
+# XGBClassifier.predict: class 1 when its probability is above this
+THRESHOLD = 0.5
+
+def schema_path(model_path: str) -> str:
+    """Path of the feature schema saved next to a native model file."""
+    root, _ = os.path.splitext(model_path)
+    return root + '.schema.json'
+
+def default_model_path() -> str:
+    """The native export when there is one, else the joblib model it would be exported from."""
+    return NATIVE_MODEL_PATH if os.path.exists(NATIVE_MODEL_PATH) else JOBLIB_MODEL_PATH
+
+# Prediction options for XGBoosterPredictFromDense, as Booster.inplace_predict passes them
+_PREDICT_ARGS = json.dumps({'type': 0, 'training': False, 'iteration_begin': 0, 'iteration_end': 0,
+                            'missing': float('nan'), 'strict_shape': False, 'cache_id': 0}).encode()
+_lib = None
+
+def _library_path() -> Optional[str]:
+    """The libxgboost of the installed xgboost package, found without importing it."""
+    spec = importlib.util.find_spec('xgboost')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    name = {'win32': 'xgboost.dll', 'darwin': 'libxgboost.dylib'}.get(sys.platform, 'libxgboost.so')
+    for location in spec.submodule_search_locations:
+        for path in (os.path.join(location, 'lib', name), os.path.join(sys.prefix, 'lib', name)):
+            if os.path.exists(path):
+                return path
+    return None
+
+def _load_lib() -> Optional[ctypes.CDLL]:
+    global _lib
+    if _lib is None:
+        path = _library_path()
+        if path is None:
+            return None
+        lib = ctypes.CDLL(path)
+        lib.XGBGetLastError.restype = ctypes.c_char_p
+        _lib = lib
+    return _lib
+
+def _check(lib: ctypes.CDLL, status: int) -> None:
+    if status != 0:
+        raise RuntimeError(lib.XGBGetLastError().decode())
+
+class _LibBooster:
+    """The parts of xgboost.Booster serving uses, called straight into libxgboost."""
+
+    def __init__(self, lib: ctypes.CDLL, path: str):
+        self._lib = lib
+        self.handle = ctypes.c_void_p()
+        _check(lib, lib.XGBoosterCreate(None, ctypes.c_uint64(0), ctypes.byref(self.handle)))
+        _check(lib, lib.XGBoosterLoadModel(self.handle, os.fsencode(path)))
+
+    def __del__(self):
+        if getattr(self, 'handle', None):
+            self._lib.XGBoosterFree(self.handle)
+
+    @property
+    def feature_names(self) -> Optional[List[str]]:
+        length = ctypes.c_uint64()
+        names = ctypes.POINTER(ctypes.c_char_p)()
+        _check(self._lib, self._lib.XGBoosterGetStrFeatureInfo(self.handle, b'feature_name', ctypes.byref(length),
+                                                               ctypes.byref(names)))
+        return [names[i].decode() for i in range(length.value)] or None
+
+    def set_param(self, key: str, value) -> None:
+        _check(self._lib, self._lib.XGBoosterSetParam(self.handle, key.encode(), str(value).encode()))
+
+    def inplace_predict(self, X: np.ndarray, validate_features: bool = False) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        interface = json.dumps({'data': [X.ctypes.data, True], 'shape': list(X.shape), 'typestr': '<f4',
+                                'strides': None, 'version': 3}).encode()
+        shape = ctypes.POINTER(ctypes.c_uint64)()
+        dims = ctypes.c_uint64()
+        result = ctypes.POINTER(ctypes.c_float)()
+        _check(self._lib, self._lib.XGBoosterPredictFromDense(self.handle, interface, _PREDICT_ARGS, None,
+                                                              ctypes.byref(shape), ctypes.byref(dims),
+                                                              ctypes.byref(result)))
+        size = int(np.prod([shape[i] for i in range(dims.value)]))
+        # The result buffer belongs to the booster and is reused by the next call
+        return np.ctypeslib.as_array(result, shape=(size,)).copy()
+
+def load_booster(path: str):
+    """A booster for path through libxgboost, or an xgboost.Booster if the library isn't found."""
+    lib = _load_lib()
+    if lib is not None:
+        return _LibBooster(lib, path)
+    import xgboost  # imports sklearn too
+    return xgboost.Booster(model_file=path)
+
+class NativeModel:
+    """Booster loaded from its native format, with the predict() of the XGBClassifier it came from."""
+
+    def __init__(self, path: str, schema: Dict[str, Any]):
+        self.booster = load_booster(path)
+        self.features = schema['features']
+        self.threshold = schema.get('threshold', THRESHOLD)
+        names = self.booster.feature_names
+        if names is not None and list(names) != self.features:
+            raise ValueError(f"{path} was trained on features {names}, but its schema lists {self.features}")
+
+    def set_params(self, n_jobs: int = None) -> 'NativeModel':
+        """XGBClassifier.set_params(n_jobs=...): threads used per predict call."""
+        if n_jobs is not None:
+            self.booster.set_param('nthread', n_jobs)
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Incident probability per row; X in schema feature order (a transform() frame or an array)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.booster.inplace_predict(X, validate_features=False)
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X) > self.threshold).astype(np.int64)
+
+def export_model(model_path: str, out_path: str = None) -> str:
+    """Write model_path's booster as a native model plus its feature schema; returns the native model path."""
+    import joblib
+    import xgboost
+    out_path = out_path or os.path.splitext(model_path)[0] + '.ubj'
+    model = joblib.load(model_path)
+    pipeline = load_pipeline(model_path)
+    if not pipeline.fitted:
+        # The schema would have no vocabularies, and serving would fall back to per-batch codes
+        raise ValueError(f"{model_path} has no fitted feature pipeline at {pipeline_path(model_path)}; "
+                         "retrain it so the pipeline is saved next to the model, then export")
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    names = booster.feature_names
+    if names is not None and list(names) != pipeline.features:
+        raise ValueError(f"{model_path} was trained on features {names}, but its pipeline lists {pipeline.features}")
+    booster.save_model(out_path)
+    schema = dict(pipeline.to_schema(), version=SCHEMA_VERSION, threshold=THRESHOLD,
+                  source=os.path.basename(model_path), xgboost_version=xgboost.__version__)
+    with open(schema_path(out_path), 'w') as f:
+        json.dump(schema, f)
+    return out_path
+
+def load_model(model_path: str) -> Tuple[Any, FeaturePipeline]:
+    """(model, pipeline) from a native export and its schema, or from a joblib model and its pipeline."""
+    if model_path.endswith(NATIVE_SUFFIXES):
+        with open(schema_path(model_path)) as f:
+            schema = json.load(f)
+        if schema.get('version') != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported schema version {schema.get('version')} in {schema_path(model_path)}")
+        pipeline = FeaturePipeline.from_schema(schema)
+        check_session_features(pipeline, model_path)
+        return NativeModel(model_path, schema), pipeline
+    import joblib
+    return joblib.load(model_path), load_pipeline(model_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a trained joblib model to the native XGBoost format.')
+    parser.add_argument('model', nargs='?', default=JOBLIB_MODEL_PATH)
+    parser.add_argument('--out', default=None, help='native model path (default: the model path with .ubj)')
+    args = parser.parse_args()
+    out_path = export_model(args.model, args.out)
+    print(f"Exported {args.model} to {out_path} and {schema_path(out_path)}")
+    started = time.perf_counter()
+    load_model(out_path)
+    print(f"Native model loads in {time.perf_counter() - started:.3f} s")
@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from feature_pipeline import FeaturePipeline, pipeline_path
+from model_export import NATIVE_SUFFIXES, load_model, schema_path
+
+# On-disk model registry.
+#
+# output/registry/registry.json names the production model, an optional
+# candidate to shadow-score on a sample of traffic, and every registered
+# version; each version's files are copied into versions/<version>/ and never
+# change afterwards. The manifest is rewritten atomically (temp file +
+# os.replace), so readers always see either the old or the new one. Services
+# poll stamp() and load a new production model or candidate when it changes
+# (see incident_api.watch_registry).
+#
+#     python model_registry.py register output/xgboost_best_model.ubj --note "halving search"
+#     python model_registry.py candidate v2 --sample 0.2
+#     python model_registry.py promote v2
+
+REGISTRY_DIR = 'output/registry'
+MANIFEST_NAME = 'registry.json'
+DEFAULT_SHADOW_SAMPLE = 0.1
+
+def artifact_paths(model_path: str):
+    """The model file plus the encoding artifact that goes with it (schema or pipeline), if present."""
+    companion = schema_path(model_path) if model_path.endswith(NATIVE_SUFFIXES) else pipeline_path(model_path)
+    return [model_path] + ([companion] if os.path.exists(companion) else [])
+
+class ModelRegistry:
+    """Versioned models under root, with the production and candidate pointers in one manifest."""
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def manifest(self) -> Dict[str, Any]:
+        if not self.exists():
+            return {'production': None, 'candidate': None, 'shadow_sample': 0.0, 'versions': {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def stamp(self) -> Optional[Tuple[int, int]]:
+        """Changes whenever the manifest is rewritten; None when there is no registry."""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_ino
+
+    def _write(self, manifest: Dict[str, Any]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.registry-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def path(self, version: str) -> str:
+        """Model file of a registered version."""
+        entry = self.manifest()['versions'].get(version)
+        if entry is None:
+            raise KeyError(f"Unknown model version {version!r}")
+        return os.path.join(self.root, entry['path'])
+
+    def load(self, version: str) -> Tuple[Any, FeaturePipeline]:
+        return load_model(self.path(version))
+
+    def register(self, model_path: str, version: str = None, note: str = '') -> str:
+        """Copy a model (and its schema or pipeline) into the registry as a new version."""
+        manifest = self.manifest()
+        version = version or f"v{len(manifest['versions']) + 1}"
+        if version in manifest['versions']:
+            raise ValueError(f"Model version {version!r} is already registered")
+        directory = os.path.join(self.root, 'versions', version)
+        os.makedirs(directory)
+        for path in artifact_paths(model_path):
+            shutil.copy2(path, directory)
+        manifest['versions'][version] = {
+            'path': os.path.join('versions', version, os.path.basename(model_path)),
+            'source': model_path,
+            'note': note,
+            'registered_at': datetime.now(timezone.utc).isoformat(),
+        }
+        self._write(manifest)
+        return version
+
+    def promote(self, version: str) -> None:
+        """Make version the production model; it stops being the candidate if it was."""
+        manifest = self.manifest()
+        if version not in manifest['versions']:
+            raise KeyError(f"Unknown model version {version!r}")
+        manifest['production'] = version
+        if manifest.get('candidate') == version:
+            manifest['candidate'] = None
+        manifest['versions'][version]['promoted_at'] = datetime.now(timezone.utc).isoformat()
+        self._write(manifest)
+
+    def set_candidate(self, version: Optional[str], sample: float = DEFAULT_SHADOW_SAMPLE) -> None:
+        """Shadow-score version on this fraction of batches (None stops shadow scoring)."""
+        manifest = self.manifest()
+        if version is not None and version not in manifest['versions']:
+            raise KeyError(f"Unknown model version {version!r}")
+        manifest['candidate'] = version
+        manifest['shadow_sample'] = min(max(sample, 0.0), 1.0) if version else 0.0
+        self._write(manifest)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the on-disk model registry.')
+    parser.add_argument('--root', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    register = commands.add_parser('register', help='copy a model into the registry as a new version')
+    register.add_argument('model')
+    register.add_argument('--version', default=None)
+    register.add_argument('--note', default='')
+    register.add_argument('--promote', action='store_true', help='also make it the production model')
+    promote = commands.add_parser('promote', help='make a version the production model')
+    promote.add_argument('version')
+    candidate = commands.add_parser('candidate', help='shadow-score a version on a sample of traffic')
+    candidate.add_argument('version', nargs='?', default=None, help='omit to stop shadow scoring')
+    candidate.add_argument('--sample', type=float, default=DEFAULT_SHADOW_SAMPLE, help='fraction of batches')
+    commands.add_parser('list', help='show the manifest')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'register':
+        version = registry.register(args.model, args.version, args.note)
+        print(f"Registered {args.model} as {version}")
+        if args.promote:
+            registry.promote(version)
+            print(f"Promoted {version} to production")
+    elif args.command == 'promote':
+        registry.promote(args.version)
+        print(f"Promoted {args.version} to production")
+    elif args.command == 'candidate':
+        registry.set_candidate(args.version, args.sample)
+        print(f"Shadow scoring {args.version} on {args.sample:.0%} of batches" if args.version else "Shadow scoring off")
+    else:
+        print(json.dumps(registry.manifest(), indent=2))
@@ -1,25 +1,100 @@
 import json
+import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
 # Path to the retail events file
 events_path = 'c:\\Users\\tt8445\\Documents\\GitHub\\linkedin\\retail_events.json'
 
+# Bytes read from disk per chunk when streaming events
+CHUNK_SIZE = 1 << 16
+
+def clean_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Parse the event timestamp in place; return None if it is invalid."""
+    ts = event.get('timestamp')
+    if ts and isinstance(ts, str):
+        try:
+            event['timestamp'] = datetime.fromisoformat(ts.replace('Z', ''))
+        except Exception:
+            return None  # skip if timestamp is invalid
+    return event
+
+def _iter_json_array(f, buf: str) -> Iterator[Dict[str, Any]]:
+    """Decode the objects of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    pos = 1  # skip the opening '['
+    eof = False
+    while True:
+        # Skip separators between array items
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        if pos >= len(buf) or buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Item is split across chunks; read more and retry
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        pos = end
+        yield obj
+
+def _iter_ndjson(f, buf: str) -> Iterator[Dict[str, Any]]:
+    """Decode one JSON object per line."""
+    first = buf + f.readline()
+    if first.strip():
+        yield json.loads(first)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def iter_raw_events(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream decoded events from a JSON array or NDJSON file without cleaning.
+    Event store directories written by event_store.py are read through their
+    memory-mapped columns instead.
+    """
+    if os.path.isdir(path):
+        from event_store import open_store
+        yield from open_store(path).iter_events()
+        return
+    with open(path, 'r') as f:
+        buf = ''
+        while not buf.strip():
+            chunk = f.read(1)
+            if not chunk:
+                return
+            buf += chunk
+        buf = buf.lstrip()
+        if buf == '[':
+            yield from _iter_json_array(f, buf + f.read(CHUNK_SIZE))
+        else:
+            yield from _iter_ndjson(f, buf)
+
+def iter_events(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream cleaned retail events from a JSON array, NDJSON file or event store.
+    Events are parsed incrementally and yielded one at a time, so memory
+    stays flat regardless of file size.
+    """
+    for event in iter_raw_events(path):
+        event = clean_event(event)
+        if event is not None:
+            yield event
+
 def load_events(path: str) -> List[Dict[str, Any]]:
     """Load and clean retail events from JSON file."""
-    with open(path, 'r') as f:
-        events = json.load(f)
-    cleaned = []
-    for event in events:
-        # Ensure timestamp is present and parseable
-        ts = event.get('timestamp')
-        if ts:
-            try:
-                event['timestamp'] = datetime.fromisoformat(ts.replace('Z', ''))
-            except Exception:
-                continue  # skip if timestamp is invalid
-        cleaned.append(event)
-    return cleaned
+    return list(iter_events(path))
 
 if __name__ == '__main__':
     events = load_events(events_path)
@@ -0,0 +1,132 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_array
+
+from feature_pipeline import MISSING_TOKEN
+
+# Content-addressed cache of model predictions.
+#
+# Each event is keyed by a 64-bit hash of its feature columns, salted with the
+# model version, so an event already scored by the same model is looked up
+# instead of encoded and predicted again. Categorical (and string) values are
+# hashed as the strings the pipeline encodes, once per category rather than
+# per row, numeric ones as floats and timestamps as epoch nanoseconds, so
+# values that encode alike share a key. Entries are evicted least recently
+# used first once the cache holds max_bytes // ENTRY_BYTES of them, so the
+# memory cap is approximate: it bounds the entry count by a measured per-entry
+# cost, and stats() reports the size actually in use. Keys are 64-bit hashes:
+# a collision (about 1 in 10^7 at a million entries) would return another
+# event's prediction.
+
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+# Memory per entry: the OrderedDict's share of its table plus the key int
+# (predictions are small cached ints). Measured on CPython 3.11 it is 110-150
+# bytes while the cache fills and up to 236 once evictions churn the table
+# (deleted slots linger until it is rebuilt); sized for the worst case, so a
+# full cache uses 60-100% of its cap.
+ENTRY_BYTES = 240
+# Size of one key object (a 64-bit int)
+KEY_BYTES = sys.getsizeof(1 << 63)
+
+# Multiplier mixing column hashes into a row hash (the 64-bit FNV prime)
+MIX = np.uint64(0x100000001b3)
+
+def _column_hashes(values: pd.Series) -> np.ndarray:
+    if values.dtype.kind == 'M':
+        return hash_array(pd.DatetimeIndex(values).asi8)
+    if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object or pd.api.types.is_string_dtype(values):
+        # Hash each category once and index by code; code -1 (missing) takes the last slot
+        series = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(object).astype('category')
+        categories = series.cat.categories.astype(str).to_numpy(dtype=object)
+        table = hash_array(np.append(categories, np.array([MISSING_TOKEN], dtype=object)))
+        return table[series.cat.codes.to_numpy()]
+    return hash_array(pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan))
+
+def row_keys(frame: pd.DataFrame, columns: Optional[List[str]] = None) -> np.ndarray:
+    """uint64 content hash of every row over columns (default: all, in frame order)."""
+    keys = np.zeros(len(frame), dtype=np.uint64)
+    for col in columns or list(frame.columns):
+        keys = (keys ^ _column_hashes(frame[col])) * MIX
+    return keys
+
+class ResultCache:
+    """LRU map from salted feature hashes to predictions, capped by memory, with hit/miss counters."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+        self.entries: 'OrderedDict[int, int]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._salts: Dict[str, np.uint64] = {}
+        # Shared by the dashboard's sessions; the API scores from one thread
+        self._lock = threading.Lock()
+
+    def _salt(self, namespace: str) -> np.uint64:
+        if namespace not in self._salts:
+            digest = hashlib.blake2b(namespace.encode(), digest_size=8).digest()
+            self._salts[namespace] = np.uint64(int.from_bytes(digest, 'little'))
+        return self._salts[namespace]
+
+    def lookup(self, namespace: str, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(predictions, hit mask) for keys; predictions are only meaningful where hit."""
+        salted = (keys ^ self._salt(namespace)).tolist()
+        values = np.zeros(len(salted), dtype=np.int64)
+        hit = np.zeros(len(salted), dtype=bool)
+        entries = self.entries
+        with self._lock:
+            for i, key in enumerate(salted):
+                value = entries.get(key)
+                if value is not None:
+                    entries.move_to_end(key)
+                    values[i] = value
+                    hit[i] = True
+            found = int(hit.sum())
+            self.hits += found
+            self.misses += len(salted) - found
+        return values, hit
+
+    def store(self, namespace: str, keys: np.ndarray, values: np.ndarray) -> None:
+        salted = (keys ^ self._salt(namespace)).tolist()
+        entries = self.entries
+        with self._lock:
+            for key, value in zip(salted, np.asarray(values).tolist()):
+                entries[key] = value
+                entries.move_to_end(key)
+            overflow = len(entries) - self.max_entries
+            for _ in range(max(overflow, 0)):
+                entries.popitem(last=False)
+            self.evictions += max(overflow, 0)
+
+    def score(self, namespace: str, frame: pd.DataFrame, predict: Callable[[pd.DataFrame], np.ndarray],
+              columns: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Predictions for every row of frame. Rows whose key was cached by an
+        earlier call are looked up; predict gets every other row, in row order.
+        Repeats of a key within frame are all passed to predict, since each is
+        a new occurrence of the event (predict may update state per row).
+        """
+        keys = row_keys(frame, columns)
+        preds, hit = self.lookup(namespace, keys)
+        if not hit.all():
+            missing = np.flatnonzero(~hit)
+            fresh = np.asarray(predict(frame.iloc[missing]), dtype=np.int64)
+            preds[missing] = fresh
+            self.store(namespace, keys[missing], fresh)
+        return preds
+
+    def nbytes(self) -> int:
+        """Memory held by the entries: the mapping itself plus its key objects."""
+        return sys.getsizeof(self.entries) + len(self.entries) * KEY_BYTES
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else None,
+                'entries': len(self.entries), 'max_entries': self.max_entries, 'evictions': self.evictions,
+                'bytes': self.nbytes(), 'max_bytes': self.max_entries * ENTRY_BYTES}
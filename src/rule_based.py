@@ -1,16 +1,24 @@
-from feature_extraction import extract_features
-from preprocess import load_events
+from feature_extraction import iter_features
+from preprocess import iter_events
+from bisect import bisect_left, bisect_right
 from datetime import timedelta
+from typing import List, Dict, Any, Iterable
 import json
+import sys
+from rules import RuleSet, RFID_EVENT_TYPES, BARCODE_EVENT_TYPES, default_ruleset
 
-# Rule-based incident detection
+# Rule-based incident detection; the rules themselves are declared in rules.py
 
-def detect_incidents(features):
+# How long barcode scans are remembered per scanner in online mode when
+# checking RFID/camera reads for unscanned items
+SCAN_WINDOW = timedelta(minutes=5)
+
+def detect_incidents(features, rules: RuleSet = None):
+    rules = rules or default_ruleset()
     incidents = []
     # Track last seen times and states for each scanner
-    last_scanner_status = {}
-    last_customer_present = {}
-    scanned_products = set()
+    dwell_anchors = {}
+    scanned_products = {}
     rfid_camera_buffer = {}
     barcode_buffer = {}
     for feat in features:
@@ -24,83 +32,167 @@ def detect_incidents(features):
         if key not in barcode_buffer:
             barcode_buffer[key] = set()
         # Collect event types for enhanced logic
-        if feat['event_type'] in ['rfid_read', 'camera_image'] and product and product != 'customer_present':
+        if feat['event_type'] in RFID_EVENT_TYPES and product and product != 'customer_present':
             rfid_camera_buffer[key].add(product)
-        if feat['event_type'] == 'barcode_scan' and product:
+        if feat['event_type'] in BARCODE_EVENT_TYPES and product:
             barcode_buffer[key].add(product)
-        # Queue buildup
-        if feat['event_type'] == 'queue_status' and feat['queue_length'] is not None:
-            if feat['queue_length'] > 7:
-                incidents.append({
-                    'timestamp': ts,
-                    'scanner_id': scanner,
-                    'incident': 'queue_buildup',
-                    'queue_length': feat['queue_length']
-                })
-        # Scanner failure
-        if feat['event_type'] == 'equipment_status' and feat['equipment_status'] == 'failure':
-            incidents.append({
-                'timestamp': ts,
-                'scanner_id': scanner,
-                'incident': 'scanner_failure'
-            })
-            last_scanner_status[scanner] = 'failure'
-        # Long wait (track consecutive customer_present events)
-        if feat['event_type'] == 'camera_image' and product == 'customer_present':
-            if scanner not in last_customer_present:
-                last_customer_present[scanner] = ts
-            else:
-                duration = ts - last_customer_present[scanner]
-                if duration >= timedelta(minutes=5):
-                    incidents.append({
-                        'timestamp': ts,
-                        'scanner_id': scanner,
-                        'incident': 'long_wait'
-                    })
-                    last_customer_present[scanner] = ts
-        # Track scanned products
-        if feat['event_type'] == 'barcode_scan' and product:
-            scanned_products.add((scanner, product))
+            # Track scanned products
+            scanned_products.setdefault(scanner, set()).add(product)
+        # Per-event rules subscribed to this event type
+        incidents.extend(rules.event_incidents(feat, dwell_anchors))
     # Enhanced detection after buffering
+    if rules.match_tolerance:
+        incidents.extend(_windowed_bucket_incidents(rules, rfid_camera_buffer, barcode_buffer, scanned_products))
+        return incidents
     for key in rfid_camera_buffer:
         ts, scanner = key
-        rfid_products = rfid_camera_buffer[key]
-        barcode_products = barcode_buffer.get(key, set())
-        # Scanner avoidance: RFID/camera but no barcode for same product
-        for prod in rfid_products:
-            if prod not in barcode_products:
-                incidents.append({
-                    'timestamp': ts,
-                    'scanner_id': scanner,
-                    'incident': 'scanner_avoidance',
-                    'product': prod
-                })
-        # Product swap: barcode for one product, RFID/camera for another at same time
-        for bprod in barcode_products:
-            for rprod in rfid_products:
-                if bprod != rprod:
-                    incidents.append({
-                        'timestamp': ts,
-                        'scanner_id': scanner,
-                        'incident': 'product_swap',
-                        'barcode': bprod,
-                        'actual': rprod
-                    })
-        # Unscanned item: RFID/camera product not in scanned_products
-        for prod in rfid_products:
-            if (scanner, prod) not in scanned_products:
-                incidents.append({
-                    'timestamp': ts,
-                    'scanner_id': scanner,
-                    'incident': 'unscanned_item',
-                    'product': prod
-                })
+        incidents.extend(rules.bucket_incidents(ts, scanner, rfid_camera_buffer[key], barcode_buffer.get(key, set()),
+                                                scanned_products.get(scanner, set())))
     return incidents
 
+def _first_items(reads, tolerance: timedelta):
+    """(timestamp, product) reads that start an item: later reads of the product within tolerance of the start are the same item."""
+    first = []
+    anchors = {}
+    for ts, prod in sorted(reads, key=lambda read: (read[0] is not None, read[0] or 0)):
+        anchor = anchors.get(prod)
+        if prod not in anchors or (ts is not None and (anchor is None or ts - anchor > tolerance)):
+            first.append((ts, prod))
+            anchors[prod] = ts
+    return first
+
+def _windowed_bucket_incidents(rules: RuleSet, rfid_camera_buffer, barcode_buffer, scanned_products):
+    """
+    Bucket incidents when a scanner's reads up to rules.match_tolerance apart
+    are compared, as in rule_batch.detect_incidents_frame: avoidance and
+    unscanned items are raised once per item, swaps once per barcode read and
+    RFID/camera product. Reads without a timestamp only meet their own bucket.
+    """
+    tolerance = rules.match_tolerance
+    lanes = {}
+    for (ts, scanner), products in rfid_camera_buffer.items():
+        if products:
+            lanes.setdefault(scanner, ({}, {}))[0][ts] = products
+    for (ts, scanner), products in barcode_buffer.items():
+        if products:
+            lanes.setdefault(scanner, ({}, {}))[1][ts] = products
+
+    def near(buckets, times, ts):
+        """Products of the buckets within tolerance of ts."""
+        if ts is None:
+            return buckets.get(None, set())
+        window = times[bisect_left(times, ts - tolerance):bisect_right(times, ts + tolerance)]
+        return set().union(*(buckets[t] for t in window))
+
+    incidents = []
+    for scanner, (rfid, barcode) in lanes.items():
+        rfid_times = sorted(t for t in rfid if t is not None)
+        barcode_times = sorted(t for t in barcode if t is not None)
+        scanned = scanned_products.get(scanner, set())
+        avoided, unscanned = [], []
+        for ts, products in rfid.items():
+            barcoded = near(barcode, barcode_times, ts)
+            avoided.extend((ts, prod) for prod in products if prod not in barcoded)
+            unscanned.extend((ts, prod) for prod in products if prod not in scanned)
+        rule = rules.bucket_rules.get('avoidance')
+        if rule:
+            for ts, prod in _first_items(avoided, tolerance):
+                incidents.append({'timestamp': ts, 'scanner_id': scanner, 'incident': rule.name, 'product': prod})
+        rule = rules.bucket_rules.get('swap')
+        if rule:
+            for ts, products in barcode.items():
+                seen = near(rfid, rfid_times, ts)
+                for bprod in products:
+                    for rprod in seen:
+                        if bprod != rprod:
+                            incidents.append({'timestamp': ts, 'scanner_id': scanner, 'incident': rule.name,
+                                              'barcode': bprod, 'actual': rprod})
+        rule = rules.bucket_rules.get('unscanned')
+        if rule:
+            for ts, prod in _first_items(unscanned, tolerance):
+                incidents.append({'timestamp': ts, 'scanner_id': scanner, 'incident': rule.name, 'product': prod})
+    return incidents
+
+class IncidentDetector:
+    """
+    Online incident detection with bounded per-scanner state.
+
+    Feed events in timestamp order per scanner with push(). A scanner's current
+    (timestamp, scanner) bucket closes as soon as an event with a different
+    timestamp arrives for that scanner; its avoidance, swap and unscanned-item
+    incidents are emitted then and the bucket is dropped. Unlike
+    detect_incidents, which checks unscanned items against every barcode scan
+    in the input, only scans within scan_window before the bucket count.
+    Buckets are exact, so rule sets with a match_tolerance are refused.
+    """
+
+    def __init__(self, scan_window: timedelta = SCAN_WINDOW, rules: RuleSet = None):
+        self.scan_window = scan_window
+        self.rules = rules or default_ruleset()
+        if self.rules.match_tolerance:
+            raise ValueError("Online incident detection pairs reads of the same timestamp only; "
+                             "set match_tolerance_seconds to 0 or use detect_incidents / rule_batch")
+        self.dwell_anchors = {}
+        # scanner -> (timestamp, rfid/camera products, barcode products)
+        self.open_buckets = {}
+        # scanner -> {product: last scan time}, oldest scan first
+        self.recent_scans = {}
+
+    def push(self, feat: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Consume one feature dict and return the incidents it completes."""
+        ts = feat['timestamp']
+        scanner = feat['scanner_id']
+        product = feat.get('product_id')
+        incidents = []
+        bucket = self.open_buckets.get(scanner)
+        if bucket is not None and bucket[0] != ts:
+            incidents.extend(self._close(scanner))
+            bucket = None
+        if bucket is None:
+            bucket = self.open_buckets[scanner] = (ts, set(), set())
+        if feat['event_type'] in RFID_EVENT_TYPES and product and product != 'customer_present':
+            bucket[1].add(product)
+        if feat['event_type'] in BARCODE_EVENT_TYPES and product:
+            bucket[2].add(product)
+            scans = self.recent_scans.setdefault(scanner, {})
+            # Re-insert so the dict stays ordered by last scan time
+            scans.pop(product, None)
+            scans[product] = ts
+        incidents.extend(self.rules.event_incidents(feat, self.dwell_anchors))
+        return incidents
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Close every open bucket, e.g. at the end of a finite input."""
+        incidents = []
+        for scanner in list(self.open_buckets):
+            incidents.extend(self._close(scanner))
+        return incidents
+
+    def _close(self, scanner) -> List[Dict[str, Any]]:
+        ts, rfid_products, barcode_products = self.open_buckets.pop(scanner)
+        scans = self.recent_scans.get(scanner, {})
+        # Evict scans that fell out of the window
+        cutoff = ts - self.scan_window
+        while scans:
+            oldest = next(iter(scans))
+            if scans[oldest] >= cutoff:
+                break
+            del scans[oldest]
+        return self.rules.bucket_incidents(ts, scanner, rfid_products, barcode_products, scans)
+
+def detect_incidents_online(features: Iterable[Dict[str, Any]], scan_window: timedelta = SCAN_WINDOW, rules: RuleSet = None):
+    """Yield incidents from an IncidentDetector as soon as they are raised."""
+    detector = IncidentDetector(scan_window, rules)
+    for feat in features:
+        yield from detector.push(feat)
+    yield from detector.flush()
+
 if __name__ == '__main__':
-    events = load_events('c:\\Users\\tt8445\\Documents\\GitHub\\linkedin\\retail_events.json')
-    features = extract_features(events)
-    incidents = detect_incidents(features)
+    events = iter_events('c:\\Users\\tt8445\\Documents\\GitHub\\linkedin\\retail_events.json')
+    if '--online' in sys.argv:
+        incidents = list(detect_incidents_online(iter_features(events)))
+    else:
+        incidents = detect_incidents(iter_features(events))
     print(f"Detected {len(incidents)} incidents.")
     for inc in incidents[:5]:
         print(inc)
@@ -0,0 +1,229 @@
+import sys
+import time
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from feature_extraction import extract_feature_frame, iter_features
+from preprocess import iter_events
+from rule_based import detect_incidents
+from rules import RuleSet, RFID_EVENT_TYPES, BARCODE_EVENT_TYPES, default_ruleset
+from window_join import window_join
+
+# Vectorized batch rule engine for historical re-scoring.
+#
+# Evaluates the same rules as rule_based.detect_incidents over a feature frame
+# from feature_extraction.extract_feature_frame. Buckets are integer keys
+# (timestamp rank, scanner code, product code); barcode and RFID/camera reads
+# are paired with window_join, so avoidance and unscanned items become sorted
+# anti-joins and product swaps a sorted range join.
+
+# Columns every incident frame starts with; rule output fields follow
+INCIDENT_KEY_COLUMNS = ['timestamp', 'scanner_id', 'incident']
+
+def _codes(series: pd.Series) -> np.ndarray:
+    """Integer codes of a column (-1 for missing)."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy().astype(np.int64)
+
+def _take(series: pd.Series, rows: np.ndarray) -> pd.Series:
+    """Values of series at row positions, keeping its dtype, without materializing the whole column."""
+    return series.iloc[rows].reset_index(drop=True)
+
+def _incident_frame(df: pd.DataFrame, rows: np.ndarray, incident: str, **columns) -> pd.DataFrame:
+    out = pd.DataFrame({
+        'timestamp': _take(df['timestamp'], rows),
+        'scanner_id': _take(df['scanner_id'], rows),
+        'incident': incident,
+    })
+    for col, values in columns.items():
+        out[col] = values
+    return out
+
+def incident_columns(rules: RuleSet) -> List[str]:
+    """Columns of an incident frame for a rule set."""
+    columns = list(INCIDENT_KEY_COLUMNS)
+    for fields in rules.output_fields.values():
+        columns.extend(field for field in fields if field not in columns)
+    return columns
+
+def _dwell_rows(ts: np.ndarray, scanners: np.ndarray, mask: np.ndarray, window: timedelta) -> np.ndarray:
+    """Row positions raising a dwell rule; the anchor reset makes this sequential, but only over matching rows."""
+    limit = int(window / timedelta(microseconds=1)) * 1000
+    anchors = {}
+    rows = []
+    positions = np.flatnonzero(mask)
+    for pos, t, scanner in zip(positions.tolist(), ts[positions].tolist(), scanners[positions].tolist()):
+        anchor = anchors.get(scanner)
+        if anchor is None:
+            anchors[scanner] = t
+        elif t - anchor >= limit:
+            rows.append(pos)
+            anchors[scanner] = t
+    return np.asarray(rows, dtype=np.int64)
+
+def _composite(major: np.ndarray, minor: np.ndarray, width: int) -> Optional[np.ndarray]:
+    """int64 keys that order like (major, minor) for non-negative major and 0 <= minor < width; None if they would overflow."""
+    if len(major) and (int(major.max()) + 1) * width >= 2 ** 63:
+        return None
+    return major * width + minor
+
+def _first_reads(rows: np.ndarray, ts: np.ndarray, groups: np.ndarray, products: np.ndarray, tolerance_ns: int) -> np.ndarray:
+    """
+    Rows (sorted) that start an item: reads of one product in one group up to
+    tolerance_ns after the read that started the item (an RFID read and a
+    camera read of it, say) are the same item. Windows are anchored on their
+    first read rather than chained read to read.
+    """
+    if not tolerance_ns or not len(rows):
+        return np.sort(rows)
+    t, group, product = ts[rows], groups[rows], products[rows]
+    # Sort by (group, product, timestamp); one int64 key sorts far faster than lexsort
+    run = (group - group.min()) * (int(product.max()) - int(product.min()) + 1) + (product - product.min())
+    key = _composite(run, t - t.min(), int(t.max()) - int(t.min()) + 1)
+    order = np.argsort(key, kind='stable') if key is not None else np.lexsort((t, run))
+    rows, t, run = rows[order], t[order], run[order]
+    n = len(rows)
+    # A read more than tolerance after the previous read of its (group, product)
+    # run always starts an item, so these gaps split runs into independent segments
+    start = np.ones(n, dtype=bool)
+    start[1:] = (run[1:] != run[:-1]) | (np.diff(t) > tolerance_ns)
+    segment = np.cumsum(start) - 1
+    # Next item start after read i: first read of its segment more than tolerance
+    # later, found with one searchsorted over (segment, time) keys
+    offset = t - t[np.flatnonzero(start)][segment]
+    width = int(offset.max()) + tolerance_ns + 1
+    key = _composite(segment, offset, width)
+    if key is not None:
+        nxt = np.searchsorted(key, key + tolerance_ns, side='right')
+    else:
+        values, ranks = np.unique(np.concatenate([t, t + tolerance_ns]), return_inverse=True)
+        width = len(values) + 1
+        nxt = np.searchsorted(segment * width + ranks[:n], segment * width + ranks[n:], side='right')
+    # Follow the anchors from every segment start at once; a segment with k items takes k steps
+    first = start.copy()
+    frontier = np.flatnonzero(start)
+    while len(frontier):
+        frontier = nxt[frontier]
+        frontier = frontier[frontier < n]
+        frontier = frontier[~start[frontier]]
+        first[frontier] = True
+    return np.sort(rows[first])
+
+def detect_incidents_frame(df: pd.DataFrame, tolerance: Optional[timedelta] = None, rules: RuleSet = None) -> pd.DataFrame:
+    """
+    Detect incidents over a feature frame; returns one row per incident with incident_columns(rules).
+    Barcode and RFID/camera reads of a scanner are compared when they are at most
+    tolerance apart (default: the rule set's match_tolerance); with zero this is
+    the exact (timestamp, scanner) bucket used by rule_based.detect_incidents.
+    """
+    event_type = df['event_type']
+    ts = df['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    scanner_codes = _codes(df['scanner_id'])
+    product = df['product_id']
+    product_codes = _codes(product)
+    # Truthy products only, as in the loop version (skips missing and empty strings)
+    empty_product = np.append(np.asarray(product.astype('category').cat.categories == '', dtype=bool), True)
+    has_product = ~empty_product[product_codes]
+    frames = []
+
+    rules = rules or default_ruleset()
+    if tolerance is None:
+        tolerance = rules.match_tolerance
+    # Event and dwell rules evaluate as column masks
+    for rule in rules.rules:
+        if rule.kind == 'bucket':
+            continue
+        mask = rule.mask(df)
+        if rule.kind == 'dwell':
+            rows = _dwell_rows(ts, scanner_codes, mask, rule.window)
+        else:
+            rows = np.flatnonzero(mask)
+        frames.append(_incident_frame(df, rows, rule.name, **{out: _take(df[field], rows) for out, field in rule.output.items()}))
+
+    # Read keys: (timestamp rank, scanner, product)
+    ts_rank = pd.factorize(ts)[0].astype(np.int64)
+    n_scanners = int(scanner_codes.max()) + 2 if len(scanner_codes) else 1
+    n_products = int(product_codes.max()) + 1 if len(product_codes) else 1
+    read_key = (ts_rank * n_scanners + (scanner_codes + 1)) * n_products + product_codes
+    rfid_mask = (event_type.isin(RFID_EVENT_TYPES).to_numpy(dtype=bool) & has_product & (product != 'customer_present').to_numpy(dtype=bool))
+    barcode_mask = event_type.isin(BARCODE_EVENT_TYPES).to_numpy(dtype=bool) & has_product
+    # First row of each distinct read
+    _, rfid_first = np.unique(read_key[rfid_mask], return_index=True)
+    rfid_rows = np.flatnonzero(rfid_mask)[rfid_first]
+    _, barcode_first = np.unique(read_key[barcode_mask], return_index=True)
+    barcode_rows = np.flatnonzero(barcode_mask)[barcode_first]
+
+    # Pair every barcode read with the RFID/camera reads of its scanner within the tolerance window.
+    # Reads without a timestamp only meet each other: they join in a group of their own at time 0.
+    tolerance_ns = int(tolerance / timedelta(microseconds=1)) * 1000
+    no_ts = ts == np.iinfo(np.int64).min
+    join_ts = np.where(no_ts, 0, ts)
+    join_groups = scanner_codes + np.where(no_ts, n_scanners, 0)
+    left, right = window_join(join_ts[barcode_rows], join_groups[barcode_rows], join_ts[rfid_rows], join_groups[rfid_rows], tolerance_ns)
+    same = product_codes[barcode_rows[left]] == product_codes[rfid_rows[right]]
+    # Scanner avoidance: RFID/camera read with no barcode for the same product in the window
+    matched = np.zeros(len(rfid_rows), dtype=bool)
+    matched[right[same]] = True
+    rows = _first_reads(rfid_rows[~matched], join_ts, join_groups, product_codes, tolerance_ns)
+    if 'avoidance' in rules.bucket_rules:
+        frames.append(_incident_frame(df, rows, rules.bucket_rules['avoidance'].name, product=_take(product, rows)))
+    # Product swap: every (barcode, RFID/camera product) pair in the window that disagrees
+    left, right = left[~same], right[~same]
+    _, first = np.unique(left * n_products + product_codes[rfid_rows[right]], return_index=True)
+    left, right = left[first], right[first]
+    if 'swap' in rules.bucket_rules:
+        frames.append(_incident_frame(df, barcode_rows[left], rules.bucket_rules['swap'].name,
+                                      barcode=_take(product, barcode_rows[left]), actual=_take(product, rfid_rows[right])))
+    # Unscanned item: RFID/camera product never scanned at this scanner
+    scanner_product = scanner_codes * n_products + product_codes
+    scanned = np.unique(scanner_product[barcode_mask])
+    rows = _first_reads(rfid_rows[~np.isin(scanner_product[rfid_rows], scanned)], join_ts, join_groups, product_codes, tolerance_ns)
+    if 'unscanned' in rules.bucket_rules:
+        frames.append(_incident_frame(df, rows, rules.bucket_rules['unscanned'].name, product=_take(product, rows)))
+
+    return pd.concat(frames, ignore_index=True).reindex(columns=incident_columns(rules))
+
+def frame_to_incidents(incidents: pd.DataFrame, rules: RuleSet = None) -> List[Dict[str, Any]]:
+    """Convert an incident frame to the list-of-dicts shape returned by rule_based.detect_incidents."""
+    rules = rules or default_ruleset()
+    timestamps = incidents['timestamp'].dt.to_pydatetime()
+    records = incidents.astype(object).to_dict(orient='records')
+    result = []
+    for ts, rec in zip(timestamps, records):
+        # Missing scanners are None, as in the loop version, not NaN
+        scanner = None if pd.isna(rec['scanner_id']) else rec['scanner_id']
+        inc = {'timestamp': ts, 'scanner_id': scanner, 'incident': rec['incident']}
+        for field in rules.output_fields[rec['incident']]:
+            value = rec[field]
+            inc[field] = None if pd.isna(value) else value.item() if hasattr(value, 'item') else value
+        result.append(inc)
+    return result
+
+def same_incidents(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]]) -> bool:
+    """Whether two incident lists hold the same incidents, in any order; values must match in type too (None is not NaN)."""
+    as_multiset = lambda incidents: sorted(sorted((k, repr(v)) for k, v in inc.items()) for inc in incidents)
+    return as_multiset(expected) == as_multiset(actual)
+
+def check_parity(events_path: str) -> bool:
+    """Compare the batch engine against the loop version on an events file and print timings."""
+    df = extract_feature_frame(events_path)
+    features = list(iter_features(iter_events(events_path)))
+    start = time.perf_counter()
+    expected = detect_incidents(features)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = frame_to_incidents(detect_incidents_frame(df))
+    batch_time = time.perf_counter() - start
+    same = same_incidents(expected, actual)
+    print(f"Loop: {len(expected)} incidents in {loop_time:.3f}s, batch: {len(actual)} incidents in {batch_time:.3f}s "
+          f"({loop_time / max(batch_time, 1e-9):.1f}x)")
+    print("Parity OK" if same else "Parity MISMATCH")
+    return same
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'retail_events.json'
+    sys.exit(0 if check_parity(path) else 1)
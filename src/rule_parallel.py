@@ -0,0 +1,84 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any
+
+import pandas as pd
+
+from feature_extraction import extract_feature_frame, iter_frame_features
+from rule_based import detect_incidents
+from rule_batch import detect_incidents_frame, frame_to_incidents
+
+# Multi-core incident detection sharded by scanner.
+#
+# Every piece of detection state in rule_based (customer-present anchors,
+# timestamp buckets, scanned products) is keyed by scanner_id, so running the
+# rules on disjoint sets of scanners and concatenating the results gives the
+# same incidents as one pass over the whole stream.
+
+ENGINES = ['loop', 'batch']
+# Shards per worker; more shards than workers evens out lanes of different sizes
+SHARDS_PER_WORKER = 4
+
+def plan_shards(scanner_counts: pd.Series, n_shards: int) -> List[List[Any]]:
+    """Assign scanners to shards, largest first onto the lightest shard (deterministic)."""
+    order = sorted(scanner_counts.items(), key=lambda item: (-item[1], str(item[0])))
+    shards = [[] for _ in range(min(n_shards, len(order)))]
+    loads = [0] * len(shards)
+    for scanner, count in order:
+        target = loads.index(min(loads))
+        shards[target].append(scanner)
+        loads[target] += count
+    return shards
+
+def _detect_shard(frame: pd.DataFrame, engine: str) -> List[Dict[str, Any]]:
+    if engine == 'batch':
+        return frame_to_incidents(detect_incidents_frame(frame))
+    return detect_incidents(iter_frame_features(frame))
+
+def incident_sort_key(inc: Dict[str, Any]):
+    """Total order on incidents so merged output does not depend on shard or set iteration order."""
+    # Incidents of events without a timestamp sort last rather than failing to compare
+    ts = inc['timestamp']
+    missing = ts is None or pd.isna(ts)
+    return (missing, datetime.min if missing else ts, str(inc.get('scanner_id')), inc['incident'], str(inc.get('product', '')),
+            str(inc.get('barcode', '')), str(inc.get('actual', '')), inc.get('queue_length') or 0)
+
+def detect_incidents_parallel(df: pd.DataFrame, workers: int = None, engine: str = 'loop') -> List[Dict[str, Any]]:
+    """Run detection over scanner shards in a process pool and merge incidents in timestamp order."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    workers = workers or os.cpu_count() or 1
+    scanner_codes = df['scanner_id'].astype('category').cat.codes
+    counts = scanner_codes.value_counts()
+    shards = plan_shards(counts, workers * SHARDS_PER_WORKER)
+    shard_of_code = pd.Series({code: i for i, codes in enumerate(shards) for code in codes})
+    shard_ids = scanner_codes.map(shard_of_code).to_numpy()
+    # Each shard keeps its rows in stream order
+    frames = [df[shard_ids == i] for i in range(len(shards))]
+    incidents = []
+    if workers == 1:
+        for frame in frames:
+            incidents.extend(_detect_shard(frame, engine))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_detect_shard, frames, [engine] * len(frames)):
+                incidents.extend(result)
+    incidents.sort(key=incident_sort_key)
+    return incidents
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sharded, multi-process incident detection")
+    parser.add_argument('events', nargs='?', default='retail_events.json', help="events file (JSON, NDJSON) or event store")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--engine', choices=ENGINES, default='loop', help="rule engine run inside each shard")
+    args = parser.parse_args()
+    df = extract_feature_frame(args.events)
+    start = time.perf_counter()
+    incidents = detect_incidents_parallel(df, args.workers, args.engine)
+    elapsed = time.perf_counter() - start
+    print(f"Detected {len(incidents)} incidents across {df['scanner_id'].nunique()} scanners in {elapsed:.3f}s.")
+    for inc in incidents[:5]:
+        print(inc)
@@ -0,0 +1,204 @@
+import json
+import operator
+import os
+import warnings
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+
+# Declarative incident rules.
+#
+# Each rule is plain data: the event types it subscribes to, a predicate over
+# feature fields, an optional time window and the feature fields copied into
+# the incident it raises. compile_rules turns a rule list into a RuleSet whose
+# dispatch table is keyed by event_type, so an event is only checked against
+# the rules that subscribe to its type. Stores can override the defaults with a
+# JSON file (RULES_PATH, or the RULES_CONFIG environment variable).
+#
+# Rule kinds:
+#   event  - raise an incident for every subscribed event matching 'where'
+#   dwell  - per scanner, raise when a matching event arrives at least
+#            'window_seconds' after the anchoring matching event, then re-anchor
+#   bucket - compare the barcode and RFID/camera reads of one (timestamp, scanner)
+#            bucket; 'check' selects avoidance, swap or unscanned
+#
+# A config file may also set "match_tolerance_seconds": bucket rules then
+# compare the barcode and RFID/camera reads of a scanner that are at most that
+# far apart instead of only reads with the same timestamp. The default of 0 is
+# the exact bucket.
+
+# The repository's config/rules.json, wherever the process is started from
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'rules.json')
+RULES_PATH = os.environ.get('RULES_CONFIG', DEFAULT_RULES_PATH)
+
+DEFAULT_RULES = [
+    {'name': 'queue_buildup', 'kind': 'event', 'event_types': ['queue_status'],
+     'where': [['queue_length', '>', 7]], 'output': {'queue_length': 'queue_length'}},
+    {'name': 'scanner_failure', 'kind': 'event', 'event_types': ['equipment_status'],
+     'where': [['equipment_status', '==', 'failure']]},
+    {'name': 'long_wait', 'kind': 'dwell', 'event_types': ['camera_image'],
+     'where': [['product_id', '==', 'customer_present']], 'window_seconds': 300},
+    {'name': 'scanner_avoidance', 'kind': 'bucket', 'check': 'avoidance'},
+    {'name': 'product_swap', 'kind': 'bucket', 'check': 'swap'},
+    {'name': 'unscanned_item', 'kind': 'bucket', 'check': 'unscanned'},
+]
+
+# Default maximum time between a barcode read and an RFID/camera read for them to be compared
+MATCH_TOLERANCE = timedelta(0)
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+# Event types feeding the read buckets of bucket rules
+RFID_EVENT_TYPES = ['rfid_read', 'camera_image']
+BARCODE_EVENT_TYPES = ['barcode_scan']
+# Fields each bucket check adds to its incidents
+BUCKET_OUTPUTS = {
+    'avoidance': ['product'],
+    'swap': ['barcode', 'actual'],
+    'unscanned': ['product'],
+}
+
+class CompiledRule:
+    """A rule with its predicate resolved to operator functions."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec['name']
+        self.kind = spec.get('kind', 'event')
+        if self.kind not in ('event', 'dwell', 'bucket'):
+            raise ValueError(f"Rule {self.name!r}: unknown kind {self.kind!r}")
+        self.event_types = list(spec.get('event_types', []))
+        self.where = []
+        for field, op, value in spec.get('where', []):
+            if op not in OPERATORS:
+                raise ValueError(f"Rule {self.name!r}: unknown operator {op!r}")
+            self.where.append((field, OPERATORS[op], value))
+        self.output = dict(spec.get('output', {}))
+        self.window = timedelta(seconds=spec['window_seconds']) if 'window_seconds' in spec else None
+        self.check = spec.get('check')
+        if self.kind == 'dwell' and self.window is None:
+            raise ValueError(f"Rule {self.name!r}: dwell rules need window_seconds")
+        if self.kind == 'bucket':
+            if self.check not in BUCKET_OUTPUTS:
+                raise ValueError(f"Rule {self.name!r}: unknown bucket check {self.check!r}")
+            self.output = {field: field for field in BUCKET_OUTPUTS[self.check]}
+
+    def matches(self, feat: Dict[str, Any]) -> bool:
+        """Evaluate the predicate on one feature dict; missing fields never match."""
+        for field, op, value in self.where:
+            actual = feat.get(field)
+            if actual is None or not op(actual, value):
+                return False
+        return True
+
+    def mask(self, df):
+        """Evaluate subscription and predicate over a feature frame as a boolean array."""
+        mask = df['event_type'].isin(self.event_types)
+        for field, op, value in self.where:
+            column = df[field]
+            mask &= column.notna() & op(column, value).fillna(False).astype(bool)
+        return mask.to_numpy(dtype=bool)
+
+    def incident(self, feat: Dict[str, Any]) -> Dict[str, Any]:
+        inc = {'timestamp': feat['timestamp'], 'scanner_id': feat['scanner_id'], 'incident': self.name}
+        for out, field in self.output.items():
+            inc[out] = feat.get(field)
+        return inc
+
+class RuleSet:
+    """Compiled rules: a dispatch table keyed by event_type plus the bucket checks."""
+
+    def __init__(self, rules: List[CompiledRule], match_tolerance: timedelta = MATCH_TOLERANCE):
+        if match_tolerance < timedelta(0):
+            raise ValueError("match_tolerance must not be negative")
+        self.rules = rules
+        self.match_tolerance = match_tolerance
+        self.dispatch = {}
+        for rule in rules:
+            if rule.kind != 'bucket':
+                for event_type in rule.event_types:
+                    self.dispatch.setdefault(event_type, []).append(rule)
+        self.bucket_rules = {rule.check: rule for rule in rules if rule.kind == 'bucket'}
+        self.output_fields = {rule.name: list(rule.output) for rule in rules}
+
+    def event_incidents(self, feat: Dict[str, Any], dwell_anchors: Dict[str, Dict[Any, Any]]) -> List[Dict[str, Any]]:
+        """Incidents raised by one event; dwell_anchors holds per-rule, per-scanner dwell state."""
+        incidents = []
+        for rule in self.dispatch.get(feat['event_type'], ()):
+            if not rule.matches(feat):
+                continue
+            if rule.kind == 'event':
+                incidents.append(rule.incident(feat))
+                continue
+            anchors = dwell_anchors.setdefault(rule.name, {})
+            scanner = feat['scanner_id']
+            ts = feat['timestamp']
+            if scanner not in anchors:
+                anchors[scanner] = ts
+            elif ts - anchors[scanner] >= rule.window:
+                incidents.append(rule.incident(feat))
+                anchors[scanner] = ts
+        return incidents
+
+    def bucket_incidents(self, ts, scanner, rfid_products, barcode_products, scanned_products) -> List[Dict[str, Any]]:
+        """Incidents raised by the RFID/camera and barcode reads sharing one (timestamp, scanner) bucket."""
+        incidents = []
+        # Scanner avoidance: RFID/camera but no barcode for same product
+        rule = self.bucket_rules.get('avoidance')
+        if rule:
+            for prod in rfid_products:
+                if prod not in barcode_products:
+                    incidents.append({'timestamp': ts, 'scanner_id': scanner, 'incident': rule.name, 'product': prod})
+        # Product swap: barcode for one product, RFID/camera for another at same time
+        rule = self.bucket_rules.get('swap')
+        if rule:
+            for bprod in barcode_products:
+                for rprod in rfid_products:
+                    if bprod != rprod:
+                        incidents.append({'timestamp': ts, 'scanner_id': scanner, 'incident': rule.name,
+                                          'barcode': bprod, 'actual': rprod})
+        # Unscanned item: RFID/camera product never scanned at this scanner
+        rule = self.bucket_rules.get('unscanned')
+        if rule:
+            for prod in rfid_products:
+                if prod not in scanned_products:
+                    incidents.append({'timestamp': ts, 'scanner_id': scanner, 'incident': rule.name, 'product': prod})
+        return incidents
+
+def compile_rules(rules: List[Dict[str, Any]], match_tolerance: timedelta = MATCH_TOLERANCE) -> RuleSet:
+    """Compile rule specs into a RuleSet."""
+    names = [rule['name'] for rule in rules]
+    if len(names) != len(set(names)):
+        raise ValueError("Rule names must be unique")
+    return RuleSet([CompiledRule(rule) for rule in rules], match_tolerance)
+
+def load_rules(path: Optional[str] = None) -> RuleSet:
+    """
+    Load and compile rules from a JSON config file. Only the repository's own
+    config/rules.json may be missing, in which case DEFAULT_RULES apply (with a
+    warning); a path given explicitly or through RULES_CONFIG must exist.
+    """
+    path = path or RULES_PATH
+    if not os.path.exists(path):
+        if path != DEFAULT_RULES_PATH:
+            raise FileNotFoundError(f"Rules config {path} does not exist")
+        warnings.warn(f"No rules config at {path}; using the built-in default rules")
+        return compile_rules(DEFAULT_RULES)
+    with open(path, 'r') as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        return compile_rules(config)
+    return compile_rules(config['rules'], timedelta(seconds=config.get('match_tolerance_seconds', 0)))
+
+_default_ruleset = None
+
+def default_ruleset() -> RuleSet:
+    """The rule set loaded from RULES_PATH, compiled once per process."""
+    global _default_ruleset
+    if _default_ruleset is None:
+        _default_ruleset = load_rules()
+    return _default_ruleset
@@ -0,0 +1,217 @@
+import hashlib
+import math
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Online per-scanner session aggregates.
+#
+# Replaces the groupby('scanner_id').agg(...) + merge that used to be recomputed
+# on every batch. Each scanner keeps running counts and sums plus a distinct
+# product counter, updated in O(1) per event. An event's session features are
+# the aggregates of its scanner's session up to and including that event, so
+# the value no longer depends on how large the surrounding batch is, and
+# training, the API and the dashboard all compute them the same way.
+
+SESSION_FEATURES = ['event_count', 'unique_products', 'avg_queue_length', 'failures']
+# Definition of the session features a model was trained with, recorded in its
+# feature pipeline: 1 was the batch-wide groupby, 2 the per-scanner running aggregates
+SESSION_FEATURES_VERSION = 2
+
+# Distinct products are counted exactly up to this many per scanner, then
+# with a HyperLogLog sketch of 2**HLL_PRECISION one-byte registers
+EXACT_DISTINCT_LIMIT = 1024
+HLL_PRECISION = 12
+
+def _hash64(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+class DistinctCounter:
+    """Distinct-value counter: an exact set while small, a HyperLogLog sketch beyond EXACT_DISTINCT_LIMIT."""
+
+    __slots__ = ('values', 'registers', 'inverse_sum', 'zeros')
+
+    def __init__(self):
+        self.values = set()
+        self.registers = None
+        # Running sum of 2**-register and count of empty registers, so estimates are O(1)
+        self.inverse_sum = 0.0
+        self.zeros = 0
+
+    def add(self, value) -> None:
+        if self.registers is None:
+            if value in self.values:
+                return
+            self.values.add(value)
+            if len(self.values) <= EXACT_DISTINCT_LIMIT:
+                return
+            # Switch to the sketch
+            self.registers = bytearray(1 << HLL_PRECISION)
+            self.inverse_sum = float(len(self.registers))
+            self.zeros = len(self.registers)
+            for v in self.values:
+                self._add_hashed(v)
+            self.values = None
+        else:
+            self._add_hashed(value)
+
+    def copy(self) -> 'DistinctCounter':
+        other = DistinctCounter()
+        other.values = None if self.values is None else set(self.values)
+        other.registers = None if self.registers is None else bytearray(self.registers)
+        other.inverse_sum = self.inverse_sum
+        other.zeros = self.zeros
+        return other
+
+    def _add_hashed(self, value) -> None:
+        h = _hash64(value)
+        index = h >> (64 - HLL_PRECISION)
+        rest = (h << HLL_PRECISION) & ((1 << 64) - 1)
+        rank = 64 - HLL_PRECISION + 1 if rest == 0 else 65 - rest.bit_length()
+        old = self.registers[index]
+        if rank > old:
+            self.registers[index] = rank
+            self.inverse_sum += 2.0 ** -rank - 2.0 ** -old
+            if old == 0:
+                self.zeros -= 1
+
+    def count(self) -> int:
+        if self.registers is None:
+            return len(self.values)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / self.inverse_sum
+        if estimate <= 2.5 * m and self.zeros:
+            estimate = m * math.log(m / self.zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+class ScannerSession:
+    """Running aggregates for one scanner."""
+
+    __slots__ = ('event_count', 'queue_sum', 'queue_count', 'failures', 'products')
+
+    def __init__(self):
+        self.event_count = 0
+        self.queue_sum = 0.0
+        self.queue_count = 0
+        self.failures = 0
+        self.products = DistinctCounter()
+
+    def copy(self) -> 'ScannerSession':
+        other = ScannerSession()
+        other.event_count = self.event_count
+        other.queue_sum = self.queue_sum
+        other.queue_count = self.queue_count
+        other.failures = self.failures
+        other.products = self.products.copy()
+        return other
+
+    def features(self) -> Dict[str, Any]:
+        return {
+            'event_count': self.event_count,
+            'unique_products': self.products.count(),
+            'avg_queue_length': self.queue_sum / self.queue_count if self.queue_count else float('nan'),
+            'failures': self.failures,
+        }
+
+class SessionStore:
+    """Per-scanner session aggregates, updated one event (or one frame) at a time."""
+
+    def __init__(self):
+        self.sessions: Dict[Any, ScannerSession] = {}
+
+    def session(self, scanner) -> ScannerSession:
+        session = self.sessions.get(scanner)
+        if session is None:
+            session = self.sessions[scanner] = ScannerSession()
+        return session
+
+    def features(self, scanner) -> Dict[str, Any]:
+        """Current session features of a scanner without updating them."""
+        return self.session(scanner).features()
+
+    def checkpoint(self, scanners: pd.Series) -> Dict[Any, Optional[ScannerSession]]:
+        """Copies of the sessions a frame with these scanner ids would update (None: not created yet), for restore()."""
+        keys = list(scanners.astype('category').cat.categories) + [None]
+        return {key: self.sessions[key].copy() if key in self.sessions else None for key in keys}
+
+    def restore(self, checkpoint: Dict[Any, Optional[ScannerSession]]) -> None:
+        """Put the sessions back as they were at checkpoint()."""
+        for key, session in checkpoint.items():
+            if session is None:
+                self.sessions.pop(key, None)
+            else:
+                self.sessions[key] = session
+
+    def update(self, feat: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold one feature dict into its scanner's session and return the session features for it."""
+        session = self.session(feat.get('scanner_id'))
+        if feat.get('event_type') is not None:
+            session.event_count += 1
+        product = feat.get('product_id')
+        if product is not None:
+            session.products.add(product)
+        queue_length = feat.get('queue_length')
+        if queue_length is not None:
+            session.queue_sum += queue_length
+            session.queue_count += 1
+        if feat.get('equipment_status') == 'failure':
+            session.failures += 1
+        return session.features()
+
+    def annotate_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fold a feature frame into the store in row order and return a copy with
+        SESSION_FEATURES columns, equal to calling update() on every row.
+        Counts and sums are per-scanner cumulative sums on top of the stored totals.
+        """
+        scanners = df['scanner_id'].astype('category')
+        codes = scanners.cat.codes.to_numpy()
+        sessions = [self.session(scanner) for scanner in scanners.cat.categories]
+        # Code -1 (missing scanner) indexes the last slot
+        sessions.append(self.session(None) if (codes < 0).any() else ScannerSession())
+        group = pd.Series(codes, index=df.index)
+        base = lambda attr: np.array([getattr(s, attr) for s in sessions], dtype=float)[codes]
+
+        def running(values: np.ndarray) -> np.ndarray:
+            return pd.Series(values, index=df.index).groupby(group).cumsum().to_numpy()
+
+        has_event = df['event_type'].notna().to_numpy()
+        event_count = base('event_count') + running(has_event.astype(np.int64))
+        queue_length = pd.to_numeric(df['queue_length'], errors='coerce').astype(float)
+        queue_present = queue_length.notna().to_numpy()
+        queue_sum = base('queue_sum') + running(queue_length.fillna(0).to_numpy())
+        queue_count = base('queue_count') + running(queue_present.astype(np.int64))
+        is_failure = (df['equipment_status'] == 'failure').fillna(False).to_numpy(dtype=bool)
+        failures = base('failures') + running(is_failure.astype(np.int64))
+        # Distinct products only change on the first occurrence of a (scanner, product) pair in the frame
+        before = np.array([s.products.count() for s in sessions], dtype=float)
+        unique = np.full(len(df), np.nan)
+        product = df['product_id']
+        first = product.notna() & ~pd.DataFrame({'s': codes, 'p': product.to_numpy()}, index=df.index).duplicated()
+        first_rows = np.flatnonzero(first.to_numpy())
+        for row, code, value in zip(first_rows.tolist(), codes[first_rows].tolist(), product.iloc[first_rows].tolist()):
+            counter = sessions[code].products
+            counter.add(value)
+            unique[row] = counter.count()
+        unique = pd.Series(unique, index=df.index).groupby(group).ffill().to_numpy(copy=True)
+        missing = np.isnan(unique)
+        unique[missing] = before[codes[missing]]
+
+        # Store the end-of-frame totals
+        last_rows = pd.Series(np.arange(len(df))).groupby(codes).last()
+        for code, row in last_rows.items():
+            session = sessions[code]
+            session.event_count = int(event_count[row])
+            session.queue_sum = float(queue_sum[row])
+            session.queue_count = int(queue_count[row])
+            session.failures = int(failures[row])
+
+        out = df.copy()
+        out['event_count'] = event_count.astype(np.int64)
+        out['unique_products'] = unique.astype(np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['avg_queue_length'] = np.where(queue_count > 0, queue_sum / np.maximum(queue_count, 1), np.nan)
+        out['failures'] = failures.astype(np.int64)
+        return out
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import getpass
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set
+
+import numpy as np
+import websockets
+
+from preprocess import clean_event
+from feature_extraction import iter_features
+from session_state import SessionStore
+from model_export import load_model, default_model_path
+from rule_based import IncidentDetector
+
+# Real-time scoring of the stream_server.py event stream.
+#
+# Connects to the stream as a client, and for every event it receives updates
+# the scanner's session state, scores the event with the trained model, runs
+# the online rule engine, and replies with the prediction before reading the
+# next event. Scoring runs on a worker thread so the event loop keeps serving
+# subscribers meanwhile. Incidents (model and rule-based) are published to
+# every subscriber connected to the publish port.
+#
+# End-to-end latency (server send to prediction received) is measured by
+# stream_server.py, which logs it per event and reports percentiles; this
+# side reports its own share, from receiving an event to sending the reply.
+
+MODEL_PATH = default_model_path()
+STREAM_URI = os.environ.get('STREAM_URI', 'ws://localhost:8765')
+PUBLISH_HOST = '0.0.0.0'
+PUBLISH_PORT = 8766
+# Incidents buffered per subscriber; the oldest are dropped when a subscriber falls behind
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat() + 'Z'
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+class IncidentBus:
+    """In-process pub/sub: every subscriber gets its own bounded queue of incidents."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def publish(self, incident: Dict[str, Any]) -> None:
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(incident)
+
+    def close(self) -> None:
+        """Tell every subscriber the stream has ended."""
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+class StreamScorer:
+    """Model, feature encoding, session state and online rules for one event stream."""
+
+    def __init__(self, model, pipeline, detector: Optional[IncidentDetector] = None):
+        if not pipeline.fitted:
+            # Without vocabularies every category would score as the same code
+            raise ValueError("Stream scoring needs a model saved with its fitted feature pipeline; "
+                             "retrain it or export one that has its vocabularies")
+        self.model = model
+        self.pipeline = pipeline
+        self.sessions = SessionStore()
+        self.detector = detector or IncidentDetector()
+
+    def score(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Prediction and incidents for one raw event."""
+        if clean_event(event) is None:
+            return {'prediction': None, 'incidents': [], 'error': 'invalid timestamp'}
+        feat = next(iter_features([event]))
+        feat.update(self.sessions.update(feat))
+        prediction = int(self.model.predict(self.pipeline.encode_record(feat)[None, :])[0])
+        incidents = []
+        if prediction == 1:
+            incidents.append({'timestamp': feat['timestamp'], 'scanner_id': feat['scanner_id'],
+                              'incident': 'model', 'event_type': feat['event_type']})
+        # The rules compare timestamps, so only events that carry one reach them
+        if isinstance(feat['timestamp'], datetime):
+            incidents.extend(self.detector.push(feat))
+        return {'prediction': prediction, 'incidents': incidents}
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Count, mean and percentiles of per-event times, in milliseconds."""
+    if not latencies:
+        return {'events': 0}
+    ms = np.array(latencies) * 1000
+    return {'events': len(ms), 'mean_ms': float(ms.mean()), 'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)), 'p99_ms': float(np.percentile(ms, 99)), 'max_ms': float(ms.max())}
+
+async def consume(uri: str, password: str, scorer: StreamScorer, bus: IncidentBus) -> List[float]:
+    """Answer every event on the stream with a prediction; return per-event handling times in seconds."""
+    latencies = []
+    loop = asyncio.get_running_loop()
+    # One thread: session state and the rule engine need events in stream order
+    executor = ThreadPoolExecutor(1, thread_name_prefix='stream-scoring')
+    async with websockets.connect(uri) as websocket:
+        await websocket.send(password)
+        try:
+            async for message in websocket:
+                # From receiving the event to handing the reply to the socket
+                start = time.perf_counter()
+                event = json.loads(message)
+                if not isinstance(event, dict) or 'error' in event:
+                    print(f"Server: {message}")
+                    continue
+                result = await loop.run_in_executor(executor, scorer.score, event)
+                await websocket.send(json.dumps({'prediction': result['prediction'],
+                                                 'incidents': [i['incident'] for i in result['incidents']]}))
+                latencies.append(time.perf_counter() - start)
+                for incident in result['incidents']:
+                    bus.publish(incident)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            executor.shutdown()
+    # Buckets still open when the stream ends
+    for incident in scorer.detector.flush():
+        bus.publish(incident)
+    return latencies
+
+def subscriber_handler(bus: IncidentBus):
+    async def handler(websocket):
+        queue = bus.subscribe()
+        try:
+            while True:
+                incident = await queue.get()
+                if incident is None:
+                    break
+                await websocket.send(json.dumps(incident, default=_json_default))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            bus.unsubscribe(queue)
+    return handler
+
+async def main(args):
+    model, pipeline = load_model(args.model)
+    scorer = StreamScorer(model, pipeline)
+    bus = IncidentBus()
+    async with websockets.serve(subscriber_handler(bus), PUBLISH_HOST, args.publish_port):
+        print(f"Publishing incidents on ws://localhost:{args.publish_port}")
+        try:
+            latencies = await consume(args.uri, args.password, scorer, bus)
+        finally:
+            bus.close()
+    print("Time from receiving each event to sending its prediction (end-to-end latency is in the server's report):")
+    print(json.dumps(latency_summary(latencies), indent=2))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score the event stream in real time and publish incidents.')
+    parser.add_argument('--uri', default=STREAM_URI, help='stream_server address')
+    parser.add_argument('--password', default=os.environ.get('STREAM_PASSWORD'), help='stream password (prompted if omitted)')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--publish-port', type=int, default=PUBLISH_PORT)
+    args = parser.parse_args()
+    if args.password is None:
+        args.password = getpass.getpass('Enter password: ')
+    asyncio.run(main(args))
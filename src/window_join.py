@@ -0,0 +1,75 @@
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+
+# Sorted, per-group interval index for matching reads within a time tolerance.
+#
+# Right-side reads are sorted by (group, timestamp) once; each left read then
+# finds its window [t - tolerance, t + tolerance] inside its group's slice with
+# two binary searches. Cost is O((n + m) log m + k) for k matched pairs, instead
+# of comparing every read with every other read of the scanner.
+
+def _expand_ranges(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Expand [lo[i], hi[i]) ranges into (i, j) index pairs."""
+    counts = hi - lo
+    left = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, np.repeat(lo, counts) + offsets
+
+def window_join(left_ts: np.ndarray, left_group: np.ndarray, right_ts: np.ndarray, right_group: np.ndarray,
+                tolerance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return index arrays (i, j) of every pair with left_group[i] == right_group[j]
+    and |left_ts[i] - right_ts[j]| <= tolerance. Timestamps and tolerance are
+    integers in the same unit (e.g. epoch nanoseconds); groups are integer codes.
+    """
+    left_ts = np.asarray(left_ts, dtype=np.int64)
+    left_group = np.asarray(left_group, dtype=np.int64)
+    right_ts = np.asarray(right_ts, dtype=np.int64)
+    right_group = np.asarray(right_group, dtype=np.int64)
+    right_order = np.lexsort((right_ts, right_group))
+    sorted_ts = right_ts[right_order]
+    groups, starts = np.unique(right_group[right_order], return_index=True)
+    ends = np.append(starts[1:], len(right_order))
+    lo = np.zeros(len(left_ts), dtype=np.int64)
+    hi = np.zeros(len(left_ts), dtype=np.int64)
+    # Walk left reads one group at a time
+    left_order = np.argsort(left_group, kind='stable')
+    left_groups, left_starts = np.unique(left_group[left_order], return_index=True)
+    left_ends = np.append(left_starts[1:], len(left_order))
+    slot = np.searchsorted(groups, left_groups)
+    for g, start, end, k in zip(left_groups.tolist(), left_starts.tolist(), left_ends.tolist(), slot.tolist()):
+        if k >= len(groups) or groups[k] != g:
+            continue  # no right reads for this group
+        rows = left_order[start:end]
+        index = sorted_ts[starts[k]:ends[k]]
+        lo[rows] = starts[k] + np.searchsorted(index, left_ts[rows] - tolerance, side='left')
+        hi[rows] = starts[k] + np.searchsorted(index, left_ts[rows] + tolerance, side='right')
+    left, right = _expand_ranges(lo, hi)
+    return left, right_order[right]
+
+def _synthetic_reads(n: int, n_groups: int, rng: np.random.Generator):
+    """n reads spread over n_groups scanners at a fixed per-scanner rate of about one read per second."""
+    span = max(n // n_groups, 1) * 1_000_000_000
+    ts = rng.integers(0, span, size=n)
+    groups = rng.integers(0, n_groups, size=n)
+    return ts, groups
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000, 4_000_000), n_groups: int = 200, tolerance_ms: int = 300):
+    """Time window_join at increasing event counts; ns/event should stay roughly flat."""
+    rng = np.random.default_rng(0)
+    tolerance = tolerance_ms * 1_000_000
+    print(f"{'events':>10} {'pairs':>10} {'seconds':>9} {'ns/event':>9}")
+    for n in sizes:
+        left_ts, left_group = _synthetic_reads(n, n_groups, rng)
+        right_ts, right_group = _synthetic_reads(n, n_groups, rng)
+        start = time.perf_counter()
+        left, _ = window_join(left_ts, left_group, right_ts, right_group, tolerance)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>10} {len(left):>10} {elapsed:>9.3f} {elapsed / n * 1e9:>9.0f}")
+
+if __name__ == '__main__':
+    sizes = tuple(int(s) for s in sys.argv[1:]) or (10_000, 100_000, 1_000_000, 4_000_000)
+    benchmark(sizes)
@@ -0,0 +1,143 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+try:
+    import msgpack
+except ImportError:  # batched mode needs msgpack; JSON mode works without it
+    msgpack = None
+
+# Wire formats for the event stream (stream_server.py and its clients).
+#
+# Legacy clients send the bare password as their first message and get one
+# JSON text frame per event, answering each with one text frame.
+#
+# Newer clients send a JSON hello instead:
+#     {"password": ..., "protocol": "msgpack-batch", "batch_size": 64}
+# and the server answers with a JSON ack naming the protocol it picked. In
+# msgpack-batch mode the ack also carries the column list and the
+# dictionaries for DICTIONARY_COLUMNS. Events then arrive as binary frames
+#     [seq, count, {column: [values...]}]
+# with dictionary columns sent as integer codes and timestamps as epoch
+# milliseconds, and the client answers each with one binary frame
+#     [seq, [prediction, ...]]
+# Timestamps travel at millisecond resolution: digits below the millisecond
+# are dropped (floored), so only events with sub-millisecond timestamps
+# decode differently from their JSON form.
+
+JSON_PROTOCOL = 'json'
+BATCH_PROTOCOL = 'msgpack-batch'
+DEFAULT_BATCH_SIZE = 64
+MAX_BATCH_SIZE = 4096
+DICTIONARY_COLUMNS = ['scanner_id', 'event_type']
+TIMESTAMP_COLUMN = 'timestamp'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def batch_available() -> bool:
+    return msgpack is not None
+
+def client_hello(password: str, protocol: str = BATCH_PROTOCOL, batch_size: int = DEFAULT_BATCH_SIZE) -> str:
+    return json.dumps({'password': password, 'protocol': protocol, 'batch_size': batch_size})
+
+def parse_hello(message):
+    """(password, requested protocol or None for a legacy client, batch size) from a client's first message."""
+    if isinstance(message, str) and message.startswith('{'):
+        try:
+            hello = json.loads(message)
+        except ValueError:
+            hello = None
+        if isinstance(hello, dict) and 'password' in hello:
+            batch_size = min(max(int(hello.get('batch_size') or DEFAULT_BATCH_SIZE), 1), MAX_BATCH_SIZE)
+            return hello['password'], hello.get('protocol', JSON_PROTOCOL), batch_size
+    return message, None, 1
+
+def _epoch_ms(value):
+    try:
+        ts = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    # Integer arithmetic: float seconds * 1000 can land just below the millisecond
+    return (ts - EPOCH) // timedelta(milliseconds=1)
+
+def _iso(ms):
+    if ms is None:
+        return None
+    ts = EPOCH + timedelta(milliseconds=ms)
+    text = ts.strftime('%Y-%m-%dT%H:%M:%S')
+    if ms % 1000:
+        text += '.%03d' % (ms % 1000)
+    return text + 'Z'
+
+class BatchEncoder:
+    """Column layout and dictionaries for a fixed list of events, shared by every batched client."""
+
+    def __init__(self, events):
+        self.events = events
+        self.columns = []
+        for event in events:
+            for key in event:
+                if key not in self.columns:
+                    self.columns.append(key)
+        self.dictionaries = {col: [] for col in DICTIONARY_COLUMNS if col in self.columns}
+        self.codes = {col: {} for col in self.dictionaries}
+        for event in events:
+            for col, codes in self.codes.items():
+                value = event.get(col)
+                if value is not None and value not in codes:
+                    codes[value] = len(self.dictionaries[col])
+                    self.dictionaries[col].append(value)
+
+    def ack(self, batch_size: int) -> str:
+        return json.dumps({'protocol': BATCH_PROTOCOL, 'batch_size': batch_size,
+                           'columns': self.columns, 'dictionaries': self.dictionaries})
+
+    def encode(self, seq: int, start: int, stop: int) -> bytes:
+        batch = self.events[start:stop]
+        data = {}
+        for col in self.columns:
+            values = [event.get(col) for event in batch]
+            if col in self.codes:
+                codes = self.codes[col]
+                values = [None if v is None else codes[v] for v in values]
+            elif col == TIMESTAMP_COLUMN:
+                values = [_epoch_ms(v) for v in values]
+            data[col] = values
+        return msgpack.packb([seq, len(batch), data])
+
+    def frames(self, batch_size: int):
+        """(frame, first event index, event count) for every batch, in order."""
+        return [(self.encode(seq, start, min(start + batch_size, len(self.events))), start,
+                 min(batch_size, len(self.events) - start))
+                for seq, start in enumerate(range(0, len(self.events), batch_size))]
+
+class BatchDecoder:
+    """Client side of msgpack-batch: turns frames back into event dicts using the server's ack."""
+
+    def __init__(self, ack):
+        ack = json.loads(ack) if isinstance(ack, str) else ack
+        self.columns = ack['columns']
+        self.dictionaries = ack['dictionaries']
+        self.batch_size = ack['batch_size']
+
+    def decode(self, frame: bytes):
+        """(seq, events) for one batch frame; keys whose value is None are left out, as in the JSON events."""
+        seq, count, data = msgpack.unpackb(frame)
+        columns = []
+        for col in self.columns:
+            values = data[col]
+            if col in self.dictionaries:
+                table = self.dictionaries[col]
+                values = [None if v is None else table[v] for v in values]
+            elif col == TIMESTAMP_COLUMN:
+                values = [_iso(v) for v in values]
+            columns.append((col, values))
+        events = [{col: values[i] for col, values in columns if values[i] is not None} for i in range(count)]
+        return seq, events
+
+def encode_predictions(seq: int, predictions) -> bytes:
+    return msgpack.packb([seq, list(predictions)])
+
+def decode_predictions(frame: bytes):
+    seq, predictions = msgpack.unpackb(frame)
+    return seq, predictions
@@ -1,7 +1,14 @@
+import argparse
 import asyncio
+import functools
+import os
+import time
 import websockets
 import json
-from datetime import datetime
+import stream_protocol
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 PASSWORD = "zebra2025"  # Set your password here
 
@@ -9,44 +16,381 @@ PASSWORD = "zebra2025"  # Set your password here
 with open('events.json') as f:
     events = json.load(f)
 
-LOG_FILE = "client_logs.txt"
+# Every event is serialized once and the same string is sent to all clients
+payloads = [json.dumps(event) for event in events]
 
-def log_event(message: str):
-    timestamp = datetime.utcnow().isoformat() + "Z"
-    with open(LOG_FILE, "a") as logf:
-        logf.write(f"[{timestamp}] {message}\n")
+LOG_FILE = "client_logs.jsonl"
+# Log records are written in batches by a background task: every
+# LOG_FLUSH_INTERVAL seconds, or sooner once LOG_BATCH_SIZE records are waiting
+LOG_FLUSH_INTERVAL = 0.5
+LOG_BATCH_SIZE = 10000
+# Records held in memory at most; beyond that new records are dropped (and counted)
+LOG_MAX_PENDING = 1000000
+# The log is rotated to LOG_FILE.1 ... LOG_FILE.<LOG_BACKUPS> when it grows past LOG_MAX_BYTES
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUPS = 5
 
-async def stream_events(websocket):
+# Seconds a client has to answer an event before it is disconnected
+REPLY_TIMEOUT = 10
+# Default replay: one event per second, next event only after the previous reply
+DEFAULT_RATE = 1.0
+DEFAULT_WINDOW = 1
+
+def _log_default(value):
+    """JSON stand-in for values json.dumps can't encode: binary frames become their length."""
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    return str(value)
+
+class EventLog:
+    """
+    Non-blocking JSON-lines log. log() only appends a record to an in-memory
+    queue; a background task formats queued records and writes them in one
+    batch on a worker thread, so no disk I/O happens on the event loop.
+    Fields named 'event' hold already-serialized JSON and are embedded as is;
+    bytes values (binary frames) are logged as their length. A record that
+    can't be formatted, or a batch that can't be written, is counted and
+    reported in a later "Log records lost" record instead of stopping the writer.
+    """
+
+    def __init__(self, path: str = LOG_FILE, enabled: bool = True, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS):
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pending = deque()
+        self.dropped = 0
+        self.lost = 0
+        self.wakeup = None
+        self.task = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.file = None
+        self._second = None
+        self._second_text = ""
+
+    def log(self, message: str, client=None, **fields):
+        if not self.enabled:
+            return
+        if len(self.pending) >= LOG_MAX_PENDING:
+            self.dropped += 1
+            return
+        self.pending.append((time.time(), message, client, fields))
+        if len(self.pending) >= LOG_BATCH_SIZE and self.wakeup is not None:
+            self.wakeup.set()
+
+    def start(self):
+        if self.enabled:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the writer and flush whatever is still queued."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self._flush()
+        if self.file is not None:
+            self.file.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        if not self.pending and not self.dropped and not self.lost:
+            return
+        batch = self.pending
+        self.pending = deque()
+        if self.dropped:
+            batch.append((time.time(), "Log records dropped", None, {"count": self.dropped}))
+            self.dropped = 0
+        if self.lost:
+            batch.append((time.time(), "Log records lost", None, {"count": self.lost}))
+            self.lost = 0
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._write, batch)
+        except Exception as exc:  # e.g. disk full: lose this batch, keep logging
+            self.lost += len(batch)
+            print(f"Could not write {len(batch)} log records to {self.path}: {exc}")
+
+    def _format(self, record) -> str:
+        ts, message, client, fields = record
+        # Timestamps are formatted once per second and the microseconds appended
+        second = int(ts)
+        if second != self._second:
+            self._second = second
+            self._second_text = datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        parts = ['{"ts": "', self._second_text, ".%06dZ" % ((ts - second) * 1e6), '", "msg": ', json.dumps(message)]
+        if client is not None:
+            parts += [', "client": "', f"{client[0]}:{client[1]}" if isinstance(client, tuple) else str(client), '"']
+        for key, value in fields.items():
+            parts += [', "', key, '": ', value if key == "event" else json.dumps(value, default=_log_default)]
+        parts.append("}\n")
+        return "".join(parts)
+
+    def _write(self, batch):
+        """Runs on the worker thread."""
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self._format(record))
+            except Exception:
+                self.lost += 1
+        data = "".join(lines)
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write(data)
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a")
+
+event_log = EventLog()
+
+def event_offsets():
+    """Seconds from the first event to each event, from the events' own timestamps."""
+    offsets = []
+    start = None
+    last = 0.0
+    for event in events:
+        try:
+            ts = datetime.fromisoformat(event['timestamp'].replace('Z', ''))
+        except (KeyError, AttributeError, ValueError):
+            ts = None
+        if ts is not None:
+            if start is None:
+                start = ts
+            # Out-of-order timestamps are sent immediately rather than going back in time
+            last = max(last, (ts - start).total_seconds())
+        offsets.append(last)
+    return offsets
+
+def replay_schedule(rate: float = DEFAULT_RATE, speed: float = None):
+    """
+    Send time of every event, in seconds after the client authenticates.
+    speed replays the events' own timestamps time-warped by that factor
+    (60 = one hour of events per minute); otherwise events go out at a fixed
+    rate per second. A rate of 0 sends as fast as the in-flight window allows.
+    """
+    if speed:
+        return [offset / speed for offset in event_offsets()]
+    if not rate:
+        return [0.0] * len(payloads)
+    return [i / rate for i in range(len(payloads))]
+
+def json_frames():
+    """(frame, first event index, event count) per event for JSON mode."""
+    return [(payload, i, 1) for i, payload in enumerate(payloads)]
+
+_batch_encoder = None
+_batch_frames = {}
+
+def batch_frames(batch_size: int):
+    """Encoded msgpack batches of batch_size events, built once per batch size and shared by all clients."""
+    global _batch_encoder
+    if _batch_encoder is None:
+        _batch_encoder = stream_protocol.BatchEncoder(events)
+    if batch_size not in _batch_frames:
+        _batch_frames[batch_size] = _batch_encoder.frames(batch_size)
+    return _batch_frames[batch_size]
+
+class StreamStats:
+    """
+    Events, bytes, streaming time and reply latency per protocol, reported per
+    client and on shutdown. Latency runs from handing a frame to the socket to
+    reading its prediction, so it covers the network both ways and the client's
+    scoring.
+    """
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, protocol: str, events: int, nbytes: int, seconds: float, latencies=()):
+        total = self.totals.setdefault(protocol, {"clients": 0, "events": 0, "bytes": 0, "seconds": 0.0, "latencies": []})
+        total["clients"] += 1
+        total["events"] += events
+        total["bytes"] += nbytes
+        total["seconds"] += seconds
+        total["latencies"].extend(latencies)
+
+    @staticmethod
+    def latency_percentiles(latencies):
+        """p50/p95/p99/max reply latency in milliseconds."""
+        if not latencies:
+            return {}
+        ordered = sorted(latencies)
+        pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 2)
+        return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": pick(1.0)}
+
+    @staticmethod
+    def rates(events: int, nbytes: int, seconds: float):
+        return {"bytes_per_event": round(nbytes / events, 1) if events else None,
+                "events_per_s": round(events / seconds, 1) if seconds else None}
+
+    def report(self):
+        for protocol, total in self.totals.items():
+            rates = self.rates(total["events"], total["bytes"], total["seconds"])
+            latency = self.latency_percentiles(total["latencies"])
+            print(f"{protocol}: {total['clients']} clients, {total['events']} events, {total['bytes']} bytes, "
+                  f"{rates['bytes_per_event']} bytes/event, {rates['events_per_s']} events/s per client"
+                  + (f", reply latency p50 {latency['p50_ms']} ms p99 {latency['p99_ms']} ms" if latency else ""))
+
+stream_stats = StreamStats()
+
+async def send_frames(websocket, client, frames, schedule, in_flight: deque, window: asyncio.Semaphore, sent: asyncio.Event, counters):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for frame, first, count in frames:
+        # A batch goes out when its last event is due
+        delay = start + schedule[first + count - 1] - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Wait for a free slot in the in-flight window
+        await window.acquire()
+        in_flight.append((frame, first, count, loop.time()))
+        sent.set()
+        await websocket.send(frame)
+        counters["events"] += count
+        counters["bytes"] += len(frame)
+        if isinstance(frame, str):
+            event_log.log("Sent event", client, event=frame)
+        else:
+            event_log.log("Sent batch", client, first_event=first, events=count, bytes=len(frame))
+
+async def receive_predictions(websocket, client, frames, in_flight: deque, window: asyncio.Semaphore, sent: asyncio.Event,
+                              latencies: list):
+    """Read one reply per frame, in order, recording each frame's send-to-reply latency; False if the oldest unanswered frame times out."""
+    loop = asyncio.get_running_loop()
+    for seq in range(len(frames)):
+        while not in_flight:
+            sent.clear()
+            await sent.wait()
+        frame, first, count, sent_at = in_flight[0]
+        try:
+            prediction = await asyncio.wait_for(websocket.recv(), timeout=max(sent_at + REPLY_TIMEOUT - loop.time(), 0))
+        except asyncio.TimeoutError:
+            if isinstance(frame, str):
+                event_log.log("No prediction received (timeout)", client, event=frame)
+            else:
+                event_log.log("No predictions received for batch (timeout)", client, first_event=first, events=count)
+            return False
+        latency = loop.time() - sent_at
+        latencies.append(latency)
+        in_flight.popleft()
+        window.release()
+        if isinstance(frame, str):
+            event_log.log("Received prediction", client, prediction=prediction, latency_ms=round(latency * 1000, 3))
+        else:
+            try:
+                reply_seq, predictions = stream_protocol.decode_predictions(prediction)
+            except Exception:
+                reply_seq, predictions = None, []
+            if reply_seq != seq or len(predictions) != count:
+                event_log.log("Malformed batch reply", client, first_event=first, events=count)
+            else:
+                event_log.log("Received predictions", client, first_event=first, predictions=predictions,
+                              latency_ms=round(latency * 1000, 3))
+    return True
+
+async def stream_events(websocket, schedule=None, window_size: int = DEFAULT_WINDOW):
     client = websocket.remote_address
-    log_event(f"Client connected: {client}")
-    # Wait for the client to send the password as the first message
+    event_log.log("Client connected", client)
+    # Wait for the client to send the password (or a JSON hello carrying it) as the first message
     received = await websocket.recv()
-    if received != PASSWORD:
-        log_event(f"Client {client} failed authentication.")
+    password, protocol, batch_size = stream_protocol.parse_hello(received)
+    if password != PASSWORD:
+        event_log.log("Client failed authentication", client)
         await websocket.send(json.dumps({"error": "Invalid password"}))
         await websocket.close()
         return
 
-    log_event(f"Client {client} authenticated successfully.")
-    # If password is correct, start streaming events
-    for event in events:
-        await websocket.send(json.dumps(event))
-        log_event(f"Sent event to {client}: {json.dumps(event)}")
-        try:
-            prediction = await asyncio.wait_for(websocket.recv(), timeout=10)
-            log_event(f"Received prediction from {client}: {prediction}")
-        except asyncio.TimeoutError:
-            log_event(f"No prediction received from {client} for event: {json.dumps(event)} (timeout)")
-            await websocket.close()
-            return
-        await asyncio.sleep(1)
-    log_event(f"Finished streaming to {client}. Closing connection.")
+    # Legacy clients (bare password) get JSON without an ack
+    if protocol == stream_protocol.BATCH_PROTOCOL and stream_protocol.batch_available():
+        frames = batch_frames(batch_size)
+        await websocket.send(_batch_encoder.ack(batch_size))
+    else:
+        frames = json_frames()
+        if protocol is not None:
+            protocol = stream_protocol.JSON_PROTOCOL
+            await websocket.send(json.dumps({"protocol": protocol}))
+    protocol = protocol or stream_protocol.JSON_PROTOCOL
+    event_log.log("Client authenticated", client, protocol=protocol)
+    # If password is correct, start streaming events: up to window_size frames
+    # (events, or batches in msgpack-batch mode) may be awaiting a prediction at any time
+    in_flight = deque()
+    window = asyncio.Semaphore(window_size)
+    sent = asyncio.Event()
+    counters = {"events": 0, "bytes": 0}
+    latencies = []
+    started = time.perf_counter()
+    sender = asyncio.create_task(send_frames(websocket, client, frames, schedule or replay_schedule(), in_flight, window, sent, counters))
+    try:
+        finished = await receive_predictions(websocket, client, frames, in_flight, window, sent, latencies)
+    except websockets.ConnectionClosed:
+        event_log.log("Client disconnected", client)
+        return
+    finally:
+        sender.cancel()
+        elapsed = time.perf_counter() - started
+        stream_stats.add(protocol, counters["events"], counters["bytes"], elapsed, latencies)
+    if finished:
+        event_log.log("Finished streaming, closing connection", client, protocol=protocol, events=counters["events"],
+                      bytes=counters["bytes"], **StreamStats.rates(counters["events"], counters["bytes"], elapsed),
+                      **StreamStats.latency_percentiles(latencies))
     await websocket.close()
 
-async def main():
-    async with websockets.serve(stream_events, "0.0.0.0", 8765):
-        print("WebSocket server started on ws://localhost:8765 (password protected)")
-        await asyncio.Future()  # run forever
+def raise_open_file_limit():
+    """Allow as many sockets as the hard limit permits, for thousands of concurrent clients."""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+async def main(args):
+    raise_open_file_limit()
+    event_log.enabled = not args.no_log
+    event_log.start()
+    schedule = replay_schedule(args.rate, args.speed)
+    handler = functools.partial(stream_events, schedule=schedule, window_size=args.window)
+    # Per-message compression costs CPU and memory on every connection; events are small
+    async with websockets.serve(handler, "0.0.0.0", args.port, compression=None, backlog=args.backlog):
+        print(f"WebSocket server started on ws://localhost:{args.port} (password protected)")
+        try:
+            await asyncio.Future()  # run forever
+        finally:
+            stream_stats.report()
+            await event_log.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Replay events.json to WebSocket clients.")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="events per second per client (0 = unthrottled)")
+    parser.add_argument("--speed", type=float, default=None, help="replay event timestamps time-warped by this factor instead of a fixed rate")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="events (batches in msgpack-batch mode) that may await a prediction at once")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-log", action="store_true", help=f"do not write {LOG_FILE}")
+    parser.add_argument("--backlog", type=int, default=4096, help="listen backlog for bursts of new connections")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from event_store import NULL_TIMESTAMP, _to_epoch_ns, open_store, write_store
+from feature_extraction import extract_feature_frame
+
+EVENTS = [
+    {'timestamp': datetime(2025, 8, 4, 9, 0, 0, 123456), 'event_type': 'rfid_read', 'scanner_id': 'S1', 'product_id': 'P1'},
+    {'timestamp': datetime(2025, 8, 4, 9, 0, 1), 'event_type': 'queue_status', 'scanner_id': 'S2', 'queue_length': 0},
+    {'event_type': 'equipment_status', 'equipment_status': 'failure'},
+    {'timestamp': datetime(2025, 8, 4, 9, 0, 2), 'event_type': 'barcode_scan', 'scanner_id': 'S1', 'product_id': 'P1',
+     'barcode_data': 'B1'},
+]
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'store')
+    assert write_store(EVENTS, path) == len(EVENTS)
+    store = open_store(path)
+    assert len(store) == len(EVENTS)
+    assert list(store.iter_events()) == EVENTS
+    # The memory-mapped frame holds the same values as the one built from the events
+    # (category order follows the store's dictionaries)
+    pd.testing.assert_frame_equal(extract_feature_frame(path).astype(object), extract_feature_frame(EVENTS).astype(object))
+
+def test_aware_and_offset_timestamps_are_utc():
+    naive = _to_epoch_ns(datetime(2025, 8, 4, 9))
+    assert _to_epoch_ns('2025-08-04T09:00:00Z') == naive
+    assert _to_epoch_ns('2025-08-04T09:00:00+00:00') == naive
+    assert _to_epoch_ns('2025-08-04T11:00:00+02:00') == naive
+    assert _to_epoch_ns(datetime(2025, 8, 4, 9, tzinfo=timezone.utc)) == naive
+    assert _to_epoch_ns(datetime(2025, 8, 4, 4, tzinfo=timezone(timedelta(hours=-5)))) == naive
+
+def test_out_of_range_timestamp_is_missing():
+    assert _to_epoch_ns('1500-01-01T00:00:00') == NULL_TIMESTAMP
@@ -0,0 +1,27 @@
+import json
+
+import pandas as pd
+
+from feature_extraction import extract_feature_frame
+from labeling import NAT, epoch_ns
+
+EVENTS = [
+    {'timestamp': '1500-01-01T00:00:00', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 3},
+    {'timestamp': '2024-01-01T10:00:00Z', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 4},
+    {'timestamp': 'not a timestamp', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 5},
+]
+
+def test_out_of_range_timestamp_kept_as_nat(tmp_path):
+    path = tmp_path / 'events.json'
+    path.write_text(json.dumps(EVENTS))
+    df = extract_feature_frame(str(path))
+    # The year-1500 event is kept like load_events keeps it; only the unparseable one is dropped
+    assert df['queue_length'].tolist() == [3, 4]
+    assert df['timestamp'].dtype == 'datetime64[ns]'
+    assert pd.isna(df['timestamp'][0])
+    assert df['timestamp'][1] == pd.Timestamp('2024-01-01T10:00:00')
+
+def test_epoch_ns_out_of_range_is_nat():
+    ns = epoch_ns(['1500-01-01T00:00:00', '2024-01-01T10:00:00Z'])
+    assert ns[0] == NAT
+    assert ns[1] == pd.Timestamp('2024-01-01T10:00:00').value
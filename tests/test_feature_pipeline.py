@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_extraction import extract_feature_frame
+from feature_pipeline import MISSING_TOKEN, UNKNOWN_CODE, FeaturePipeline
+from session_state import SessionStore
+
+EVENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'retail_events.json')
+
+@pytest.fixture(scope='module')
+def frame():
+    return SessionStore().annotate_frame(extract_feature_frame(EVENTS_PATH))
+
+@pytest.fixture(scope='module')
+def pipeline(frame):
+    return FeaturePipeline().fit(frame.iloc[: len(frame) // 2])
+
+def test_transform_matches_encode_record(frame, pipeline):
+    X = pipeline.transform(frame)
+    rows = np.array([pipeline.encode_record(feat) for feat in frame.to_dict(orient='records')])
+    np.testing.assert_array_equal(X.to_numpy(dtype=float), rows)
+
+def test_schema_and_joblib_round_trips_encode_alike(frame, pipeline, tmp_path):
+    X = pipeline.transform(frame)
+    restored = FeaturePipeline.from_schema(pipeline.to_schema())
+    pd.testing.assert_frame_equal(restored.transform(frame), X)
+    path = str(tmp_path / 'model.pipeline.joblib')
+    pipeline.save(path)
+    pd.testing.assert_frame_equal(FeaturePipeline.load(path).transform(frame), X)
+
+def test_codes_do_not_depend_on_the_batch(frame, pipeline):
+    X = pipeline.transform(frame)
+    # Any slice of the frame gets the codes its rows get in the whole frame
+    part = frame.iloc[::7]
+    pd.testing.assert_frame_equal(pipeline.transform(part), X.iloc[::7])
+
+def test_unseen_and_missing_values():
+    pipeline = FeaturePipeline(['product_id', 'queue_length']).fit(pd.DataFrame({'product_id': ['P1', 'P2', None],
+                                                                                 'queue_length': [1, 2, 3]}))
+    df = pd.DataFrame({'product_id': ['P2', 'P9', None], 'queue_length': [4, None, 5]})
+    X = pipeline.transform(df)
+    vocab = pipeline.vocabularies['product_id'].tolist()
+    assert X['product_id'].tolist() == [vocab.index('P2'), UNKNOWN_CODE, vocab.index(MISSING_TOKEN)]
+    assert pipeline.encode_record({'product_id': 'P9', 'queue_length': None}).tolist()[0] == UNKNOWN_CODE
+    assert np.isnan(X['queue_length'][1])
+
+def test_unfitted_pipeline_refuses_records():
+    with pytest.raises(ValueError):
+        FeaturePipeline().encode_record({'product_id': 'P1'})
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pandas as pd
+
+from feature_extraction import extract_feature_frame
+from labeling import label_frame
+
+EVENTS = [
+    {'timestamp': '2025-08-04T09:00:00Z', 'event_type': 'rfid_read', 'scanner_id': 'S1', 'product_id': 'P1'},
+    {'timestamp': '2025-08-04T09:00:00Z', 'event_type': 'rfid_read', 'scanner_id': 'S1', 'product_id': 'P2'},
+    {'timestamp': '2025-08-04T09:00:00Z', 'event_type': 'rfid_read', 'scanner_id': 'S2', 'product_id': 'P1'},
+    {'timestamp': '2025-08-04T09:00:01Z', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 9},
+    {'timestamp': '2025-08-04T09:00:02Z', 'event_type': 'rfid_read', 'scanner_id': 'S3', 'product_id': 'P1'},
+]
+
+INCIDENTS = [
+    # Same instant in every timestamp form the log may use
+    {'timestamp': '2025-08-04T09:00:00Z', 'scanner_id': 'S1', 'incident': 'scanner_avoidance', 'product': 'P1'},
+    {'timestamp': datetime(2025, 8, 4, 9, 0, 0), 'scanner_id': 'S2', 'incident': 'unscanned_item', 'product': 'P1'},
+    # No product: matches events without one
+    {'timestamp': '2025-08-04T09:00:01', 'scanner_id': 'S1', 'incident': 'queue_buildup', 'queue_length': 9},
+    # Scanner and product no event has, and an unusable timestamp
+    {'timestamp': '2025-08-04T09:00:02Z', 'scanner_id': 'S9', 'incident': 'unscanned_item', 'product': 'P1'},
+    {'timestamp': 'never', 'scanner_id': 'S3', 'incident': 'unscanned_item', 'product': 'P1'},
+]
+
+def naive_labels(events, incidents):
+    stamp = lambda ts: pd.Timestamp(ts).tz_localize(None) if pd.Timestamp(ts).tzinfo else pd.Timestamp(ts)
+    keys = set()
+    for inc in incidents:
+        try:
+            keys.add((stamp(inc['timestamp']), inc['scanner_id'], inc.get('product')))
+        except ValueError:
+            pass
+    return [int((stamp(e['timestamp']), e.get('scanner_id'), e.get('product_id')) in keys) for e in events]
+
+def test_label_frame():
+    labels = label_frame(extract_feature_frame(EVENTS), INCIDENTS)
+    assert labels.tolist() == [1, 0, 1, 1, 0]
+    assert labels.tolist() == naive_labels(EVENTS, INCIDENTS)
+
+def test_label_frame_on_plain_columns():
+    # String (non-categorical) columns and an incident frame label the same
+    df = pd.DataFrame(EVENTS)
+    assert label_frame(df, pd.DataFrame(INCIDENTS)).tolist() == [1, 0, 1, 1, 0]
+
+def test_label_frame_without_incidents():
+    assert label_frame(extract_feature_frame(EVENTS), []).tolist() == [0] * len(EVENTS)
@@ -0,0 +1,28 @@
+import numpy as np
+import xgboost
+
+from model_export import _LibBooster, _load_lib, load_booster
+
+def train_booster(path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 4)).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = (np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1]) > 0).astype(np.float32)
+    dtrain = xgboost.DMatrix(X, y, feature_names=['a', 'b', 'c', 'd'])
+    booster = xgboost.train({'objective': 'binary:logistic', 'max_depth': 3}, dtrain, num_boost_round=20)
+    booster.save_model(path)
+    return booster, X
+
+def test_library_booster_matches_xgboost(tmp_path):
+    path = str(tmp_path / 'model.ubj')
+    reference, X = train_booster(path)
+    assert _load_lib() is not None
+    booster = load_booster(path)
+    assert isinstance(booster, _LibBooster)
+    assert booster.feature_names == ['a', 'b', 'c', 'd']
+    booster.set_param('nthread', 1)
+    np.testing.assert_array_equal(booster.inplace_predict(X), reference.inplace_predict(X))
+    # One row, and a result that outlives the next call
+    first = booster.inplace_predict(X[:1])
+    booster.inplace_predict(X[1:3])
+    np.testing.assert_array_equal(first, reference.inplace_predict(X[:1]))
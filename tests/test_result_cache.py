@@ -0,0 +1,52 @@
+import tracemalloc
+
+import numpy as np
+
+from feature_extraction import extract_feature_frame
+from result_cache import ResultCache, row_keys
+from session_state import SessionStore
+
+def events(*rows):
+    return extract_feature_frame([{'timestamp': ts, 'event_type': 'rfid_read', 'scanner_id': 'S1', 'product_id': product}
+                                  for ts, product in rows])
+
+def test_memory_cap_holds_when_full():
+    cache = ResultCache(2 ** 20)
+    keys = np.random.default_rng(0).integers(0, 2 ** 63, 3 * cache.max_entries, dtype=np.int64).astype(np.uint64)
+    tracemalloc.start()
+    for chunk in np.array_split(keys, 30):
+        cache.store('v1', chunk, np.ones(len(chunk), dtype=np.int64))
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(cache.entries) == cache.max_entries
+    assert cache.nbytes() <= 2 ** 20
+    assert traced <= 2 ** 20
+
+def test_hit_keeps_the_prediction_of_its_first_session_context():
+    sessions = SessionStore()
+    cache = ResultCache()
+    calls = []
+
+    def predict(frame):
+        # Stand-in model that only looks at the session features
+        calls.append(len(frame))
+        return (sessions.annotate_frame(frame)['event_count'] > 1).to_numpy(dtype=np.int64)
+
+    first = events(('2025-08-04T09:00:00Z', 'P1'))
+    assert cache.score('v1', first, predict).tolist() == [0]
+    assert cache.score('v1', events(('2025-08-04T09:00:01Z', 'P2')), predict).tolist() == [1]
+    count = sessions.features('S1')['event_count']
+    # Resubmitted: the cached prediction made when the scanner had one event comes back,
+    # although the model would now say 1, and the session does not count the event again
+    assert cache.score('v1', first, predict).tolist() == [0]
+    assert calls == [1, 1]
+    assert sessions.features('S1')['event_count'] == count
+    # A different model version scores it afresh under the current session
+    assert cache.score('v2', first, predict).tolist() == [1]
+
+def test_repeats_within_a_frame_are_all_scored():
+    frame = events(('2025-08-04T09:00:00Z', 'P1'), ('2025-08-04T09:00:00Z', 'P1'))
+    assert row_keys(frame)[0] == row_keys(frame)[1]
+    seen = []
+    ResultCache().score('v1', frame, lambda rows: seen.append(len(rows)) or np.zeros(len(rows)))
+    assert seen == [2]
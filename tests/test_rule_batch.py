@@ -0,0 +1,85 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from feature_extraction import extract_feature_frame, iter_features
+from preprocess import clean_event, iter_events
+from rule_based import IncidentDetector, detect_incidents
+from rule_batch import _first_reads, detect_incidents_frame, frame_to_incidents, same_incidents
+from rules import DEFAULT_RULES, compile_rules, load_rules
+
+EVENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'retail_events.json')
+
+def both_engines(path):
+    expected = detect_incidents(list(iter_features(iter_events(path))))
+    actual = frame_to_incidents(detect_incidents_frame(extract_feature_frame(path)))
+    return expected, actual
+
+def test_parity_on_retail_events():
+    expected, actual = both_engines(EVENTS_PATH)
+    assert expected
+    assert same_incidents(expected, actual)
+
+def test_parity_with_missing_scanner(tmp_path):
+    with open(EVENTS_PATH) as f:
+        events = json.load(f)
+    timestamp = events[0]['timestamp']
+    # Incidents of events without a scanner_id carry scanner_id None in both engines
+    events += [
+        {'timestamp': timestamp, 'event_type': 'queue_status', 'queue_length': 9},
+        {'timestamp': timestamp, 'event_type': 'equipment_status', 'equipment_status': 'failure'},
+        {'timestamp': timestamp, 'event_type': 'rfid_read', 'product_id': 'P-missing-scanner'},
+    ]
+    path = tmp_path / 'events.json'
+    path.write_text(json.dumps(events))
+    expected, actual = both_engines(str(path))
+    missing = [inc for inc in actual if inc['scanner_id'] is None]
+    assert {inc['incident'] for inc in missing} >= {'queue_buildup', 'scanner_failure'}
+    assert same_incidents(expected, actual)
+
+@pytest.mark.parametrize('first, second', [({'scanner_id': None}, {'scanner_id': float('nan')}), ({'q': 1}, {'q': 1.0})])
+def test_same_incidents_is_strict(first, second):
+    assert not same_incidents([first], [second])
+
+def jittered_events(seed, n=400):
+    rng = random.Random(seed)
+    base = datetime(2025, 8, 4, 9)
+    return [{'timestamp': (base + timedelta(milliseconds=rng.randrange(0, 20000, rng.choice([1, 50, 250])))).isoformat() + 'Z',
+             'event_type': rng.choice(['rfid_read', 'camera_image', 'barcode_scan']),
+             'scanner_id': rng.choice(['S1', 'S2', 'S3', None]),
+             'product_id': rng.choice(['P1', 'P2', 'P3', 'P4', ''])} for _ in range(n)]
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('seconds', [0, 0.1, 0.5, 2])
+def test_parity_with_match_tolerance(seed, seconds):
+    rules = compile_rules(DEFAULT_RULES, timedelta(seconds=seconds))
+    events = jittered_events(seed)
+    expected = detect_incidents(iter_features(clean_event(dict(event)) for event in events), rules)
+    actual = frame_to_incidents(detect_incidents_frame(extract_feature_frame(events), rules=rules), rules)
+    assert same_incidents(expected, actual)
+
+def test_match_tolerance_pairs_nearby_reads():
+    events = [{'timestamp': '2025-08-04T09:00:00.000Z', 'event_type': 'rfid_read', 'scanner_id': 'S1', 'product_id': 'P1'},
+              {'timestamp': '2025-08-04T09:00:00.300Z', 'event_type': 'barcode_scan', 'scanner_id': 'S1', 'product_id': 'P1'}]
+    exact = frame_to_incidents(detect_incidents_frame(extract_feature_frame(events), timedelta(0)))
+    assert [inc['incident'] for inc in exact] == ['scanner_avoidance']
+    assert detect_incidents_frame(extract_feature_frame(events), timedelta(seconds=0.5)).empty
+
+def test_first_reads_anchor_on_the_first_read():
+    ts = np.array([0, 4, 8, 12, 0, 100], dtype=np.int64)
+    groups = np.array([0, 0, 0, 0, 1, 0])
+    products = np.zeros(6, dtype=np.int64)
+    # 8 is within 5 of 4 but not of the anchor 0 (a chained window would swallow it)
+    assert _first_reads(np.arange(6), ts, groups, products, 5).tolist() == [0, 2, 4, 5]
+
+def test_match_tolerance_from_config(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'match_tolerance_seconds': 0.25, 'rules': DEFAULT_RULES}))
+    rules = load_rules(str(path))
+    assert rules.match_tolerance == timedelta(seconds=0.25)
+    with pytest.raises(ValueError):
+        IncidentDetector(rules=rules)
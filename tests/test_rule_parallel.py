@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from feature_extraction import extract_feature_frame, iter_frame_features
+from rule_parallel import ENGINES, detect_incidents_parallel
+
+EVENTS = [
+    {'timestamp': '2025-08-04T09:00:00Z', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 9},
+    {'event_type': 'queue_status', 'scanner_id': 'S2', 'queue_length': 8},
+    {'timestamp': '2025-08-04T09:00:01Z', 'event_type': 'equipment_status', 'scanner_id': 'S2', 'equipment_status': 'failure'},
+    {'event_type': 'equipment_status', 'scanner_id': 'S1', 'equipment_status': 'failure'},
+]
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_incidents_without_timestamp_sort_last(engine):
+    incidents = detect_incidents_parallel(extract_feature_frame(EVENTS), workers=1, engine=engine)
+    assert len(incidents) == 4
+    assert [str(inc['scanner_id']) for inc in incidents[:2]] == ['S1', 'S2']
+    assert all(pd.isna(inc['timestamp']) for inc in incidents[2:])
+
+def test_frame_features_from_plain_columns():
+    frame = extract_feature_frame(EVENTS)
+    frame['product_id'] = pd.Series(['P1', None, 'P2', None], dtype=object)
+    features = list(iter_frame_features(frame))
+    assert [feat['product_id'] for feat in features] == ['P1', None, 'P2', None]
+    assert features[1]['timestamp'] is pd.NaT or features[1]['timestamp'] is None
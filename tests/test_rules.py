@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import rules as rules_module
+from feature_extraction import extract_feature_frame, iter_frame_features
+from rules import DEFAULT_RULES, DEFAULT_RULES_PATH, compile_rules, load_rules
+
+def test_repository_config_matches_defaults():
+    config = load_rules(DEFAULT_RULES_PATH)
+    assert [rule.name for rule in config.rules] == [rule['name'] for rule in DEFAULT_RULES]
+    assert config.match_tolerance == timedelta(0)
+
+def test_dispatch_by_event_type():
+    ruleset = compile_rules(DEFAULT_RULES)
+    assert [rule.name for rule in ruleset.dispatch['queue_status']] == ['queue_buildup']
+    assert [rule.name for rule in ruleset.dispatch['camera_image']] == ['long_wait']
+    assert 'rfid_read' not in ruleset.dispatch
+    assert set(ruleset.bucket_rules) == {'avoidance', 'swap', 'unscanned'}
+    assert ruleset.output_fields['product_swap'] == ['barcode', 'actual']
+
+@pytest.mark.parametrize('spec', [
+    {'name': 'r', 'kind': 'sometimes'},
+    {'name': 'r', 'where': [['queue_length', '~', 1]]},
+    {'name': 'r', 'kind': 'dwell', 'event_types': ['camera_image']},
+    {'name': 'r', 'kind': 'bucket', 'check': 'theft'},
+])
+def test_invalid_rules_are_rejected(spec):
+    with pytest.raises(ValueError):
+        compile_rules([spec])
+
+def test_rule_names_must_be_unique():
+    with pytest.raises(ValueError):
+        compile_rules([DEFAULT_RULES[0], DEFAULT_RULES[0]])
+
+def test_mask_matches_per_event_predicate():
+    ruleset = compile_rules(DEFAULT_RULES + [{'name': 'short_queue', 'event_types': ['queue_status'],
+                                              'where': [['queue_length', '<=', 2]]}])
+    df = extract_feature_frame([
+        {'timestamp': '2025-08-04T09:00:00Z', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 9},
+        {'timestamp': '2025-08-04T09:00:01Z', 'event_type': 'queue_status', 'scanner_id': 'S1', 'queue_length': 1},
+        {'timestamp': '2025-08-04T09:00:02Z', 'event_type': 'queue_status', 'scanner_id': 'S1'},
+        {'timestamp': '2025-08-04T09:00:03Z', 'event_type': 'equipment_status', 'scanner_id': 'S1', 'equipment_status': 'failure'},
+    ])
+    features = list(iter_frame_features(df))
+    for rule in ruleset.rules:
+        if rule.kind != 'bucket':
+            expected = [feat['event_type'] in rule.event_types and rule.matches(feat) for feat in features]
+            assert rule.mask(df).tolist() == expected, rule.name
+
+def test_dwell_rule_reanchors():
+    ruleset = compile_rules(DEFAULT_RULES)
+    anchors = {}
+    start = datetime(2025, 8, 4, 9)
+    raised = []
+    for minutes in [0, 2, 5, 6, 10]:
+        feat = {'timestamp': start + timedelta(minutes=minutes), 'event_type': 'camera_image', 'scanner_id': 'S1',
+                'product_id': 'customer_present'}
+        raised += [inc['timestamp'] for inc in ruleset.event_incidents(feat, anchors)]
+    assert raised == [start + timedelta(minutes=5), start + timedelta(minutes=10)]
+
+def test_load_rules_paths(tmp_path, monkeypatch):
+    with pytest.raises(FileNotFoundError):
+        load_rules(str(tmp_path / 'missing.json'))
+    # Only the repository default may be missing, and then the built-in rules apply
+    monkeypatch.setattr(rules_module, 'DEFAULT_RULES_PATH', str(tmp_path / 'rules.json'))
+    with pytest.warns(UserWarning):
+        ruleset = load_rules(str(tmp_path / 'rules.json'))
+    assert [rule.name for rule in ruleset.rules] == [rule['name'] for rule in DEFAULT_RULES]
+    # A plain list of rules is accepted too
+    path = tmp_path / 'list.json'
+    path.write_text(json.dumps(DEFAULT_RULES[:1]))
+    assert [rule.name for rule in load_rules(str(path)).rules] == ['queue_buildup']
@@ -0,0 +1,55 @@
+import os
+import random
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import session_state
+from feature_extraction import extract_feature_frame, iter_frame_features
+from feature_pipeline import FeaturePipeline, load_pipeline, pipeline_path
+from session_state import EXACT_DISTINCT_LIMIT, HLL_PRECISION, SESSION_FEATURES, DistinctCounter, SessionStore
+
+EVENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'retail_events.json')
+
+def test_annotate_frame_matches_per_event_update(monkeypatch):
+    # A low limit sends the busiest scanners' product counters through the sketch too
+    monkeypatch.setattr(session_state, 'EXACT_DISTINCT_LIMIT', 3)
+    df = extract_feature_frame(EVENTS_PATH)
+    rng = random.Random(0)
+    df['product_id'] = df['product_id'].astype(object).where(df['product_id'].isna(), [f'P{rng.randrange(40)}' for _ in range(len(df))])
+    online = SessionStore()
+    expected = pd.DataFrame([online.update(feat) for feat in iter_frame_features(df)], index=df.index)
+    batched = SessionStore()
+    # Several frames in a row, so later frames start from stored totals
+    bounds = [0, 7, len(df) // 2, len(df)]
+    actual = pd.concat([batched.annotate_frame(df.iloc[start:stop]) for start, stop in zip(bounds, bounds[1:])])
+    pd.testing.assert_frame_equal(actual[SESSION_FEATURES].astype(float), expected[SESSION_FEATURES].astype(float))
+    assert batched.sessions.keys() == online.sessions.keys()
+    assert any(session.products.registers is not None for session in batched.sessions.values())
+
+@pytest.mark.parametrize('n', [EXACT_DISTINCT_LIMIT, EXACT_DISTINCT_LIMIT + 1, 5000, 50000])
+def test_distinct_counter_error_bound(n):
+    counter = DistinctCounter()
+    for i in range(n):
+        counter.add(f'product-{i}')
+        counter.add(f'product-{i // 2}')  # repeats never count twice
+    if n <= EXACT_DISTINCT_LIMIT:
+        assert counter.registers is None and counter.count() == n
+    else:
+        # HyperLogLog standard error is 1.04 / sqrt(m); allow three of them
+        assert counter.registers is not None
+        assert abs(counter.count() - n) <= 3 * 1.04 / np.sqrt(2 ** HLL_PRECISION) * n
+
+def test_old_session_features_warn(tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    pipeline = FeaturePipeline().fit(extract_feature_frame(EVENTS_PATH).assign(**{col: 0 for col in SESSION_FEATURES}))
+    pipeline.save(pipeline_path(model_path))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        load_pipeline(model_path)
+    pipeline.session_features_version = 1
+    pipeline.save(pipeline_path(model_path))
+    with pytest.warns(UserWarning, match='session features version 1'):
+        load_pipeline(model_path)
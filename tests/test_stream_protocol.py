@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stream_protocol import BatchDecoder, BatchEncoder, _epoch_ms
+
+msgpack = pytest.importorskip('msgpack')
+
+def test_millisecond_timestamps_round_trip():
+    events = [{'timestamp': '2025-08-04T09:00:00.%03dZ' % ms, 'event_type': 'rfid_read', 'scanner_id': 'S1'}
+              for ms in range(1000)]
+    encoder = BatchEncoder(events)
+    decoder = BatchDecoder(encoder.ack(64))
+    decoded = []
+    for frame, _, _ in encoder.frames(64):
+        decoded += decoder.decode(frame)[1]
+    assert decoded == [dict(e, timestamp=e['timestamp'].replace('.000Z', 'Z')) for e in events]
+
+def test_epoch_ms_is_exact():
+    # float seconds * 1000 gives 1079807155517.9999 here
+    assert _epoch_ms('2004-03-20T18:25:55.518Z') == 1079807155518
+
+def test_sub_millisecond_digits_are_dropped():
+    assert _epoch_ms('1970-01-01T00:00:00.123999Z') == 123
+    assert _epoch_ms('1970-01-01T02:00:00.001+02:00') == 1
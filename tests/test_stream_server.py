@@ -0,0 +1,59 @@
+import asyncio
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='module')
+def stream_server():
+    # The server loads events.json from the working directory on import
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    try:
+        yield importlib.import_module('stream_server')
+    finally:
+        sys.path.remove(ROOT)
+        os.chdir(cwd)
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_bytes_field_does_not_stop_the_log(stream_server, tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+
+    async def run():
+        log = stream_server.EventLog(path)
+        log.start()
+        log.log("Received prediction", ("127.0.0.1", 1), prediction=b"\x00\x01\x02")
+        await asyncio.sleep(stream_server.LOG_FLUSH_INTERVAL * 2)
+        assert not log.task.done()
+        log.log("Received prediction", ("127.0.0.1", 1), prediction="1")
+        await log.close()
+
+    asyncio.run(run())
+    records = read_records(path)
+    assert [r['prediction'] for r in records] == ["<3 bytes>", "1"]
+
+def test_write_error_is_counted_and_logging_continues(stream_server, tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+
+    async def run():
+        log = stream_server.EventLog(str(tmp_path / 'missing' / 'log.jsonl'))
+        log.start()
+        log.log("First")
+        await asyncio.sleep(stream_server.LOG_FLUSH_INTERVAL * 2)
+        assert not log.task.done()
+        log.path = path
+        log.log("Second")
+        await log.close()
+
+    asyncio.run(run())
+    records = read_records(path)
+    assert [r['msg'] for r in records] == ["Second", "Log records lost"]
+    assert records[1]['count'] == 1
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from window_join import window_join
+
+def brute_force(left_ts, left_group, right_ts, right_group, tolerance):
+    return sorted((i, j) for i in range(len(left_ts)) for j in range(len(right_ts))
+                  if left_group[i] == right_group[j] and abs(int(left_ts[i]) - int(right_ts[j])) <= tolerance)
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('tolerance', [0, 3, 50])
+def test_matches_brute_force(seed, tolerance):
+    rng = np.random.default_rng(seed)
+    left_ts, right_ts = rng.integers(0, 200, 150), rng.integers(0, 200, 120)
+    # Group -1 (missing scanner) and groups with reads on one side only
+    left_group, right_group = rng.integers(-1, 6, 150), rng.integers(-1, 8, 120)
+    left, right = window_join(left_ts, left_group, right_ts, right_group, tolerance)
+    assert sorted(zip(left.tolist(), right.tolist())) == brute_force(left_ts, left_group, right_ts, right_group, tolerance)
+
+def test_empty_sides():
+    empty = np.array([], dtype=np.int64)
+    for args in [(empty, empty, np.array([1]), np.array([0])), (np.array([1]), np.array([0]), empty, empty)]:
+        left, right = window_join(*args, 10)
+        assert len(left) == len(right) == 0